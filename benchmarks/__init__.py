@@ -0,0 +1,6 @@
+"""
+Benchmarks for SettleSense.
+
+Run from the project root, e.g. `python -m benchmarks.run` or
+`python -m benchmarks.startup`.
+"""
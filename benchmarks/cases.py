@@ -0,0 +1,148 @@
+"""
+Benchmark cases.
+
+Route cases send requests through the Flask test client, so they include
+routing, SQL, Python aggregation, template rendering and (for exports)
+draining the streamed body. DB cases call the query helpers directly inside
+an app context to isolate the SQL from the rest of the request.
+
+Each case is a setup function that takes the app and returns (run, reset):
+run is what gets timed, reset (or None) runs untimed before every call.
+"""
+
+import sqlite3
+from collections import namedtuple
+
+from settle_sense.balances import get_balance_totals, get_balances_as_of, get_timeseries
+from settle_sense.db import get_db, get_schema
+from settle_sense.queries import build_debt_filters, fetch_debt_page, get_debt_totals
+
+from .generator import FIRST_NAMES, SEARCH_TERMS
+
+Case = namedtuple('Case', ['name', 'kind', 'description', 'iterations', 'setup'])
+
+CASES = {}
+
+def case(name, description, iterations=50):
+    """Register a benchmark case; the kind is the part of the name before the dot."""
+    def register(setup):
+        CASES[name] = Case(name, name.split('.', 1)[0], description, iterations, setup)
+        return setup
+    return register
+
+# A date in the middle of the generated ledgers, for as-of queries
+AS_OF = '2022-06-30'
+
+def get_request(app, url):
+    client = app.test_client()
+
+    def run():
+        response = client.get(url)
+        # Reading the body drains streamed responses such as exports
+        size = len(response.get_data())
+        assert response.status_code == 200, (url, response.status_code)
+        return size
+    return run, None
+
+# ---- Route Cases ----
+@case('route.index', "Dashboard, first page by date")
+def route_index(app):
+    return get_request(app, '/')
+
+@case('route.index_amount', "Dashboard sorted by amount")
+def route_index_amount(app):
+    return get_request(app, '/?sort=amount&order=asc')
+
+@case('route.search', "Dashboard full-text search")
+def route_search(app):
+    return get_request(app, f'/?search={SEARCH_TERMS[0]}')
+
+@case('route.search_person', "Dashboard full-text search filtered to one person")
+def route_search_person(app):
+    return get_request(app, f'/?search={SEARCH_TERMS[0]}&person={FIRST_NAMES[0]}')
+
+@case('route.summary', "GET /api/summary")
+def route_summary(app):
+    return get_request(app, '/api/summary')
+
+@case('route.summary_as_of', "GET /api/summary as of a past date")
+def route_summary_as_of(app):
+    return get_request(app, f'/api/summary?as_of={AS_OF}')
+
+@case('route.timeseries', "GET /api/timeseries by month")
+def route_timeseries(app):
+    return get_request(app, '/api/timeseries?interval=month')
+
+@case('route.export', "Full CSV export", iterations=5)
+def route_export(app):
+    return get_request(app, '/export?format=csv')
+
+@case('route.run_migration', "POST /migrate/run checking every step from version 0", iterations=10)
+def route_run_migration(app):
+    client = app.test_client()
+    path = app.config['DATABASE']
+
+    def reset():
+        # Every step re-checks whether it is needed, which scans the data
+        # but finds nothing to change
+        with sqlite3.connect(path) as db:
+            db.execute("PRAGMA user_version = 0")
+
+    def run():
+        response = client.post('/migrate/run')
+        assert response.status_code == 200, response.status_code
+        assert b'failed' not in response.data
+    return run, reset
+
+# ---- DB Cases ----
+@case('db.balance_totals', "Headline totals from the balance summary")
+def db_balance_totals(app):
+    db = get_db()
+    return (lambda: get_balance_totals(db)), None
+
+@case('db.page', "One dashboard page by date")
+def db_page(app):
+    db = get_db()
+    filters = build_debt_filters(db)
+    return (lambda: fetch_debt_page(db, filters, get_schema().date_sort, True, 50)), None
+
+@case('db.fts_page', "One page of full-text matches by relevance")
+def db_fts_page(app):
+    db = get_db()
+    filters = build_debt_filters(db, SEARCH_TERMS[1])
+    return (lambda: fetch_debt_page(db, filters, '-bm25(debt_fts)', True, 50)), None
+
+@case('db.search_totals', "Totals over every full-text match")
+def db_search_totals(app):
+    db = get_db()
+    filters = build_debt_filters(db, SEARCH_TERMS[2])
+    return (lambda: get_debt_totals(db, filters)), None
+
+@case('db.search_person_totals', "Totals over the full-text matches for one person")
+def db_search_person_totals(app):
+    db = get_db()
+    filters = build_debt_filters(db, SEARCH_TERMS[2], FIRST_NAMES[0])
+    return (lambda: get_debt_totals(db, filters)), None
+
+@case('db.timeseries', "Monthly balance series from the rollups")
+def db_timeseries(app):
+    db = get_db()
+    return (lambda: get_timeseries(db, 'month')), None
+
+@case('db.as_of', "Balances as of a past date from snapshots and history")
+def db_as_of(app):
+    db = get_db()
+    return (lambda: get_balances_as_of(db, AS_OF + ' 23:59:59')), None
+
+@case('db.insert', "Insert one entry through every trigger, rolled back", iterations=200)
+def db_insert(app):
+    db = get_db()
+
+    def run():
+        db.execute("BEGIN")
+        db.execute(
+            "INSERT INTO debt (person, amount_minor, direction, note) VALUES (?, ?, ?, ?)",
+            ('Alice', 1250, 'they_owe', 'Benchmark dinner')
+        )
+        db.rollback()
+    return run, None
@@ -0,0 +1,178 @@
+"""
+Seeded generator for synthetic ledgers, from 1k to 10M entries.
+
+The same rows and seed always produce the same database, so results from
+different machines and commits measure the code rather than the data. The
+shape follows a real ledger rather than uniform noise:
+
+- people are drawn from a Zipf-like distribution, so a few friends account
+  for most entries and there is a long tail of one-off names;
+- both directions appear, weighted towards money owed to you;
+- amounts are log-normal (mostly small, occasionally large);
+- notes range from empty to a few hundred words, which is what stresses
+  the search index, snippets and exports;
+- entries are spread over several years in the order they were created.
+
+Datasets are cached under benchmarks/data/ by size, seed and schema version:
+
+    python -m benchmarks.generator --rows 1000000 --seed 1
+"""
+
+import argparse
+import bisect
+import datetime
+import itertools
+import os
+import random
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(PROJECT_DIR, 'benchmarks', 'data')
+
+FIRST_NAMES = (
+    'Alice', 'Ben', 'Chloe', 'Dan', 'Ella', 'Finn', 'Grace', 'Harry', 'Isla', 'Jack',
+    'Katie', 'Leo', 'Maya', 'Noah', 'Olivia', 'Priya', 'Quinn', 'Ravi', 'Sara', 'Tom',
+    'Uma', 'Vik', 'Will', 'Xena', 'Yusuf', 'Zoe', 'Aman', 'Bea', 'Carlos', 'Dev',
+)
+LAST_NAMES = (
+    'Smith', 'Patel', 'Jones', 'Khan', 'Brown', 'Singh', 'Taylor', 'Lee', 'Wilson', 'Evans',
+    'Shah', 'Walker', 'Wright', 'Hughes', 'Green', 'Hall', 'Wood', 'Clarke', 'Ali', 'Moore',
+)
+# Words notes are built from; SEARCH_TERMS are common enough to match many rows
+NOTE_WORDS = (
+    'dinner', 'lunch', 'coffee', 'taxi', 'train', 'tickets', 'rent', 'groceries', 'drinks',
+    'birthday', 'present', 'petrol', 'parking', 'concert', 'holiday', 'hotel', 'flight',
+    'deposit', 'bills', 'electricity', 'internet', 'takeaway', 'pizza', 'cinema', 'gym',
+    'split', 'share', 'half', 'owed', 'from', 'for', 'the', 'at', 'with', 'and', 'last',
+    'weekend', 'friday', 'trip', 'cash', 'card', 'transfer', 'refund', 'borrowed', 'lent',
+    'loan', 'repaid', 'partly', 'remaining', 'balance', 'festival', 'wedding', 'stag',
+    'brunch', 'books', 'phone', 'repair', 'laptop', 'charger', 'uber', 'bus', 'ferry',
+)
+SEARCH_TERMS = ('dinner', 'holiday', 'refund')
+
+# (share of entries, min words, max words); the rest have no note
+NOTE_LENGTHS = ((0.45, 2, 8), (0.15, 10, 40), (0.05, 100, 400))
+
+def person_names(count):
+    """Return count distinct names, first names alone before adding surnames."""
+    names = list(FIRST_NAMES)
+    for last, first in itertools.product(LAST_NAMES, FIRST_NAMES):
+        names.append(f"{first} {last}")
+    number = 2
+    while len(names) < count:
+        names.extend(f"{first} {last} {number}" for last, first in itertools.product(LAST_NAMES, FIRST_NAMES))
+        number += 1
+    return names[:count]
+
+def default_people(rows):
+    """Number of distinct people for a ledger of rows entries."""
+    return max(20, int(rows ** 0.5))
+
+def make_note(rng):
+    roll = rng.random()
+    for share, low, high in NOTE_LENGTHS:
+        if roll < share:
+            words = rng.choices(NOTE_WORDS, k=rng.randint(low, high))
+            return ' '.join(words).capitalize()
+        roll -= share
+    return ''
+
+def generate_entries(rows, seed=1, people=None, skew=1.1, start=datetime.datetime(2020, 1, 1), years=5):
+    """Yield rows (person, amount_minor, direction, note, created_at, updated_at) tuples.
+
+    skew is the Zipf exponent for how often each person appears; higher
+    values concentrate entries on fewer people.
+    """
+    rng = random.Random(seed)
+    names = person_names(people or default_people(rows))
+    cumulative = list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, len(names) + 1)))
+    # Gaps between entries average out to spread rows over the period
+    mean_gap = years * 365 * 86400 / max(rows, 1)
+    moment = start
+
+    for _ in range(rows):
+        person = names[bisect.bisect(cumulative, rng.random() * cumulative[-1])]
+        # Cents, the default currency exponent
+        amount_minor = round(min(max(rng.lognormvariate(3.0, 1.1), 0.01), 99999.99) * 100)
+        direction = 'they_owe' if rng.random() < 0.6 else 'you_owe'
+        moment += datetime.timedelta(seconds=rng.expovariate(1 / mean_gap))
+        created_at = moment.strftime('%Y-%m-%d %H:%M:%S')
+        yield (person, amount_minor, direction, make_note(rng), created_at, created_at)
+
+def build_dataset(path, rows, seed=1, people=None, skew=1.1, batch_size=20000, progress=None):
+    """Create a SettleSense database at path filled with a synthetic ledger.
+
+    Rows go in through the app's own schema, so every trigger-maintained
+    table (balances, rollups, history, search index, row versions) is
+    populated exactly as it would be by real use.
+    """
+    sys.path.insert(0, PROJECT_DIR)
+    from settle_sense import create_app
+    from settle_sense.balances import take_balance_snapshot
+    from settle_sense.db import get_db
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    app = create_app({'DATABASE': path})
+    with app.app_context():
+        db = get_db()
+        entries = generate_entries(rows, seed, people, skew)
+        inserted = 0
+        started = time.perf_counter()
+        while True:
+            batch = list(itertools.islice(entries, batch_size))
+            if not batch:
+                break
+            db.executemany(
+                "INSERT INTO debt (person, amount_minor, direction, note, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", batch
+            )
+            db.commit()
+            inserted += len(batch)
+            if progress:
+                progress(inserted, time.perf_counter() - started)
+        # Snapshot now, or the first as-of query would write one mid-benchmark
+        take_balance_snapshot(db, force=True)
+        db.execute("PRAGMA optimize")
+    # Closing the pooled connections checkpoints the WAL into the main file
+    app.extensions['db_pool'].recycle()
+    return path
+
+def dataset_path(rows, seed=1):
+    # The schema version in the name keeps stale datasets from being reused
+    sys.path.insert(0, PROJECT_DIR)
+    from settle_sense.migrations import SCHEMA_VERSION
+    return os.path.join(DATA_DIR, f"ledger-{rows}-seed{seed}-v{SCHEMA_VERSION}.sqlite")
+
+def get_dataset(rows, seed=1, rebuild=False, progress=None):
+    """Return the path of the cached dataset for rows and seed, building it if needed."""
+    path = dataset_path(rows, seed)
+    if rebuild or not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        # Build under a temporary name so an interrupted run is not reused
+        partial = path + '.partial'
+        build_dataset(partial, rows, seed, progress=progress)
+        os.replace(partial, path)
+    return path
+
+def report_progress(inserted, elapsed):
+    print(f"\r  {inserted:,} rows in {elapsed:.0f}s ({inserted / max(elapsed, 1e-9):,.0f} rows/s)",
+          end='', file=sys.stderr, flush=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000, help='Entries to generate (default: 100000).')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed (default: 1).')
+    parser.add_argument('--rebuild', action='store_true', help='Regenerate even if cached.')
+    args = parser.parse_args(argv)
+
+    path = get_dataset(args.rows, args.seed, args.rebuild, progress=report_progress)
+    print(file=sys.stderr)
+    print(path)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Shared helpers for benchmark results: percentiles, peak RSS, JSON files
+and baseline comparison.
+
+Results files have the same shape for every benchmark:
+
+    {"meta": {...how and where it ran...},
+     "results": {"<case>": {"p50_ms": ..., "peak_rss_mb": ..., ...}}}
+"""
+
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of samples, interpolating between ranks."""
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def summarize(samples_ms):
+    """Reduce a list of timings in milliseconds to the reported statistics."""
+    return {
+        'iterations': len(samples_ms),
+        'min_ms': round(min(samples_ms), 3),
+        'p50_ms': round(percentile(samples_ms, 50), 3),
+        'p95_ms': round(percentile(samples_ms, 95), 3),
+        'p99_ms': round(percentile(samples_ms, 99), 3),
+        'max_ms': round(max(samples_ms), 3),
+    }
+
+def peak_rss_mb():
+    """Return this process's peak resident set size in MiB, if the OS reports it."""
+    # On Linux ru_maxrss survives exec, so a child would report its parent's
+    # peak; VmHWM belongs to the current program only
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / divisor, 1)
+
+def environment():
+    """Describe the machine and versions a result was measured with."""
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+def save(path, meta, results):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2)
+        f.write('\n')
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+# Differences smaller than these are noise whatever the relative change
+MIN_DELTA = {'_ms': 1.0, '_mb': 5.0}
+
+def compare(results, baseline, threshold, metrics):
+    """Return (case, metric, before, after) for each metric more than threshold worse.
+
+    Only cases and metrics present in both results are compared, so a
+    baseline taken with fewer cases still applies.
+    """
+    regressions = []
+    for case, values in results.items():
+        before_values = baseline.get(case, {})
+        for metric in metrics:
+            before, after = before_values.get(metric), values.get(metric)
+            if not before or after is None:
+                continue
+            min_delta = next((delta for suffix, delta in MIN_DELTA.items() if metric.endswith(suffix)), 0)
+            if after > before * (1 + threshold) and after - before > min_delta:
+                regressions.append((case, metric, before, after))
+    return regressions
+
+def report_regressions(regressions, threshold):
+    """Print the regressions and return the process exit status."""
+    for case, metric, before, after in regressions:
+        print(f"REGRESSION {case} {metric}: {before:.1f} -> {after:.1f}")
+    if regressions:
+        return 1
+    print(f"No regressions beyond {threshold:.0%} of the baseline.")
+    return 0
@@ -0,0 +1,141 @@
+"""
+Route and database benchmarks against a synthetic ledger.
+
+Builds (or reuses) a seeded dataset of the requested size, then runs each
+case in a fresh interpreter so its peak RSS is its own, and reports
+p50/p95/p99 latency. Results can be saved and compared against a baseline;
+p50, p95 and peak RSS count as regressions beyond the threshold (p99 is
+reported but too noisy over a few dozen iterations to gate on):
+
+    python -m benchmarks.run --rows 100000 --save results.json
+    python -m benchmarks.run --rows 10000 --baseline benchmarks/baselines/bench-10k.json
+    python -m benchmarks.run --case route.export --case db.page --iterations 20
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from . import results as bench_results
+from .generator import dataset_path, get_dataset, report_progress
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GATED_METRICS = ('p50_ms', 'p95_ms', 'peak_rss_mb')
+
+def run_case(name, path, iterations, warmup):
+    """Time one case in this process and return its summary."""
+    from settle_sense import create_app, settings
+    from .cases import CASES
+
+    # Benchmark with the default settings rather than this checkout's own
+    settings.settings_cache = settings.SettingsCache(os.path.join(tempfile.gettempdir(), 'settle-sense-bench-none.json'))
+
+    bench_case = CASES[name]
+    app = create_app({'DATABASE': path})
+    context = app.app_context() if bench_case.kind == 'db' else None
+    if context:
+        context.push()
+    try:
+        run, reset = bench_case.setup(app)
+        samples = []
+        for index in range(warmup + iterations):
+            if reset:
+                reset()
+            started = time.perf_counter()
+            run()
+            elapsed = (time.perf_counter() - started) * 1000
+            if index >= warmup:
+                samples.append(elapsed)
+    finally:
+        if context:
+            context.pop()
+
+    summary = bench_results.summarize(samples)
+    summary['peak_rss_mb'] = bench_results.peak_rss_mb()
+    return summary
+
+def spawn_case(name, path, iterations, warmup):
+    """Run one case in a child interpreter and return its summary."""
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.run', '--child', name, '--database', path,
+         '--iterations', str(iterations), '--warmup', str(warmup)],
+        cwd=PROJECT_DIR, capture_output=True, text=True
+    )
+    if output.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{output.stderr}")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def print_result(name, summary):
+    rss = summary['peak_rss_mb']
+    print(f"{name:<22} {summary['p50_ms']:>10.2f} {summary['p95_ms']:>10.2f} "
+          f"{summary['p99_ms']:>10.2f} {rss if rss is not None else '-':>9}", flush=True)
+
+def main(argv=None):
+    from .cases import CASES
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help='Entries in the ledger (default: 10000).')
+    parser.add_argument('--seed', type=int, default=1, help='Dataset seed (default: 1).')
+    parser.add_argument('--case', action='append', dest='cases', metavar='NAME',
+                        help='Run only this case (repeatable); "route" or "db" selects a kind.')
+    parser.add_argument('--iterations', type=int, help="Timed calls per case (default: the case's own).")
+    parser.add_argument('--warmup', type=int, default=2, help='Untimed calls first (default: 2).')
+    parser.add_argument('--list', action='store_true', help='List the cases and exit.')
+    parser.add_argument('--save', metavar='PATH', help='Write the results as JSON.')
+    parser.add_argument('--baseline', metavar='PATH', help='Compare against saved results.')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed slowdown against the baseline (default: 0.25).')
+    parser.add_argument('--child', metavar='NAME', help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        summary = run_case(args.child, args.database, args.iterations, args.warmup)
+        print(json.dumps(summary))
+        return 0
+
+    if args.list:
+        for bench_case in CASES.values():
+            print(f"{bench_case.name:<22} {bench_case.description}")
+        return 0
+
+    selected = [
+        bench_case for bench_case in CASES.values()
+        if not args.cases or bench_case.name in args.cases or bench_case.kind in args.cases
+    ]
+    unknown = set(args.cases or ()) - {c.name for c in CASES.values()} - {c.kind for c in CASES.values()}
+    if unknown:
+        parser.error(f"unknown case: {', '.join(sorted(unknown))}")
+
+    if not os.path.exists(dataset_path(args.rows, args.seed)):
+        print(f"Generating {args.rows:,} rows (cached for later runs)...", file=sys.stderr)
+        get_dataset(args.rows, args.seed, progress=report_progress)
+        print(file=sys.stderr)
+    path = dataset_path(args.rows, args.seed)
+
+    print(f"{'case':<22} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'rss MiB':>9}")
+    results = {}
+    for bench_case in selected:
+        summary = spawn_case(bench_case.name, path, args.iterations or bench_case.iterations, args.warmup)
+        results[bench_case.name] = summary
+        print_result(bench_case.name, summary)
+
+    if args.save:
+        meta = dict(bench_results.environment(), rows=args.rows, seed=args.seed, warmup=args.warmup)
+        bench_results.save(args.save, meta, results)
+
+    if args.baseline:
+        baseline = bench_results.load(args.baseline)
+        if baseline['meta'].get('rows') != args.rows:
+            print(f"Warning: the baseline was measured with {baseline['meta'].get('rows')} rows.")
+        regressions = bench_results.compare(results, baseline['results'], args.threshold, GATED_METRICS)
+        return bench_results.report_regressions(regressions, args.threshold)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
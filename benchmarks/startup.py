@@ -0,0 +1,112 @@
+"""
+Cold-start benchmark: how long a fresh process takes to serve its first request.
+
+Each run starts a new interpreter that imports settle_sense, creates the
+app and answers one request, which includes the lazy schema check. The
+medians are compared against a saved baseline so a change that makes
+startup (and therefore every worker fork, CLI call and test) slower shows
+up as a regression:
+
+    python -m benchmarks.startup --save benchmarks/baselines/startup.json
+    python -m benchmarks.startup --baseline benchmarks/baselines/startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from . import results as bench_results
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child process; prints its own timings as JSON
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+from settle_sense import create_app
+imported = time.perf_counter()
+app = create_app({'DATABASE': sys.argv[1]})
+created = time.perf_counter()
+response = app.test_client().get(sys.argv[2])
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+}))
+'''
+
+METRICS = ('process_ms', 'import_ms', 'create_app_ms', 'first_request_ms')
+
+def seed_database(path, rows):
+    """Create the schema and insert rows entries, as an existing install would have."""
+    sys.path.insert(0, PROJECT_DIR)
+    from settle_sense import create_app
+    from settle_sense.db import get_db
+
+    app = create_app({'DATABASE': path})
+    with app.app_context():
+        db = get_db()
+        db.executemany(
+            "INSERT INTO debt (person, amount_minor, direction, note, created_at, updated_at) "
+            "VALUES (?, ?, ?, '', datetime('now'), datetime('now'))",
+            ((f"Person {i % 50}", (i % 200 + 1) * 100, 'you_owe' if i % 3 else 'they_owe')
+             for i in range(rows))
+        )
+        db.commit()
+
+def measure(path, url):
+    """Start one fresh interpreter and return its timings in milliseconds."""
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, path, url],
+        cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+def run(runs, rows, url):
+    """Return the median of each metric over runs cold starts."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'debts.sqlite')
+        seed_database(path, rows)
+        samples = [measure(path, url) for _ in range(runs)]
+    return {
+        metric: round(statistics.median(sample[metric] for sample in samples), 1)
+        for metric in METRICS
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=7, help='Cold starts to measure (default: 7).')
+    parser.add_argument('--rows', type=int, default=1000, help='Entries in the database (default: 1000).')
+    parser.add_argument('--url', default='/api/summary', help='First request (default: /api/summary).')
+    parser.add_argument('--save', metavar='PATH', help='Write the results as JSON.')
+    parser.add_argument('--baseline', metavar='PATH', help='Compare against saved results.')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed slowdown against the baseline (default: 0.25).')
+    args = parser.parse_args(argv)
+
+    metrics = run(args.runs, args.rows, args.url)
+    for metric, value in metrics.items():
+        print(f"{metric:>18}: {value:8.1f} ms")
+    results = {'cold_start': metrics}
+
+    if args.save:
+        meta = dict(bench_results.environment(), runs=args.runs, rows=args.rows, url=args.url)
+        bench_results.save(args.save, meta, results)
+
+    if args.baseline:
+        baseline = bench_results.load(args.baseline)['results']
+        regressions = bench_results.compare(results, baseline, args.threshold, METRICS)
+        return bench_results.report_regressions(regressions, args.threshold)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
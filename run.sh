@@ -58,14 +58,14 @@ run_application() {
         export $(grep -v '^#' "${APP_DIR}/.env" | xargs)
     fi
     
-    # Change to application directory
-    cd "${APP_DIR}/settle_sense"
+    # Run from the project root so settle_sense is importable as a package
+    cd "${APP_DIR}"
     
     # Set environment variables
     export PORT=$APP_PORT
     export HOST=$APP_HOST
     export DEBUG=$DEBUG
-    export FLASK_APP=app.py
+    export FLASK_APP=settle_sense
     
     # Display info
     echo -e "\n${BLUE}ⓘ Configuration:${NC}"
@@ -76,7 +76,7 @@ run_application() {
     echo -e "\n${GREEN}✓ Application starting at http://$APP_HOST:$APP_PORT${NC}\n"
     
     # Run the app
-    python app.py
+    python -m settle_sense.app
     
     # Store exit code
     EXIT_CODE=$?
@@ -3,7 +3,7 @@
 # SettleSense Service Manager
 # ---------------------------
 # This script manages the SettleSense application service
-# Usage: ./service.sh [start|stop|restart|status|logs]
+# Usage: ./service.sh [start|stop|restart|reload|status|logs]
 #
 # Author: godl1ke
 # Date: May 9, 2025
@@ -25,6 +25,8 @@ LOG_FILE="${APP_DIR}/settlesense.log"
 PORT=${PORT:-8000}
 HOST=${HOST:-"127.0.0.1"}
 URL="http://${HOST}:${PORT}"
+# Seconds to wait for in-flight requests on stop (matches WEB_GRACEFUL_TIMEOUT)
+STOP_TIMEOUT=${WEB_GRACEFUL_TIMEOUT:-30}
 
 # Print banner
 print_banner() {
@@ -62,10 +64,11 @@ start_app() {
         export $(grep -v '^#' "${APP_DIR}/.env" | xargs)
     fi
     
-    # Start the app as a background process
+    # Start the production server (gunicorn master plus worker processes)
+    # as a background process; DEBUG would select the development server
     echo -e "${YELLOW}➤ Launching application...${NC}"
-    cd "${SETTLE_SENSE_DIR}" && \
-    nohup python3 app.py > "$LOG_FILE" 2>&1 & 
+    cd "${APP_DIR}" && \
+    DEBUG=false nohup python3 -m settle_sense.app > "$LOG_FILE" 2>&1 & 
     APP_PID=$!
     
     # Check if process started successfully
@@ -75,6 +78,7 @@ start_app() {
         echo -e "${GREEN}✓ SettleSense started successfully!${NC}"
         echo -e "${CYAN}ⓘ Service Details:${NC}"
         echo -e "  • ${CYAN}Process ID:${NC} $APP_PID"
+        echo -e "  • ${CYAN}Workers:${NC} ${WEB_WORKERS:-$(nproc 2>/dev/null || echo 1)}"
         echo -e "  • ${CYAN}Access URL:${NC} $URL"
         echo -e "  • ${CYAN}Log File:${NC} $LOG_FILE"
     else
@@ -95,8 +99,8 @@ stop_app() {
             echo -e "${YELLOW}➤ Sending termination signal to process $PID...${NC}"
             kill "$PID"
             
-            # Wait for process to terminate gracefully
-            for i in {1..10}; do
+            # Wait for workers to finish in-flight requests
+            for ((i = 0; i < STOP_TIMEOUT * 2 + 4; i++)); do
                 echo -n "."
                 sleep 0.5
                 if ! ps -p "$PID" >/dev/null 2>&1; then
@@ -127,6 +131,21 @@ stop_app() {
     fi
 }
 
+# Gracefully replace the worker processes
+reload_app() {
+    echo -e "${YELLOW}➤ Reloading SettleSense workers...${NC}"
+    
+    if [ -f "$PID_FILE" ] && ps -p "$(cat $PID_FILE)" >/dev/null 2>&1; then
+        # The master starts new workers, then retires the old ones once
+        # their in-flight requests finish. Code changes need a restart.
+        kill -HUP "$(cat $PID_FILE)"
+        echo -e "${GREEN}✓ Reload signal sent to process $(cat $PID_FILE)${NC}"
+    else
+        echo -e "${RED}✗ SettleSense is not running${NC}"
+        return 1
+    fi
+}
+
 # Check application status
 check_status() {
     echo -e "${YELLOW}➤ Checking SettleSense service status...${NC}"
@@ -141,6 +160,7 @@ check_status() {
             echo -e "  • ${CYAN}Access URL:${NC} $URL"
             echo -e "  • ${CYAN}Log File:${NC} $LOG_FILE"
             echo -e "  • ${CYAN}Uptime:${NC} $(ps -p $PID -o etime= | xargs)"
+            echo -e "  • ${CYAN}Workers:${NC} $(pgrep -P "$PID" | wc -l | xargs)"
             return 0
         else
             echo -e "${RED}✗ SettleSense is not running (stale PID file)${NC}"
@@ -185,6 +205,9 @@ main() {
             sleep 2
             start_app
             ;;
+        reload)
+            reload_app
+            ;;
         status)
             check_status
             ;;
@@ -192,7 +215,7 @@ main() {
             view_logs
             ;;
         *)
-            echo -e "${CYAN}Usage: $0 {start|stop|restart|status|logs}${NC}"
+            echo -e "${CYAN}Usage: $0 {start|stop|restart|reload|status|logs}${NC}"
             exit 1
             ;;
     esac
@@ -0,0 +1,72 @@
+"""
+SettleSense - A professional debt tracking application.
+
+This application helps users track personal debts and credits
+between themselves and others in a clean, organized interface.
+
+create_app() builds an app; importing the package does no I/O. The
+database schema is checked the first time a request needs it, or up
+front with `flask --app settle_sense init-db`.
+"""
+
+import os
+from flask import Flask
+from .config import load_config
+from .db import ConnectionPool, connect_db, close_db
+from .schema import ensure_db, init_db_command
+from .settings import format_currency, format_date, inject_formatters
+from .queries import highlight_match
+from .querylog import SlowQueryLog
+from . import admin, batch, exports, imports, ledgers, live, metrics, sync, views
+from .backups import prune_backups_command
+from .balances import snapshot_balances_command
+from .migrations import migrate_db_command, check_balances_command
+
+BLUEPRINTS = (views.bp, live.bp, ledgers.bp, exports.bp, imports.bp, batch.bp, sync.bp, admin.bp,
+              metrics.bp)
+
+COMMANDS = (
+    init_db_command,
+    migrate_db_command,
+    check_balances_command,
+    snapshot_balances_command,
+    prune_backups_command,
+    ledgers.bench_settlement_command,
+    imports.import_ledger_command,
+    sync.prune_tombstones_command,
+)
+
+def create_app(config=None):
+    """Create and configure a SettleSense app.
+
+    config overrides the settings read from the environment, e.g. a
+    different DATABASE for tests or benchmarks.
+    """
+    app = Flask(__name__)
+    app.config.update(load_config())
+    if config:
+        app.config.update(config)
+
+    # Ensure instance folder exists
+    os.makedirs(os.path.dirname(app.config['DATABASE']), exist_ok=True)
+
+    app.extensions['db_pool'] = ConnectionPool(
+        lambda: connect_db(app.config), app.config['DATABASE'], app.config['DB_POOL_SIZE']
+    )
+    app.extensions['db_setup'] = ensure_db
+    app.extensions['metrics'] = metrics.MetricsRegistry(app.logger, app.config['METRICS_DIR'])
+    if app.config['SLOW_QUERY_MS'] > 0:
+        app.extensions['slow_queries'] = SlowQueryLog(app.config['SLOW_QUERY_MS'], app.logger)
+    app.teardown_appcontext(close_db)
+
+    # Register Jinja filters
+    app.add_template_filter(format_date, 'format_date')
+    app.add_template_filter(format_currency, 'format_currency')
+    app.add_template_filter(highlight_match, 'highlight_match')
+    app.context_processor(inject_formatters)
+
+    for blueprint in BLUEPRINTS:
+        app.register_blueprint(blueprint)
+    for command in COMMANDS:
+        app.cli.add_command(command)
+    return app
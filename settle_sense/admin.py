@@ -0,0 +1,253 @@
+"""
+Settings, backup and migration pages.
+"""
+
+import datetime
+import os
+import platform
+import sqlite3
+import zlib
+import flask
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash
+from .backups import (BackupError, MANIFEST_EXTENSION, backup_database, list_backup_files,
+                      read_manifest, resolve_backup_path, restore_database)
+from .db import get_db
+from .formatting import format_bytes
+from .migrations import (SCHEMA_VERSION, run_migrations, check_database_status,
+                         needs_migration, get_user_version)
+from .settings import get_settings, save_settings
+
+bp = Blueprint('admin', __name__)
+
+def render_migration_page(steps, message=None, error=None, error_details=None):
+    """Render the migration page for a list of run_migrations() results."""
+    current_year = datetime.datetime.now().year
+    db_checks = check_database_status(steps)
+    
+    # Get user's theme preference from settings
+    settings = get_settings()
+    theme = settings.get('theme', 'light')
+    
+    return render_template(
+        'migration.html',
+        steps=steps,
+        db_checks=db_checks,
+        needs_migration=needs_migration(db_checks),
+        user_version=get_user_version(get_db()),
+        schema_version=SCHEMA_VERSION,
+        current_year=current_year,
+        message=message,
+        error=error,
+        error_details=error_details,
+        theme=theme
+    )
+
+@bp.route('/migrate')
+def migrate():
+    """Show migration status page with the plan of pending steps."""
+    return render_migration_page(run_migrations(get_db(), dry_run=True))
+
+@bp.route('/migrate/run', methods=['POST'])
+def run_migration():
+    """Execute the pending migration steps (or only plan them)."""
+    error = None
+    message = None
+    error_details = None
+    make_backup = request.form.get('backup', 'off') == 'on'
+    dry_run = request.form.get('dry_run', 'off') == 'on'
+    db = get_db()
+    
+    try:
+        if make_backup and not dry_run:
+            backup_file = backup_database()
+            if backup_file:
+                message = f"Database backed up successfully."
+        
+        steps = run_migrations(db, dry_run=dry_run)
+        failed = [step for step in steps if step['status'] == 'failed']
+        if failed:
+            error = f"Migration step {failed[0]['version']} ({failed[0]['name']}) failed."
+            error_details = failed[0]['error']
+        elif dry_run:
+            pending = sum(step['status'] == 'pending' for step in steps)
+            message = f"Dry run: {pending} step(s) would be applied."
+        else:
+            total = sum(step['duration'] or 0 for step in steps)
+            message = f"Database migration completed successfully in {total:.2f}s!"
+        
+    except Exception as e:
+        error = "An error occurred during migration."
+        error_details = str(e)
+        current_app.logger.error(f"Migration error: {str(e)}")
+        db.rollback()
+        steps = run_migrations(db, dry_run=True)
+    
+    return render_migration_page(steps, message, error, error_details)
+
+
+def get_system_info():
+    """Get system information for the About page."""
+    return {
+        'python_version': platform.python_version(),
+        'flask_version': flask.__version__,
+        'sqlite_version': sqlite3.sqlite_version,
+        'os': f"{platform.system()} {platform.release()}"
+    }
+
+def get_db_info():
+    """Get database information for the Settings page."""
+    db_path = current_app.config['DATABASE']
+    
+    if not os.path.exists(db_path):
+        return {
+            'path': db_path,
+            'size': '0 KB',
+            'modified': None,
+            'record_count': 0
+        }
+    
+    # Get database size in KB
+    size_str = format_bytes(os.path.getsize(db_path))
+    
+    # Get modification time
+    mtime = os.path.getmtime(db_path)
+    modified = datetime.datetime.fromtimestamp(mtime)
+    
+    # Get record count
+    db = get_db()
+    try:
+        count = db.execute("SELECT COUNT(*) FROM debt").fetchone()[0]
+    except:
+        count = 0
+        
+    return {
+        'path': db_path,
+        'size': size_str,
+        'modified': modified,
+        'record_count': count
+    }
+
+def get_backups():
+    """Get list of available backups.
+    
+    `size` is the size of the database a backup restores; `stored` is the
+    disk space it added, which for incremental backups is the manifest plus
+    only the chunks no earlier backup had.
+    """
+    backups = []
+    for file_path, mtime in list_backup_files():
+        size_bytes = os.path.getsize(file_path)
+        stored_bytes = size_bytes
+        if file_path.endswith(MANIFEST_EXTENSION):
+            try:
+                manifest = read_manifest(file_path)
+            except (OSError, ValueError, BackupError) as e:
+                current_app.logger.error(f"Unreadable backup manifest {file_path}: {str(e)}")
+                continue
+            size_bytes = manifest['size']
+            stored_bytes += manifest['stored_bytes']
+        
+        backups.append({
+            'name': os.path.basename(file_path),
+            'file': file_path,
+            'size': format_bytes(size_bytes),
+            'stored': format_bytes(stored_bytes),
+            'created': datetime.datetime.fromtimestamp(mtime)
+        })
+    
+    return backups
+
+@bp.route('/settings')
+def settings():
+    """Render the settings page."""
+    current_settings = get_settings()
+    db_info = get_db_info()
+    sys_info = get_system_info()
+    backups = get_backups()
+    current_year = datetime.datetime.now().year
+    
+    slow_queries = current_app.extensions.get('slow_queries')
+    
+    # Get the current theme
+    theme = current_settings.get('theme', 'light')
+    
+    return render_template(
+        'settings.html',
+        settings=current_settings,
+        db_path=db_info['path'],
+        db_size=db_info['size'],
+        db_modified=db_info['modified'],
+        record_count=db_info['record_count'],
+        sys_info=sys_info,
+        backups=backups,
+        current_year=current_year,
+        slow_query_ms=current_app.config['SLOW_QUERY_MS'],
+        slow_queries=slow_queries.top() if slow_queries else None,
+        theme=theme
+    )
+
+@bp.route('/settings/update', methods=['POST'])
+def update_settings():
+    """Update application settings."""
+    section = request.form.get('section', '')
+    current_settings = dict(get_settings())
+    
+    if section == 'general':
+        current_settings['currency_symbol'] = request.form.get('currency_symbol', '$')
+        current_settings['date_format'] = request.form.get('date_format', 'YYYY-MM-DD')
+    
+    elif section == 'display':
+        current_settings['theme'] = request.form.get('theme', 'light')
+        current_settings['records_per_page'] = request.form.get('records_per_page', '10')
+        current_settings['show_charts'] = 'true' if request.form.get('show_charts') else 'false'
+    
+    if save_settings(current_settings):
+        flash(f"Settings updated successfully", "success")
+    else:
+        flash("Failed to save settings", "error")
+    
+    return redirect(url_for('admin.settings') + f"#{section}")
+
+@bp.route('/diagnostics/clear', methods=['POST'])
+def clear_slow_queries():
+    """Forget the statements collected by the slow-query log."""
+    slow_queries = current_app.extensions.get('slow_queries')
+    if slow_queries:
+        slow_queries.clear()
+        flash("Slow-query log cleared", "success")
+    return redirect(url_for('admin.settings') + "#diagnostics")
+
+@bp.route('/backup/create', methods=['POST'])
+def create_backup():
+    """Create a new database backup."""
+    try:
+        backup_file = backup_database()
+    except (BackupError, sqlite3.Error, OSError) as e:
+        current_app.logger.error(f"Failed to create backup: {str(e)}")
+        backup_file = None
+    
+    if backup_file:
+        flash(f"Backup created successfully: {os.path.basename(backup_file)}", "success")
+    else:
+        flash("Failed to create backup", "error")
+    
+    return redirect(url_for('admin.settings') + "#backup")
+
+@bp.route('/backup/restore', methods=['POST'])
+def restore_backup():
+    """Restore database from backup."""
+    backup_file = resolve_backup_path(request.form.get('file', ''))
+    
+    if not backup_file:
+        flash("Invalid backup file", "error")
+        return redirect(url_for('admin.settings') + "#backup")
+    
+    try:
+        elapsed, _ = restore_database(backup_file)
+        current_app.logger.info(f"Restored {os.path.basename(backup_file)} in {elapsed:.2f}s")
+        flash(f"Backup restored successfully in {elapsed:.2f}s", "success")
+    except (BackupError, sqlite3.Error, OSError, EOFError, ValueError, zlib.error) as e:
+        current_app.logger.error(f"Failed to restore backup: {str(e)}")
+        flash(f"Failed to restore backup: {str(e)}", "error")
+    
+    return redirect(url_for('admin.settings') + "#backup")
@@ -0,0 +1,409 @@
+"""
+Online backups and atomic restores of the SettleSense database.
+"""
+
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import zlib
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from .caching import get_data_version, bump_data_version
+from .config import BASE_DIR
+from .db import connect_db, get_db, get_pool, release_db
+from .formatting import format_bytes
+from .schema import init_db
+from .sync import get_sync_state, reset_sync_horizon
+
+# Backups are taken with the SQLite online backup API in small page steps,
+# written to a temporary file, integrity-checked and then renamed into place,
+# so a crash or concurrent writer can never leave a torn backup behind.
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+BACKUP_DIR = os.path.join(BASE_DIR, 'backups')
+BACKUP_EXTENSIONS = {'': '.sqlite', 'gzip': '.sqlite.gz', 'zstd': '.sqlite.zst'}
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP = 0.005
+COPY_CHUNK_SIZE = 1024 * 1024
+
+class BackupError(Exception):
+    """Raised when a backup cannot be created or fails verification."""
+
+def get_backup_compression(requested=None):
+    """Resolve the compression to use, falling back to gzip without zstandard."""
+    compression = (requested if requested is not None
+                   else current_app.config.get('BACKUP_COMPRESSION', '')).lower()
+    if compression in ('none', 'off'):
+        compression = ''
+    if compression not in BACKUP_EXTENSIONS:
+        current_app.logger.warning(f"Unknown backup compression '{compression}', storing uncompressed")
+        return ''
+    if compression == 'zstd' and zstandard is None:
+        current_app.logger.warning("zstandard is not installed, compressing backup with gzip instead")
+        return 'gzip'
+    return compression
+
+def check_integrity(db):
+    """Run PRAGMA integrity_check, returning None if OK or the problems found."""
+    problems = [row[0] for row in db.execute("PRAGMA integrity_check").fetchall()]
+    return None if problems == ['ok'] else '; '.join(problems[:5])
+
+def unique_backup_path(timestamp, extension):
+    """Return a backups/ path for timestamp that does not exist yet."""
+    destination = os.path.join(BACKUP_DIR, f"debts_{timestamp}{extension}")
+    counter = 1
+    while os.path.exists(destination):
+        destination = os.path.join(BACKUP_DIR, f"debts_{timestamp}_{counter}{extension}")
+        counter += 1
+    return destination
+
+def compress_file(source, destination, compression):
+    """Compress source into destination with gzip or zstd."""
+    with open(source, 'rb') as src:
+        if compression == 'zstd':
+            with open(destination, 'wb') as dst:
+                zstandard.ZstdCompressor(level=10).copy_stream(src, dst)
+        else:
+            with gzip.open(destination, 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+def decompress_backup(path, destination):
+    """Write the plain SQLite file for a (possibly compressed) backup to destination."""
+    if path.endswith(MANIFEST_EXTENSION):
+        return rebuild_from_manifest(path, destination)
+    with open(path, 'rb') as src, open(destination, 'wb') as dst:
+        if path.endswith('.zst'):
+            if zstandard is None:
+                raise BackupError("zstandard is required to restore .zst backups")
+            zstandard.ZstdDecompressor().copy_stream(src, dst)
+        elif path.endswith('.gz'):
+            with gzip.GzipFile(fileobj=src, mode='rb') as gz:
+                shutil.copyfileobj(gz, dst, COPY_CHUNK_SIZE)
+        else:
+            shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+def copy_database(source, target):
+    """Copy one open database into another with the online backup API.
+
+    The copy runs in BACKUP_PAGES_PER_STEP page steps and sleeps between
+    steps, releasing the source's read lock so writers are never blocked
+    for the whole copy.
+    """
+    source.backup(target, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP)
+
+def snapshot_database(path):
+    """Write a verified hot copy of the live database to path.
+
+    Returns the database page size.
+    """
+    source = connect_db()
+    try:
+        target = sqlite3.connect(path)
+        try:
+            copy_database(source, target)
+            # Store the backup as a self-contained rollback-journal database
+            target.execute("PRAGMA journal_mode=DELETE")
+            problem = check_integrity(target)
+            page_size = target.execute("PRAGMA page_size").fetchone()[0]
+        finally:
+            target.close()
+    finally:
+        source.close()
+    if problem:
+        raise BackupError(f"Backup failed integrity check: {problem}")
+    return page_size
+
+# Incremental backups split the snapshot into database pages stored once
+# under backups/chunks/ by their SHA-256, so a backup costs only the pages
+# that changed since any earlier one plus a small JSON manifest listing the
+# chunk hashes in order. Chunks are page-aligned because a small write
+# dirties a handful of pages; larger chunks would re-store mostly unchanged
+# data around each of them.
+MANIFEST_EXTENSION = '.manifest.json'
+MANIFEST_FORMAT = 1
+CHUNK_DIR = os.path.join(BACKUP_DIR, 'chunks')
+# Unreferenced chunks younger than this are kept, since a backup running in
+# another process may have written them before its manifest
+CHUNK_GC_GRACE_SECONDS = 3600
+
+backup_lock = threading.Lock()
+
+def chunk_path(digest):
+    """Return the chunk store path for a SHA-256 hex digest."""
+    return os.path.join(CHUNK_DIR, digest[:2], digest)
+
+def store_chunk(data):
+    """Store one chunk if it is new, returning (digest, bytes written)."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = chunk_path(digest)
+    if os.path.exists(path):
+        # Refresh the mtime so a concurrent GC treats the chunk as in use
+        os.utime(path)
+        return digest, 0
+    
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    packed = zlib.compress(data, 6)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(packed)
+    os.replace(tmp_path, path)
+    return digest, len(packed)
+
+def write_manifest(snapshot, destination, chunk_size):
+    """Chunk a snapshot file into the chunk store and write its manifest."""
+    chunks = []
+    new_chunks = 0
+    stored_bytes = 0
+    file_hash = hashlib.sha256()
+    
+    with open(snapshot, 'rb') as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            file_hash.update(data)
+            digest, written = store_chunk(data)
+            chunks.append(digest)
+            if written:
+                new_chunks += 1
+                stored_bytes += written
+    
+    manifest = {
+        'format': MANIFEST_FORMAT,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'size': os.path.getsize(snapshot),
+        'sha256': file_hash.hexdigest(),
+        'chunk_size': chunk_size,
+        'chunks': chunks,
+        'new_chunks': new_chunks,
+        'stored_bytes': stored_bytes,
+    }
+    tmp_path = destination + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, destination)
+    return manifest
+
+def read_manifest(path):
+    """Load and sanity-check a backup manifest."""
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != MANIFEST_FORMAT:
+        raise BackupError(f"Unsupported backup manifest format in {os.path.basename(path)}")
+    return manifest
+
+def rebuild_from_manifest(path, destination):
+    """Reassemble the database file a manifest describes, verifying every chunk."""
+    manifest = read_manifest(path)
+    file_hash = hashlib.sha256()
+    
+    with open(destination, 'wb') as dst:
+        for digest in manifest['chunks']:
+            try:
+                with open(chunk_path(digest), 'rb') as f:
+                    data = zlib.decompress(f.read())
+            except FileNotFoundError:
+                raise BackupError(f"Backup is missing chunk {digest[:12]}")
+            if hashlib.sha256(data).hexdigest() != digest:
+                raise BackupError(f"Backup chunk {digest[:12]} is corrupt")
+            file_hash.update(data)
+            dst.write(data)
+    
+    if file_hash.hexdigest() != manifest['sha256']:
+        raise BackupError("Rebuilt backup does not match its manifest checksum")
+
+def backup_database(compression=None, incremental=None):
+    """Create a verified, atomically written backup of the current database.
+    
+    Incremental backups (the default, see BACKUP_INCREMENTAL) are written as
+    a manifest over the chunk store; full backups are a single .sqlite file,
+    optionally compressed. Returns the backup path, or None if there is no
+    database yet. Raises BackupError if the copy fails its integrity check.
+    """
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    
+    if not os.path.exists(current_app.config['DATABASE']):
+        return None
+    
+    if incremental is None:
+        incremental = current_app.config.get('BACKUP_INCREMENTAL', True)
+    compression = '' if incremental else get_backup_compression(compression)
+    extension = MANIFEST_EXTENSION if incremental else BACKUP_EXTENSIONS[compression]
+    destination = unique_backup_path(timestamp, extension)
+    tmp_path = destination + '.tmp'
+    raw_path = tmp_path + '.sqlite' if incremental or compression else tmp_path
+    
+    try:
+        page_size = snapshot_database(raw_path)
+        
+        if incremental:
+            with backup_lock:
+                write_manifest(raw_path, destination, page_size)
+        else:
+            if compression:
+                compress_file(raw_path, tmp_path, compression)
+            os.replace(tmp_path, destination)
+    finally:
+        for leftover in {tmp_path, raw_path}:
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    
+    keep = current_app.config.get('BACKUP_KEEP', 0)
+    if keep:
+        prune_backups(keep)
+    return destination
+
+def list_backup_files():
+    """Return (path, mtime) for every backup in backups/, newest first."""
+    if not os.path.exists(BACKUP_DIR):
+        return []
+    
+    extensions = tuple(BACKUP_EXTENSIONS.values()) + (MANIFEST_EXTENSION,)
+    files = []
+    for filename in os.listdir(BACKUP_DIR):
+        if filename.endswith(extensions):
+            path = os.path.join(BACKUP_DIR, filename)
+            files.append((path, os.path.getmtime(path)))
+    files.sort(key=lambda item: item[1], reverse=True)
+    return files
+
+def gc_backup_chunks(grace_seconds=CHUNK_GC_GRACE_SECONDS):
+    """Delete chunks no manifest references. Returns (chunks, bytes) removed."""
+    if not os.path.exists(CHUNK_DIR):
+        return 0, 0
+    
+    with backup_lock:
+        referenced = set()
+        for path, _ in list_backup_files():
+            if path.endswith(MANIFEST_EXTENSION):
+                try:
+                    referenced.update(read_manifest(path)['chunks'])
+                except (OSError, ValueError, KeyError, BackupError) as e:
+                    # Never collect chunks while a manifest cannot be read
+                    current_app.logger.error(f"Skipping chunk GC, unreadable manifest {path}: {str(e)}")
+                    return 0, 0
+        
+        cutoff = time.time() - grace_seconds
+        removed = 0
+        freed = 0
+        for prefix in os.listdir(CHUNK_DIR):
+            prefix_dir = os.path.join(CHUNK_DIR, prefix)
+            for digest in os.listdir(prefix_dir):
+                path = os.path.join(prefix_dir, digest)
+                if digest in referenced:
+                    continue
+                stat = os.stat(path)
+                if stat.st_mtime > cutoff:
+                    continue
+                os.remove(path)
+                removed += 1
+                freed += stat.st_size
+    return removed, freed
+
+def prune_backups(keep, grace_seconds=CHUNK_GC_GRACE_SECONDS):
+    """Keep the newest `keep` backups, then collect orphaned chunks.
+    
+    Returns a dict with the number of backups, chunks and bytes removed.
+    """
+    removed = 0
+    for path, _ in list_backup_files()[keep:]:
+        os.remove(path)
+        removed += 1
+    chunks, freed = gc_backup_chunks(grace_seconds)
+    return {'backups': removed, 'chunks': chunks, 'bytes': freed}
+
+@click.command('prune-backups')
+@click.option('--keep', type=int, default=None,
+              help='Backups to keep (default: BACKUP_KEEP, or all if unset).')
+@click.option('--grace', type=int, default=CHUNK_GC_GRACE_SECONDS, show_default=True,
+              help='Seconds to keep recently written unreferenced chunks.')
+@with_appcontext
+def prune_backups_command(keep, grace):
+    """Apply backup retention and garbage-collect unreferenced chunks."""
+    if keep is None:
+        keep = current_app.config.get('BACKUP_KEEP', 0)
+    if keep:
+        result = prune_backups(keep, grace)
+    else:
+        chunks, freed = gc_backup_chunks(grace)
+        result = {'backups': 0, 'chunks': chunks, 'bytes': freed}
+    click.echo(f"Removed {result['backups']} backups and {result['chunks']} chunks "
+               f"({format_bytes(result['bytes'])} freed).")
+
+def resolve_backup_path(name):
+    """Map a backup name from a form to its path, or None if it is not a backup.
+
+    Only files directly inside backups/ with a backup extension are accepted,
+    so a crafted name cannot point a restore at an arbitrary file.
+    """
+    if not name:
+        return None
+    backup_dir = os.path.realpath(BACKUP_DIR)
+    path = os.path.realpath(os.path.join(backup_dir, name))
+    extensions = tuple(BACKUP_EXTENSIONS.values()) + (MANIFEST_EXTENSION,)
+    if os.path.dirname(path) != backup_dir or not path.endswith(extensions):
+        return None
+    return path if os.path.isfile(path) else None
+
+def restore_database(backup_file):
+    """Replace the live database's contents with a backup, atomically.
+
+    The backup is unpacked and integrity-checked first, then copied into
+    the live database in a single backup step. That step holds the
+    database write lock, so writers in every worker wait on busy_timeout
+    and readers keep seeing the old data until the restore commits; all
+    existing connections see the restored data on their next read without
+    being closed. Returns (seconds taken, path of the pre-restore backup).
+    """
+    started = time.perf_counter()
+    staged = os.path.join(BACKUP_DIR, f".restore_{os.getpid()}_{threading.get_ident()}.sqlite")
+    try:
+        decompress_backup(backup_file, staged)
+        backup = sqlite3.connect(staged)
+        try:
+            problem = check_integrity(backup)
+            if problem:
+                raise BackupError(f"Backup failed integrity check: {problem}")
+            
+            # Keep the current data recoverable before overwriting it
+            safety_backup = backup_database()
+            version = get_data_version(get_db())
+            sync_state = get_sync_state(get_db())
+            
+            target = connect_db()
+            try:
+                backup.backup(target, pages=-1)
+            finally:
+                target.close()
+        finally:
+            backup.close()
+    finally:
+        if os.path.exists(staged):
+            os.remove(staged)
+    
+    # Drop every worker's connections and cached schema, then bring an older
+    # backup's schema up to date the same way startup does
+    release_db()
+    get_pool().mark_replaced()
+    init_db()
+    # The backup carries its own, older data version; move past the
+    # pre-restore one so clients never revalidate against a repeated ETag
+    db = get_db()
+    if version:
+        bump_data_version(db, version[0])
+    # Row versions in the backup do not follow on from the live ones
+    if sync_state and get_sync_state(db):
+        reset_sync_horizon(db, sync_state['version'])
+    db.commit()
+    return time.perf_counter() - started, safety_backup
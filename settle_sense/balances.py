@@ -0,0 +1,719 @@
+"""
+Trigger-maintained balance aggregates, daily rollups and change history.
+"""
+
+import datetime
+import sqlite3
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from .db import get_db, get_schema, table_columns
+from .formatting import parse_date
+from .money import from_minor
+
+# ---- Balance Aggregates ----
+# Per-person and global balances are kept in summary tables maintained by
+# triggers on debt, so summaries cost O(people) instead of O(rows). Amounts
+# are stored and accumulated as integer minor units (see money.py), so
+# repeated inserts and deletes never drift the way float sums would, and
+# the summaries hand integers to the views, which only convert them to
+# decimals for display and JSON.
+#
+# Rebuilds and consistency checks group debt by person; the covering index
+# on (person, direction, amount_minor) lets them read the index alone.
+BALANCE_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS idx_debt_person_direction_amount "
+    "ON debt(person, direction, amount_minor)"
+)
+
+def _balance_values_sql(ref):
+    """SQL expressions for the aggregate columns contributed by one row."""
+    return (
+        f"CASE WHEN {ref}.direction = 'they_owe' THEN {ref}.amount_minor ELSE 0 END",
+        f"CASE WHEN {ref}.direction = 'you_owe' THEN {ref}.amount_minor ELSE 0 END",
+        f"({ref}.direction = 'they_owe')",
+        f"({ref}.direction = 'you_owe')",
+    )
+
+def _balance_add_sql(ref):
+    owed, owe, owed_count, owe_count = _balance_values_sql(ref)
+    return f'''
+        INSERT INTO person_balance
+            (person, owed_to_you_minor, you_owe_minor, owed_to_you_count, you_owe_count)
+        VALUES ({ref}.person, {owed}, {owe}, {owed_count}, {owe_count})
+        ON CONFLICT(person) DO UPDATE SET
+            owed_to_you_minor = owed_to_you_minor + excluded.owed_to_you_minor,
+            you_owe_minor = you_owe_minor + excluded.you_owe_minor,
+            owed_to_you_count = owed_to_you_count + excluded.owed_to_you_count,
+            you_owe_count = you_owe_count + excluded.you_owe_count;
+        UPDATE balance_totals SET
+            owed_to_you_minor = owed_to_you_minor + {owed},
+            you_owe_minor = you_owe_minor + {owe},
+            owed_to_you_count = owed_to_you_count + {owed_count},
+            you_owe_count = you_owe_count + {owe_count}
+        WHERE id = 1;
+    '''
+
+def _balance_remove_sql(ref):
+    owed, owe, owed_count, owe_count = _balance_values_sql(ref)
+    return f'''
+        UPDATE person_balance SET
+            owed_to_you_minor = owed_to_you_minor - {owed},
+            you_owe_minor = you_owe_minor - {owe},
+            owed_to_you_count = owed_to_you_count - {owed_count},
+            you_owe_count = you_owe_count - {owe_count}
+        WHERE person = {ref}.person;
+        DELETE FROM person_balance
+        WHERE person = {ref}.person AND owed_to_you_count + you_owe_count <= 0;
+        UPDATE balance_totals SET
+            owed_to_you_minor = owed_to_you_minor - {owed},
+            you_owe_minor = you_owe_minor - {owe},
+            owed_to_you_count = owed_to_you_count - {owed_count},
+            you_owe_count = you_owe_count - {owe_count}
+        WHERE id = 1;
+    '''
+
+BALANCE_TRIGGERS = {
+    'trg_debt_balance_insert': f'''
+        CREATE TRIGGER IF NOT EXISTS trg_debt_balance_insert AFTER INSERT ON debt
+        BEGIN {_balance_add_sql('NEW')} END
+    ''',
+    'trg_debt_balance_delete': f'''
+        CREATE TRIGGER IF NOT EXISTS trg_debt_balance_delete AFTER DELETE ON debt
+        BEGIN {_balance_remove_sql('OLD')} END
+    ''',
+    'trg_debt_balance_update': f'''
+        CREATE TRIGGER IF NOT EXISTS trg_debt_balance_update
+        AFTER UPDATE OF person, amount_minor, direction ON debt
+        BEGIN {_balance_remove_sql('OLD')} {_balance_add_sql('NEW')} END
+    ''',
+}
+
+def create_balance_tables(db):
+    """Create the balance summary tables, their triggers and the covering index.
+
+    Returns True if the tables were newly created and still need a rebuild.
+    """
+    existing = db.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name IN ('person_balance', 'balance_totals')"
+    ).fetchone()[0]
+
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS person_balance (
+            person TEXT PRIMARY KEY,
+            owed_to_you_minor INTEGER NOT NULL DEFAULT 0,
+            you_owe_minor INTEGER NOT NULL DEFAULT 0,
+            owed_to_you_count INTEGER NOT NULL DEFAULT 0,
+            you_owe_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS balance_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            owed_to_you_minor INTEGER NOT NULL DEFAULT 0,
+            you_owe_minor INTEGER NOT NULL DEFAULT 0,
+            owed_to_you_count INTEGER NOT NULL DEFAULT 0,
+            you_owe_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    db.execute("INSERT OR IGNORE INTO balance_totals (id) VALUES (1)")
+    db.execute(BALANCE_INDEX_SQL)
+    for trigger_sql in BALANCE_TRIGGERS.values():
+        db.execute(trigger_sql)
+
+    return existing < 2
+
+def _expected_balances_sql():
+    owed, owe, owed_count, owe_count = _balance_values_sql('debt')
+    return f'''
+        SELECT person, SUM({owed}), SUM({owe}), SUM({owed_count}), SUM({owe_count})
+        FROM debt
+        GROUP BY person
+    '''
+
+def rebuild_balances(db):
+    """Recompute the balance summary tables from scratch."""
+    db.execute("DELETE FROM person_balance")
+    db.execute(f'''
+        INSERT INTO person_balance
+            (person, owed_to_you_minor, you_owe_minor, owed_to_you_count, you_owe_count)
+        {_expected_balances_sql()}
+    ''')
+    db.execute('''
+        INSERT OR REPLACE INTO balance_totals
+            (id, owed_to_you_minor, you_owe_minor, owed_to_you_count, you_owe_count)
+        SELECT 1,
+               COALESCE(SUM(owed_to_you_minor), 0),
+               COALESCE(SUM(you_owe_minor), 0),
+               COALESCE(SUM(owed_to_you_count), 0),
+               COALESCE(SUM(you_owe_count), 0)
+        FROM person_balance
+    ''')
+
+def check_balance_consistency(db, repair=True):
+    """Compare the balance tables against debt, rebuilding them on drift.
+
+    Returns True if the tables were consistent (or have been repaired).
+    """
+    try:
+        drift = db.execute(f'''
+            SELECT COUNT(*) FROM (
+                SELECT * FROM ({_expected_balances_sql()})
+                EXCEPT
+                SELECT person, owed_to_you_minor, you_owe_minor, owed_to_you_count, you_owe_count
+                FROM person_balance
+                UNION ALL
+                SELECT person, owed_to_you_minor, you_owe_minor, owed_to_you_count, you_owe_count
+                FROM person_balance
+                EXCEPT
+                SELECT * FROM ({_expected_balances_sql()})
+            )
+        ''').fetchone()[0]
+        totals_drift = db.execute('''
+            SELECT COUNT(*) FROM balance_totals t
+            WHERE t.id = 1 AND (
+                t.owed_to_you_minor != (SELECT COALESCE(SUM(owed_to_you_minor), 0) FROM person_balance)
+                OR t.you_owe_minor != (SELECT COALESCE(SUM(you_owe_minor), 0) FROM person_balance)
+                OR t.owed_to_you_count != (SELECT COALESCE(SUM(owed_to_you_count), 0) FROM person_balance)
+                OR t.you_owe_count != (SELECT COALESCE(SUM(you_owe_count), 0) FROM person_balance)
+            )
+        ''').fetchone()[0]
+    except sqlite3.Error as e:
+        current_app.logger.error(f"Balance consistency check failed: {str(e)}")
+        return False
+
+    if not drift and not totals_drift:
+        return True
+
+    current_app.logger.warning(f"Balance summary drifted ({drift} people, totals: {bool(totals_drift)})")
+    if not repair:
+        return False
+    rebuild_balances(db)
+    db.commit()
+    return True
+
+def get_balance_totals(db, filter_person='', filter_direction=''):
+    """Read headline totals and per-person balances from the summary tables.
+
+    Accepts the same person/direction filters as the dashboard; free-text
+    search cannot be answered from the aggregates and uses get_debt_totals().
+    """
+    if filter_person:
+        rows = db.execute(
+            'SELECT * FROM person_balance WHERE person = ?', (filter_person,)
+        ).fetchall()
+    else:
+        rows = db.execute('SELECT * FROM person_balance').fetchall()
+
+    if filter_person:
+        totals_row = rows[0] if rows else None
+    else:
+        totals_row = db.execute('SELECT * FROM balance_totals WHERE id = 1').fetchone()
+
+    return summarize_balances(rows, totals_row, filter_direction)
+
+def summarize_balances(rows, totals_row, filter_direction=''):
+    """Turn per-person and total balance rows into the dashboard's totals.
+
+    Rows are mappings with the person_balance columns; totals_row has the
+    balance_totals columns (or is None when there is nothing to total).
+    Amounts stay in minor units; decimal_summary() converts them for JSON.
+    """
+    include_owed = filter_direction in ('', 'they_owe')
+    include_owe = filter_direction in ('', 'you_owe')
+
+    people = []
+    for row in rows:
+        owed = row['owed_to_you_minor'] if include_owed else 0
+        owe = row['you_owe_minor'] if include_owe else 0
+        count = (row['owed_to_you_count'] if include_owed else 0) + \
+                (row['you_owe_count'] if include_owe else 0)
+        if count:
+            people.append({'name': row['person'], 'balance': owed - owe})
+
+    owed = totals_row['owed_to_you_minor'] if totals_row and include_owed else 0
+    owe = totals_row['you_owe_minor'] if totals_row and include_owe else 0
+    count = 0
+    if totals_row:
+        count = (totals_row['owed_to_you_count'] if include_owed else 0) + \
+                (totals_row['you_owe_count'] if include_owe else 0)
+
+    return {
+        'entry_count': count,
+        'total_owed_to_you': owed,
+        'total_you_owe': owe,
+        'net_balance': owed - owe,
+        'people': people
+    }
+
+def decimal_summary(summary, exponent):
+    """Copy a summary with its minor-unit amounts converted to decimals."""
+    converted = dict(summary)
+    for key in ('total_owed_to_you', 'total_you_owe', 'net_balance'):
+        converted[key] = from_minor(summary[key], exponent)
+    converted['people'] = [
+        dict(person, balance=from_minor(person['balance'], exponent)) for person in summary['people']
+    ]
+    return converted
+
+# ---- Daily Rollups ----
+# daily_rollup (global) and daily_person_rollup hold each day's change in
+# balances, keyed by the day an entry was created. Triggers on debt keep them
+# current the same way as the balance summary, so a balance-over-time chart
+# reads one row per day instead of replaying every entry.
+def _rollup_day_sql(ref):
+    return f"COALESCE(date({ref}.created_at), date('now', 'localtime'))"
+
+def _rollup_add_sql(ref):
+    owed, owe, owed_count, owe_count = _balance_values_sql(ref)
+    day = _rollup_day_sql(ref)
+    return f'''
+        INSERT INTO daily_rollup
+            (day, owed_to_you_minor, you_owe_minor, owed_to_you_count, you_owe_count)
+        VALUES ({day}, {owed}, {owe}, {owed_count}, {owe_count})
+        ON CONFLICT(day) DO UPDATE SET
+            owed_to_you_minor = owed_to_you_minor + excluded.owed_to_you_minor,
+            you_owe_minor = you_owe_minor + excluded.you_owe_minor,
+            owed_to_you_count = owed_to_you_count + excluded.owed_to_you_count,
+            you_owe_count = you_owe_count + excluded.you_owe_count;
+        INSERT INTO daily_person_rollup
+            (day, person, owed_to_you_minor, you_owe_minor, owed_to_you_count, you_owe_count)
+        VALUES ({day}, {ref}.person, {owed}, {owe}, {owed_count}, {owe_count})
+        ON CONFLICT(day, person) DO UPDATE SET
+            owed_to_you_minor = owed_to_you_minor + excluded.owed_to_you_minor,
+            you_owe_minor = you_owe_minor + excluded.you_owe_minor,
+            owed_to_you_count = owed_to_you_count + excluded.owed_to_you_count,
+            you_owe_count = you_owe_count + excluded.you_owe_count;
+    '''
+
+def _rollup_remove_sql(ref):
+    owed, owe, owed_count, owe_count = _balance_values_sql(ref)
+    day = _rollup_day_sql(ref)
+    return f'''
+        UPDATE daily_rollup SET
+            owed_to_you_minor = owed_to_you_minor - {owed},
+            you_owe_minor = you_owe_minor - {owe},
+            owed_to_you_count = owed_to_you_count - {owed_count},
+            you_owe_count = you_owe_count - {owe_count}
+        WHERE day = {day};
+        DELETE FROM daily_rollup
+        WHERE day = {day} AND owed_to_you_count + you_owe_count <= 0;
+        UPDATE daily_person_rollup SET
+            owed_to_you_minor = owed_to_you_minor - {owed},
+            you_owe_minor = you_owe_minor - {owe},
+            owed_to_you_count = owed_to_you_count - {owed_count},
+            you_owe_count = you_owe_count - {owe_count}
+        WHERE day = {day} AND person = {ref}.person;
+        DELETE FROM daily_person_rollup
+        WHERE day = {day} AND person = {ref}.person AND owed_to_you_count + you_owe_count <= 0;
+    '''
+
+ROLLUP_TRIGGERS = {
+    'trg_debt_rollup_insert': f'''
+        CREATE TRIGGER IF NOT EXISTS trg_debt_rollup_insert AFTER INSERT ON debt
+        BEGIN {_rollup_add_sql('NEW')} END
+    ''',
+    'trg_debt_rollup_delete': f'''
+        CREATE TRIGGER IF NOT EXISTS trg_debt_rollup_delete AFTER DELETE ON debt
+        BEGIN {_rollup_remove_sql('OLD')} END
+    ''',
+    'trg_debt_rollup_update': f'''
+        CREATE TRIGGER IF NOT EXISTS trg_debt_rollup_update
+        AFTER UPDATE OF person, amount_minor, direction, created_at ON debt
+        BEGIN {_rollup_remove_sql('OLD')} {_rollup_add_sql('NEW')} END
+    ''',
+}
+
+def create_rollup_tables(db):
+    """Create the daily rollup tables and their triggers.
+
+    Returns True if the tables were newly created and still need a backfill.
+    """
+    existing = db.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name IN ('daily_rollup', 'daily_person_rollup')"
+    ).fetchone()[0]
+
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS daily_rollup (
+            day TEXT PRIMARY KEY,
+            owed_to_you_minor INTEGER NOT NULL DEFAULT 0,
+            you_owe_minor INTEGER NOT NULL DEFAULT 0,
+            owed_to_you_count INTEGER NOT NULL DEFAULT 0,
+            you_owe_count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS daily_person_rollup (
+            person TEXT NOT NULL,
+            day TEXT NOT NULL,
+            owed_to_you_minor INTEGER NOT NULL DEFAULT 0,
+            you_owe_minor INTEGER NOT NULL DEFAULT 0,
+            owed_to_you_count INTEGER NOT NULL DEFAULT 0,
+            you_owe_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (person, day)
+        ) WITHOUT ROWID
+    ''')
+    for trigger_sql in ROLLUP_TRIGGERS.values():
+        db.execute(trigger_sql)
+
+    return existing < 2
+
+def rebuild_rollups(db):
+    """Backfill the daily rollup tables from debt."""
+    owed, owe, owed_count, owe_count = _balance_values_sql('debt')
+    day = _rollup_day_sql('debt')
+    db.execute("DELETE FROM daily_person_rollup")
+    db.execute(f'''
+        INSERT INTO daily_person_rollup
+            (day, person, owed_to_you_minor, you_owe_minor, owed_to_you_count, you_owe_count)
+        SELECT {day}, person, SUM({owed}), SUM({owe}), SUM({owed_count}), SUM({owe_count})
+        FROM debt
+        GROUP BY 1, 2
+    ''')
+    db.execute("DELETE FROM daily_rollup")
+    db.execute('''
+        INSERT INTO daily_rollup
+            (day, owed_to_you_minor, you_owe_minor, owed_to_you_count, you_owe_count)
+        SELECT day, SUM(owed_to_you_minor), SUM(you_owe_minor),
+               SUM(owed_to_you_count), SUM(you_owe_count)
+        FROM daily_person_rollup
+        GROUP BY day
+    ''')
+
+TIMESERIES_INTERVALS = {
+    'day': "day",
+    'week': "date(day, 'weekday 0', '-6 days')",
+    'month': "strftime('%Y-%m-01', day)",
+}
+TIMESERIES_MAX_BUCKETS = 3660
+
+def _bucket_start(day, interval):
+    """Return the first day of the bucket containing day."""
+    if interval == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+def _next_bucket(day, interval):
+    if interval == 'week':
+        return day + datetime.timedelta(days=7)
+    if interval == 'month':
+        return (day.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return day + datetime.timedelta(days=1)
+
+def get_timeseries(db, interval='day', start=None, end=None, person=''):
+    """Bucket the daily rollups into a balance-over-time series.
+
+    start and end are dates (inclusive) and default to the first rollup day
+    and today. Every bucket in the range is returned, including empty ones,
+    with the running balance carried from everything before start, in
+    decimal amounts for the JSON API. Raises ValueError for an unknown
+    interval or an oversized range.
+    """
+    if interval not in TIMESERIES_INTERVALS:
+        raise ValueError("interval must be one of day, week, month")
+
+    table = 'daily_person_rollup' if person else 'daily_rollup'
+    scope = 'person = ?' if person else '1'
+    params = [person] if person else []
+
+    if start is None:
+        first = db.execute(f"SELECT MIN(day) FROM {table} WHERE {scope}", params).fetchone()[0]
+        start = datetime.date.fromisoformat(first) if first else datetime.date.today()
+    if end is None:
+        end = datetime.date.today()
+    if end < start:
+        raise ValueError("end must not be before start")
+
+    start = _bucket_start(start, interval)
+    buckets = []
+    bucket = start
+    while bucket <= end:
+        buckets.append(bucket)
+        if len(buckets) > TIMESERIES_MAX_BUCKETS:
+            raise ValueError("Date range has too many buckets; use a larger interval")
+        bucket = _next_bucket(bucket, interval)
+
+    opening = db.execute(
+        f"SELECT COALESCE(SUM(owed_to_you_minor - you_owe_minor), 0) FROM {table} "
+        f"WHERE {scope} AND day < ?",
+        params + [start.isoformat()]
+    ).fetchone()[0]
+    rows = db.execute(f'''
+        SELECT {TIMESERIES_INTERVALS[interval]} AS period,
+               SUM(owed_to_you_minor), SUM(you_owe_minor),
+               SUM(owed_to_you_count + you_owe_count)
+        FROM {table}
+        WHERE {scope} AND day BETWEEN ? AND ?
+        GROUP BY period
+    ''', params + [start.isoformat(), end.isoformat()]).fetchall()
+    by_period = {row[0]: row for row in rows}
+
+    exponent = get_schema().currency_exponent
+    balance = opening
+    series = []
+    for bucket in buckets:
+        row = by_period.get(bucket.isoformat())
+        owed, owe, count = (row[1], row[2], row[3]) if row else (0, 0, 0)
+        balance += owed - owe
+        series.append({
+            'period': bucket.isoformat(),
+            'owed_to_you': from_minor(owed, exponent),
+            'you_owe': from_minor(owe, exponent),
+            'net_change': from_minor(owed - owe, exponent),
+            'entries': count,
+            'balance': from_minor(balance, exponent),
+        })
+
+    return {
+        'interval': interval,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'person': person or None,
+        'opening_balance': from_minor(opening, exponent),
+        'buckets': series,
+    }
+
+# ---- Change History ----
+# debt_history is an append-only log of every insert, update and delete on
+# debt, written by triggers with the old and new values. balance_snapshot
+# stores the per-person balances after a given history sequence number, so
+# an "as of" query starts from the latest usable snapshot and only replays
+# the changes logged after it.
+#
+# Inserts are logged at the entry's created_at, so imported or backdated
+# entries count from their own date; updates and deletes at the time they
+# happen. Because those times are not strictly increasing with seq, a
+# snapshot records the latest change time it covers and is only used for
+# dates at or after it.
+HISTORY_NOW_SQL = "strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')"
+# Take a new snapshot once this many changes have been logged since the last
+SNAPSHOT_INTERVAL = 500
+
+HISTORY_TRIGGERS = {
+    'trg_debt_history_insert': f'''
+        CREATE TRIGGER IF NOT EXISTS trg_debt_history_insert AFTER INSERT ON debt
+        BEGIN
+            INSERT INTO debt_history (debt_id, op, changed_at, person, amount_minor, direction, note)
+            VALUES (NEW.id, 'insert', COALESCE(NEW.created_at, {HISTORY_NOW_SQL}),
+                    NEW.person, NEW.amount_minor, NEW.direction, NEW.note);
+        END
+    ''',
+    'trg_debt_history_update': f'''
+        CREATE TRIGGER IF NOT EXISTS trg_debt_history_update
+        AFTER UPDATE OF person, amount_minor, direction, note ON debt
+        BEGIN
+            INSERT INTO debt_history
+                (debt_id, op, changed_at, person, amount_minor, direction, note,
+                 old_person, old_amount_minor, old_direction, old_note)
+            VALUES (NEW.id, 'update', {HISTORY_NOW_SQL},
+                    NEW.person, NEW.amount_minor, NEW.direction, NEW.note,
+                    OLD.person, OLD.amount_minor, OLD.direction, OLD.note);
+        END
+    ''',
+    'trg_debt_history_delete': f'''
+        CREATE TRIGGER IF NOT EXISTS trg_debt_history_delete AFTER DELETE ON debt
+        BEGIN
+            INSERT INTO debt_history
+                (debt_id, op, changed_at, old_person, old_amount_minor, old_direction, old_note)
+            VALUES (OLD.id, 'delete', {HISTORY_NOW_SQL},
+                    OLD.person, OLD.amount_minor, OLD.direction, OLD.note);
+        END
+    ''',
+}
+
+def create_history_tables(db):
+    """Create the change history and snapshot tables and the history triggers.
+
+    Returns True if the history table was newly created and still needs seeding.
+    """
+    existed = bool(table_columns(db, 'debt_history'))
+
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS debt_history (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            debt_id INTEGER NOT NULL,
+            op TEXT NOT NULL CHECK(op IN ('insert', 'update', 'delete')),
+            changed_at TEXT NOT NULL,
+            person TEXT,
+            amount_minor INTEGER,
+            direction TEXT,
+            note TEXT,
+            old_person TEXT,
+            old_amount_minor INTEGER,
+            old_direction TEXT,
+            old_note TEXT
+        )
+    ''')
+    db.execute("CREATE INDEX IF NOT EXISTS idx_debt_history_changed_at ON debt_history(changed_at)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_debt_history_debt ON debt_history(debt_id, seq)")
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS balance_snapshot (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            seq INTEGER NOT NULL,
+            max_changed_at TEXT NOT NULL,
+            taken_at TEXT NOT NULL
+        )
+    ''')
+    db.execute("CREATE INDEX IF NOT EXISTS idx_balance_snapshot_changed_at ON balance_snapshot(max_changed_at, seq)")
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS balance_snapshot_person (
+            snapshot_id INTEGER NOT NULL REFERENCES balance_snapshot(id),
+            person TEXT NOT NULL,
+            owed_to_you_minor INTEGER NOT NULL,
+            you_owe_minor INTEGER NOT NULL,
+            owed_to_you_count INTEGER NOT NULL,
+            you_owe_count INTEGER NOT NULL,
+            PRIMARY KEY (snapshot_id, person)
+        ) WITHOUT ROWID
+    ''')
+    for trigger_sql in HISTORY_TRIGGERS.values():
+        db.execute(trigger_sql)
+
+    return not existed
+
+def seed_history(db):
+    """Log the existing rows as inserts when history starts being recorded.
+
+    Edits made before history existed cannot be recovered, so each row
+    enters the history with its current values at its created_at.
+    """
+    db.execute(f'''
+        INSERT INTO debt_history (debt_id, op, changed_at, person, amount_minor, direction, note)
+        SELECT id, 'insert', COALESCE(created_at, {HISTORY_NOW_SQL}), person, amount_minor, direction, note
+        FROM debt
+        ORDER BY COALESCE(created_at, ''), id
+    ''')
+
+def take_balance_snapshot(db, force=False):
+    """Snapshot the current per-person balances if enough history has built up.
+
+    The snapshot is taken in a write transaction so the balance summary
+    and the history sequence it is labelled with cannot drift apart.
+    Returns the new snapshot id, or None if none was needed.
+    """
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        last = db.execute(
+            "SELECT seq, max_changed_at FROM balance_snapshot ORDER BY seq DESC LIMIT 1"
+        ).fetchone()
+        last_seq = last['seq'] if last else 0
+        pending = db.execute(
+            "SELECT COUNT(*), MAX(seq), MAX(changed_at) FROM debt_history WHERE seq > ?", (last_seq,)
+        ).fetchone()
+        if not pending[0] or (pending[0] < SNAPSHOT_INTERVAL and not force):
+            db.rollback()
+            return None
+
+        max_changed_at = max(pending[2], last['max_changed_at']) if last else pending[2]
+        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        snapshot_id = db.execute(
+            "INSERT INTO balance_snapshot (seq, max_changed_at, taken_at) VALUES (?, ?, ?)",
+            (pending[1], max_changed_at, now)
+        ).lastrowid
+        db.execute('''
+            INSERT INTO balance_snapshot_person
+                (snapshot_id, person, owed_to_you_minor, you_owe_minor, owed_to_you_count, you_owe_count)
+            SELECT ?, person, owed_to_you_minor, you_owe_minor, owed_to_you_count, you_owe_count
+            FROM person_balance
+        ''', (snapshot_id,))
+        db.commit()
+        return snapshot_id
+    except sqlite3.Error:
+        db.rollback()
+        raise
+
+def maybe_take_balance_snapshot(db):
+    """Take a snapshot after a committed write once enough history has built up.
+
+    Write routes call this after they commit, so as-of reads never need
+    the write lock. The pending count is estimated from the sequence
+    numbers without a transaction, and take_balance_snapshot() checks it
+    again under the lock. Failures are only logged: a missed snapshot just
+    means as-of queries replay a little more history.
+    """
+    try:
+        last_seq = db.execute("SELECT MAX(seq) FROM balance_snapshot").fetchone()[0] or 0
+        latest_seq = db.execute("SELECT MAX(seq) FROM debt_history").fetchone()[0] or 0
+        if latest_seq - last_seq < SNAPSHOT_INTERVAL:
+            return None
+        return take_balance_snapshot(db)
+    except sqlite3.OperationalError as e:
+        # Another writer holds the lock; a later write tries again
+        current_app.logger.info(f"Skipped balance snapshot: {str(e)}")
+        return None
+
+def parse_as_of(value):
+    """Parse an as_of parameter into the stored timestamp format.
+
+    A bare date means the end of that day. Raises ValueError if invalid.
+    """
+    value = value.strip()
+    moment = parse_date(value)
+    if len(value) == 10:
+        moment = moment.replace(hour=23, minute=59, second=59)
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+def get_balances_as_of(db, as_of, filter_person='', filter_direction=''):
+    """Return the dashboard totals as they stood at as_of.
+
+    Loads the newest snapshot that only covers changes up to as_of and
+    replays the history logged after it, so the cost is bounded by the
+    snapshot interval rather than the size of the history. Only reads:
+    snapshots are taken by the write routes and `flask snapshot-balances`.
+    """
+    snapshot = db.execute('''
+        SELECT id, seq FROM balance_snapshot
+        WHERE max_changed_at <= ?
+        ORDER BY seq DESC LIMIT 1
+    ''', (as_of,)).fetchone()
+    snapshot_id, since = (snapshot['id'], snapshot['seq']) if snapshot else (None, 0)
+
+    balances = {}
+    columns = ('owed_to_you_minor', 'you_owe_minor', 'owed_to_you_count', 'you_owe_count')
+    if snapshot_id is not None:
+        for row in db.execute(
+            "SELECT * FROM balance_snapshot_person WHERE snapshot_id = ?", (snapshot_id,)
+        ).fetchall():
+            balances[row['person']] = [row[column] for column in columns]
+
+    owed, owe, owed_count, owe_count = _balance_values_sql('change')
+    deltas = db.execute(f'''
+        WITH change AS (
+            SELECT person, amount_minor, direction, 1 AS sign FROM debt_history
+            WHERE seq > ? AND changed_at <= ? AND op != 'delete'
+            UNION ALL
+            SELECT old_person, old_amount_minor, old_direction, -1 FROM debt_history
+            WHERE seq > ? AND changed_at <= ? AND op != 'insert'
+        )
+        SELECT person, SUM(sign * {owed}), SUM(sign * {owe}),
+               SUM(sign * {owed_count}), SUM(sign * {owe_count})
+        FROM change
+        GROUP BY person
+    ''', (since, as_of, since, as_of)).fetchall()
+    for row in deltas:
+        current = balances.setdefault(row[0], [0, 0, 0, 0])
+        for index in range(4):
+            current[index] += row[index + 1]
+
+    rows = [
+        dict(zip(columns, values), person=person)
+        for person, values in balances.items()
+        if (not filter_person or person == filter_person) and values[2] + values[3] > 0
+    ]
+    totals_row = {column: sum(row[column] for row in rows) for column in columns}
+    summary = summarize_balances(rows, totals_row, filter_direction)
+    summary['as_of'] = as_of
+    return summary
+
+@click.command('snapshot-balances')
+@with_appcontext
+def snapshot_balances_command():
+    """Take a balance snapshot for as-of queries now."""
+    db = get_db()
+    snapshot_id = take_balance_snapshot(db, force=True)
+    if snapshot_id is None:
+        click.echo("No changes since the last snapshot.")
+    else:
+        click.echo(f"Took balance snapshot {snapshot_id}.")
@@ -0,0 +1,206 @@
+"""
+Atomic batch write API with idempotency keys.
+"""
+
+import datetime
+import hashlib
+import json
+import sqlite3
+from flask import Blueprint, current_app, request
+from .balances import maybe_take_balance_snapshot
+from .db import get_db, get_schema
+from .live import publish_change
+from .money import format_minor
+from .validation import validate_entry
+
+bp = Blueprint('batch', __name__)
+
+# Integrations send many create/update/delete operations in one JSON request.
+# They are validated up front with validate_entry() and applied atomically
+# in a single transaction. Each operation is validated against the state the
+# earlier operations in the batch leave behind, so an update after an update
+# or delete of the same entry is checked against what it will really meet.
+# An optional Idempotency-Key makes retries safe: the stored response is
+# replayed instead of applying the batch twice.
+
+BATCH_MAX_OPERATIONS = 1000
+IDEMPOTENCY_TTL_HOURS = 24
+
+def create_idempotency_table(db):
+    """Create the table remembering responses to idempotent batch requests."""
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key TEXT PRIMARY KEY,
+            request_hash TEXT NOT NULL,
+            status INTEGER NOT NULL,
+            response TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    ''')
+
+def prepare_batch_operation(db, index, operation, exponent, pending):
+    """Validate one batch operation, returning (prepared op, error message).
+
+    Amounts are decimals, converted to minor units with exponent. pending
+    maps the ids changed by earlier operations in the batch to the values
+    they will have (None once deleted); it is updated for this operation.
+    """
+    if not isinstance(operation, dict):
+        return None, "Operation must be an object"
+
+    op = operation.get('op')
+    if op not in ('create', 'update', 'delete'):
+        return None, "op must be one of create, update, delete"
+
+    if op == 'create':
+        entry, error = validate_entry(
+            operation.get('person'), operation.get('amount'),
+            operation.get('direction'), operation.get('note', ''), exponent
+        )
+        if error:
+            return None, error
+        return {'op': op, 'entry': entry}, None
+
+    entry_id = operation.get('id')
+    if isinstance(entry_id, bool) or not isinstance(entry_id, int):
+        return None, "id must be an integer"
+
+    if entry_id in pending:
+        existing = pending[entry_id]
+        if existing is None:
+            return None, f"Entry {entry_id} was deleted earlier in this batch"
+    else:
+        existing = db.execute('SELECT * FROM debt WHERE id = ?', (entry_id,)).fetchone()
+        if existing is None:
+            return None, f"Entry {entry_id} not found"
+
+    if op == 'delete':
+        pending[entry_id] = None
+        return {'op': op, 'id': entry_id}, None
+
+    # Updates may be partial; unspecified fields keep their current values
+    entry, error = validate_entry(
+        operation.get('person', existing['person']),
+        operation.get('amount', format_minor(existing['amount_minor'], exponent)),
+        operation.get('direction', existing['direction']),
+        operation.get('note', existing['note']),
+        exponent
+    )
+    if error:
+        return None, error
+    pending[entry_id] = entry
+    return {'op': op, 'id': entry_id, 'entry': entry}, None
+
+def apply_batch(db, prepared):
+    """Apply validated operations in the caller's transaction, returning results."""
+    schema = get_schema()
+    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    results = []
+
+    for index, operation in enumerate(prepared):
+        op = operation['op']
+        if op == 'create':
+            entry = operation['entry']
+            cursor = db.execute(schema.insert_sql, schema.insert_params(
+                entry['person'], entry['amount_minor'], entry['direction'], entry['note'], now
+            ))
+            results.append({'index': index, 'op': op, 'status': 'created', 'id': cursor.lastrowid})
+        elif op == 'update':
+            entry = operation['entry']
+            cursor = db.execute(schema.update_sql, schema.update_params(
+                operation['id'], entry['person'], entry['amount_minor'], entry['direction'], entry['note'], now
+            ))
+            if cursor.rowcount != 1:
+                raise LookupError(f"Entry {operation['id']} not found")
+            results.append({'index': index, 'op': op, 'status': 'updated', 'id': operation['id']})
+        else:
+            cursor = db.execute('DELETE FROM debt WHERE id = ?', (operation['id'],))
+            if cursor.rowcount != 1:
+                raise LookupError(f"Entry {operation['id']} not found")
+            results.append({'index': index, 'op': op, 'status': 'deleted', 'id': operation['id']})
+
+    return results
+
+@bp.route('/api/entries/batch', methods=['POST'])
+def api_batch():
+    """Apply a batch of create/update/delete operations in one transaction.
+
+    Body: {"operations": [{"op": "create", "person": ..., "amount": ...,
+    "direction": ..., "note": ...}, {"op": "update", "id": 1, ...},
+    {"op": "delete", "id": 2}]}. Either every operation is applied or none.
+    """
+    from flask import jsonify
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('operations'), list):
+        return jsonify({'error': 'Expected a JSON object with an "operations" list'}), 400
+
+    operations = payload['operations']
+    if not operations:
+        return jsonify({'error': 'No operations given'}), 400
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        return jsonify({'error': f'At most {BATCH_MAX_OPERATIONS} operations per batch'}), 413
+
+    idempotency_key = request.headers.get('Idempotency-Key') or payload.get('idempotency_key')
+    request_hash = hashlib.sha256(
+        json.dumps(operations, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    ).hexdigest()
+
+    db = get_db()
+    try:
+        # Take the write lock up front so validation and writes see one state
+        db.execute('BEGIN IMMEDIATE')
+
+        if idempotency_key:
+            stored = db.execute(
+                'SELECT request_hash, status, response FROM idempotency_keys WHERE key = ?',
+                (idempotency_key,)
+            ).fetchone()
+            if stored is not None:
+                db.rollback()
+                if stored['request_hash'] != request_hash:
+                    return jsonify({'error': 'Idempotency-Key was already used for a different batch'}), 409
+                response = current_app.response_class(stored['response'], status=stored['status'],
+                                              mimetype='application/json')
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+
+        prepared = []
+        errors = []
+        pending = {}
+        exponent = get_schema().currency_exponent
+        for index, operation in enumerate(operations):
+            prepared_op, error = prepare_batch_operation(db, index, operation, exponent, pending)
+            if error:
+                errors.append({'index': index, 'op': operation.get('op') if isinstance(operation, dict) else None,
+                               'error': error})
+            else:
+                prepared.append(prepared_op)
+
+        if errors:
+            db.rollback()
+            return jsonify({'error': 'Validation failed; no operations were applied', 'results': errors}), 422
+
+        results = apply_batch(db, prepared)
+        body = {'applied': len(results), 'results': results}
+
+        if idempotency_key:
+            cutoff = (datetime.datetime.now() - datetime.timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+                      ).strftime('%Y-%m-%d %H:%M:%S')
+            db.execute('DELETE FROM idempotency_keys WHERE created_at < ?', (cutoff,))
+            db.execute(
+                'INSERT INTO idempotency_keys (key, request_hash, status, response, created_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (idempotency_key, request_hash, 200, json.dumps(body),
+                 datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            )
+
+        db.commit()
+        publish_change(db, 'batch', count=len(results))
+        maybe_take_balance_snapshot(db)
+        return jsonify(body)
+
+    except (sqlite3.Error, LookupError) as e:
+        db.rollback()
+        current_app.logger.error(f"Error applying batch: {str(e)}")
+        return jsonify({'error': 'Batch failed; no operations were applied', 'details': str(e)}), 409
@@ -0,0 +1,151 @@
+"""
+Conditional GET support driven by a data version counter.
+"""
+
+import datetime
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+from flask import current_app, request, make_response, session
+from .config import BASE_DIR
+from .db import get_db, table_columns
+from .settings import get_settings
+
+# Responses derived from the ledger carry a weak ETag built from a data
+# version that triggers bump on every write, so a client revalidating an
+# unchanged page gets a 304 before the view runs a single query. PRAGMA
+# data_version is not used: it only reports changes made by *other*
+# connections and its value differs per connection, so it cannot be shared
+# across pooled connections or workers. The counter lives in the database
+# instead and is the same for everyone reading it.
+#
+# The version is read before the view runs. If a write lands in between,
+# the response is newer than its ETag, which only costs the client one
+# extra full response on its next request.
+DATA_VERSION_TABLES = ('debt', 'ledger', 'ledger_entry')
+
+def _data_version_trigger_sql(table, event):
+    return f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event} AFTER {event.upper()} ON {table}
+        BEGIN
+            UPDATE data_version SET version = version + 1,
+                changed_at = strftime('%Y-%m-%d %H:%M:%S', 'now')
+            WHERE id = 1;
+        END
+    '''
+
+DATA_VERSION_TRIGGERS = {
+    f'trg_{table}_version_{event}': _data_version_trigger_sql(table, event)
+    for table in DATA_VERSION_TABLES
+    for event in ('insert', 'update', 'delete')
+}
+
+def create_data_version_table(db):
+    """Create the data version counter and the triggers that bump it.
+
+    Triggers are only created for tables that exist yet; call it again
+    after creating a tracked table.
+    """
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK(id = 1),
+            version INTEGER NOT NULL,
+            changed_at TEXT NOT NULL
+        )
+    ''')
+    db.execute('''
+        INSERT OR IGNORE INTO data_version (id, version, changed_at)
+        VALUES (1, 1, strftime('%Y-%m-%d %H:%M:%S', 'now'))
+    ''')
+    for name, trigger_sql in DATA_VERSION_TRIGGERS.items():
+        table = name[len('trg_'):name.rindex('_version_')]
+        if table_columns(db, table):
+            db.execute(trigger_sql)
+
+def get_data_version(db):
+    """Return (version, last change as a UTC datetime), or None before migration."""
+    try:
+        row = db.execute("SELECT version, changed_at FROM data_version WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    if row is None:
+        return None
+    changed_at = datetime.datetime.strptime(row[1], '%Y-%m-%d %H:%M:%S')
+    return row[0], changed_at.replace(tzinfo=datetime.timezone.utc)
+
+def bump_data_version(db, minimum=0):
+    """Advance the data version past both its current value and minimum."""
+    db.execute('''
+        UPDATE data_version SET version = MAX(version, ?) + 1,
+            changed_at = strftime('%Y-%m-%d %H:%M:%S', 'now')
+        WHERE id = 1
+    ''', (minimum,))
+
+_build_stamp = None
+
+def get_build_stamp():
+    """Return a stamp of the code and templates, so a deploy changes every ETag.
+
+    It is derived from file modification times rather than the process, so
+    all workers running the same code agree on it.
+    """
+    global _build_stamp
+    if _build_stamp is None:
+        paths = [os.path.join(BASE_DIR, name) for name in os.listdir(BASE_DIR)
+                 if name.endswith('.py')]
+        for root, _dirs, files in os.walk(os.path.join(BASE_DIR, 'templates')):
+            paths.extend(os.path.join(root, name) for name in files)
+        _build_stamp = max(os.stat(path).st_mtime_ns for path in paths)
+    return _build_stamp
+
+def conditional_on_data(cache_control='private, no-cache'):
+    """Make a view answer conditional GETs from the data version.
+
+    The ETag covers the data version, the settings (theme, currency and
+    date format change the rendered output) and the code, and is set on
+    successful responses along with Last-Modified and cache_control. A
+    request whose If-None-Match matches, or failing that whose
+    If-Modified-Since is not older than the last change, gets a 304
+    without the view running. Pages with pending flash messages are never
+    answered from cache.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            version = get_data_version(get_db())
+            if version is None or session.get('_flashes'):
+                response = make_response(view(*args, **kwargs))
+                response.headers['Cache-Control'] = 'no-store'
+                return response
+            
+            settings = json.dumps(dict(get_settings()), sort_keys=True, default=str)
+            etag = hashlib.sha1(
+                f"{version[0]}:{get_build_stamp()}:{settings}".encode('utf-8')
+            ).hexdigest()[:20]
+            # Whole seconds only, and never the current second: a write later
+            # in the same second would otherwise keep the same Last-Modified
+            now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+            last_modified = version[1] if version[1] < now else None
+            
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            elif request.if_modified_since and last_modified:
+                not_modified = last_modified <= request.if_modified_since
+            else:
+                not_modified = False
+            
+            if not_modified:
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified:
+                response.last_modified = last_modified
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return wrapper
+    return decorator
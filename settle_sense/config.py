@@ -0,0 +1,54 @@
+"""
+Configuration for SettleSense.
+
+Settings come from the environment (and a .env file if present). They are
+read when an app is created, not when the package is imported.
+"""
+
+import os
+from dotenv import load_dotenv
+
+# Application Constants
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+DATABASE = os.path.join(BASE_DIR, 'instance', 'debts.sqlite')
+
+def load_config():
+    """Return the app configuration read from the environment."""
+    # Load environment variables from .env file if present
+    load_dotenv()
+    return dict(
+        DATABASE=os.environ.get('DATABASE_PATH', DATABASE),
+        DEBUG=os.environ.get('DEBUG', 'False').lower() == 'true',
+        SECRET_KEY=os.environ.get('SECRET_KEY', 'dev-key-change-in-production'),
+        # Decimal places of the currency's minor unit; recorded in a new or
+        # converted database, which keeps its own from then on
+        CURRENCY_EXPONENT=int(os.environ.get('CURRENCY_EXPONENT', 2)),
+        # Reuse connections across requests; set DB_POOL=false for one per request
+        DB_POOL=os.environ.get('DB_POOL', 'True').lower() == 'true',
+        DB_POOL_SIZE=int(os.environ.get('DB_POOL_SIZE', 8)),
+        # SQLite tuning (cache_size is negative KiB, mmap_size in bytes)
+        DB_CACHE_SIZE=int(os.environ.get('DB_CACHE_SIZE', -16000)),
+        DB_MMAP_SIZE=int(os.environ.get('DB_MMAP_SIZE', 64 * 1024 * 1024)),
+        DB_BUSY_TIMEOUT=int(os.environ.get('DB_BUSY_TIMEOUT', 5000)),
+        # Incremental backups share unchanged chunks; full backups are single files
+        BACKUP_INCREMENTAL=os.environ.get('BACKUP_INCREMENTAL', 'True').lower() == 'true',
+        # Full backup compression: '' (none), 'gzip' or 'zstd' (needs zstandard)
+        BACKUP_COMPRESSION=os.environ.get('BACKUP_COMPRESSION', ''),
+        # Number of backups to keep (0 keeps all)
+        BACKUP_KEEP=int(os.environ.get('BACKUP_KEEP', 0)),
+        # Production server: worker processes, threads per worker and timeouts (seconds)
+        WEB_WORKERS=int(os.environ.get('WEB_WORKERS', os.cpu_count() or 1)),
+        WEB_THREADS=int(os.environ.get('WEB_THREADS', 8)),
+        WEB_KEEPALIVE=int(os.environ.get('WEB_KEEPALIVE', 5)),
+        WEB_TIMEOUT=int(os.environ.get('WEB_TIMEOUT', 30)),
+        WEB_GRACEFUL_TIMEOUT=int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30)),
+        # Open live update streams per worker; each holds a thread of its own
+        # on top of WEB_THREADS, so streams never starve ordinary requests
+        LIVE_MAX_CLIENTS=int(os.environ.get('LIVE_MAX_CLIENTS', 200)),
+        # Per-endpoint request metrics at /metrics and Server-Timing headers
+        METRICS=os.environ.get('METRICS', 'True').lower() == 'true',
+        # Directory where worker processes share their metrics ('' keeps them per process)
+        METRICS_DIR=os.environ.get('METRICS_DIR', ''),
+        # Log statements slower than this many milliseconds with their query plans (0 is off)
+        SLOW_QUERY_MS=float(os.environ.get('SLOW_QUERY_MS', 0)),
+    )
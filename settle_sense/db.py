@@ -0,0 +1,406 @@
+"""
+Database connections for SettleSense.
+
+Each app owns a pool of idle SQLite connections; a request borrows one
+through get_db() and hands it back at teardown. The schema descriptor
+caches the shape of the debt table between migrations.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from flask import current_app, g
+from .money import DEFAULT_CURRENCY_EXPONENT, get_currency_exponent
+from .search import fts_available
+
+# Database Connection Management
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that adds its statements and their run time to its connection.
+
+    Executing and the fetch*() calls are timed; rows pulled by iterating
+    over the cursor are not, so that cost shows up as application time.
+    With a slow-query log attached to the connection each statement's
+    time is also reported to it (see querylog.py).
+    """
+    _trace = None
+
+    def _executed(self, started, sql, parameters, many=False):
+        elapsed = time.perf_counter() - started
+        connection = self.connection
+        connection.sql_queries += 1
+        connection.sql_seconds += elapsed
+        if connection.query_log is not None:
+            self._trace = connection.query_log.begin(connection, sql, parameters, elapsed, many)
+
+    def _fetched(self, started):
+        elapsed = time.perf_counter() - started
+        connection = self.connection
+        connection.sql_seconds += elapsed
+        if self._trace is not None:
+            connection.query_log.add(connection, self._trace, elapsed)
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return sqlite3.Cursor.execute(self, sql, parameters)
+        finally:
+            self._executed(started, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return sqlite3.Cursor.executemany(self, sql, seq_of_parameters)
+        finally:
+            self._executed(started, sql, seq_of_parameters, many=True)
+
+    def executescript(self, sql_script):
+        started = time.perf_counter()
+        try:
+            return sqlite3.Cursor.executescript(self, sql_script)
+        finally:
+            self._executed(started, sql_script, (), many=True)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        try:
+            return sqlite3.Cursor.fetchone(self)
+        finally:
+            self._fetched(started)
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        try:
+            return sqlite3.Cursor.fetchmany(self, self.arraysize if size is None else size)
+        finally:
+            self._fetched(started)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return sqlite3.Cursor.fetchall(self)
+        finally:
+            self._fetched(started)
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that remembers the pool generation it belongs to.
+
+    It also counts the SQL statements run through it and their time, which
+    get_db() resets for every request (see metrics.py), and reports them to
+    query_log when the slow-query log is on.
+    """
+    pool_generation = None
+    sql_queries = 0
+    sql_seconds = 0.0
+    query_log = None
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+def connect_db(config=None):
+    """Open a new database connection with the tuned PRAGMAs applied.
+
+    config defaults to the current app's; code that runs after the request
+    context is gone (a streaming response) passes it in explicitly.
+    """
+    if config is None:
+        config = current_app.config
+    db = sqlite3.connect(
+        config['DATABASE'],
+        timeout=config['DB_BUSY_TIMEOUT'] / 1000,
+        check_same_thread=False,
+        factory=PooledConnection
+    )
+    db.row_factory = sqlite3.Row
+    # WAL lets readers and the writer proceed concurrently
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute(f"PRAGMA cache_size={int(config['DB_CACHE_SIZE'])}")
+    db.execute(f"PRAGMA mmap_size={int(config['DB_MMAP_SIZE'])}")
+    db.execute(f"PRAGMA busy_timeout={int(config['DB_BUSY_TIMEOUT'])}")
+    db.execute("PRAGMA temp_store=MEMORY")
+    return db
+
+class ConnectionPool:
+    """Per-worker pool of idle SQLite connections.
+
+    Connections are handed to one request at a time and returned at
+    teardown. Each connection remembers the pool generation it was opened
+    in; recycle() bumps the generation so connections opened against a
+    database file that has since been replaced are closed instead of
+    reused. The generation is also bumped automatically when the database
+    file's inode changes (e.g. another worker renamed a restored copy into
+    place) or when another worker calls mark_replaced(), and the pool
+    resets itself after a fork so every worker process opens its own
+    connections.
+    """
+
+    def __init__(self, factory, path, max_idle):
+        self.factory = factory
+        self.path = path
+        # Replaced by mark_replaced() for changes that keep the database's inode
+        self.marker_path = path + '-generation'
+        self.max_idle = max_idle
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._idle = []
+        self._pid = os.getpid()
+        self._file_id = None
+
+    def _current_file_id(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        try:
+            marker = os.stat(self.marker_path)
+            marker_id = (marker.st_ino, marker.st_mtime_ns)
+        except OSError:
+            marker_id = None
+        return (stat.st_dev, stat.st_ino, marker_id)
+
+    def _retire_idle(self):
+        """Start a new generation, returning the idle connections to close."""
+        self.generation += 1
+        idle, self._idle = self._idle, []
+        return idle
+
+    def _check_owner(self):
+        if self._pid != os.getpid():
+            # Connections inherited from the parent must not be used or closed
+            self._idle = []
+            self._pid = os.getpid()
+
+    def _healthy(self, db):
+        try:
+            if db.in_transaction:
+                db.rollback()
+            db.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """Return a healthy connection, reusing an idle one if possible."""
+        file_id = self._current_file_id()
+        with self._lock:
+            self._check_owner()
+            stale = self._check_file_id(file_id)
+            db = self._idle.pop() if self._idle else None
+            generation = self.generation
+
+        for conn in stale:
+            conn.close()
+
+        if db is not None:
+            if self._healthy(db):
+                return db
+            db.close()
+
+        db = self.factory()
+        db.pool_generation = generation
+        return db
+
+    def release(self, db):
+        """Return a connection to the pool, closing it if it is stale."""
+        try:
+            if db.in_transaction:
+                db.rollback()
+        except sqlite3.Error:
+            db.close()
+            return
+
+        with self._lock:
+            self._check_owner()
+            if db.pool_generation == self.generation and len(self._idle) < self.max_idle:
+                self._idle.append(db)
+                return
+        db.close()
+
+    def _check_file_id(self, file_id):
+        if file_id == self._file_id:
+            return []
+        self._file_id = file_id
+        return self._retire_idle()
+
+    def check_file(self):
+        """Start a new generation if the database file or its marker changed.
+
+        acquire() does this itself; get_db() calls it when pooling is off,
+        so the schema descriptor still notices other workers' changes. It
+        costs two stat() calls and no SQL.
+        """
+        file_id = self._current_file_id()
+        with self._lock:
+            stale = self._check_file_id(file_id)
+        for db in stale:
+            db.close()
+
+    def recycle(self):
+        """Close idle connections and retire any that are still in use."""
+        with self._lock:
+            idle = self._retire_idle()
+        for db in idle:
+            db.close()
+
+    def mark_replaced(self):
+        """Recycle this pool and every other worker's after an in-place change.
+
+        A restore through the backup API or a migration changes the
+        database without changing its inode. Replacing the marker file
+        gives the database a new file id, which every pool's next
+        acquire() or check_file() notices.
+        """
+        temp_path = f"{self.marker_path}.{os.getpid()}.{threading.get_ident()}"
+        with open(temp_path, 'w') as f:
+            f.write(f"{time.time_ns()}\n")
+        os.replace(temp_path, self.marker_path)
+        file_id = self._current_file_id()
+        with self._lock:
+            self._file_id = file_id
+            idle = self._retire_idle()
+        for db in idle:
+            db.close()
+
+def get_pool():
+    """Return the current app's connection pool."""
+    return current_app.extensions['db_pool']
+
+def get_db():
+    """Return the database connection for the current request.
+
+    The first connection an app hands out also runs its schema check
+    (app.extensions['db_setup'], see schema.ensure_db), so nothing touches
+    the schema until something actually uses the database.
+    """
+    db = getattr(g, '_database', None)
+    if db is None:
+        if current_app.config['DB_POOL']:
+            db = get_pool().acquire()
+        else:
+            get_pool().check_file()
+            db = connect_db()
+        db.sql_queries = 0
+        db.sql_seconds = 0.0
+        db.query_log = current_app.extensions.get('slow_queries')
+        g._database = db
+        if not current_app.extensions.get('db_ready'):
+            current_app.extensions['db_setup']()
+    return db
+
+def release_db():
+    """Hand the current request's connection back to the pool (or close it)."""
+    db = g.pop('_database', None)
+    if db is None:
+        return
+    if current_app.config['DB_POOL']:
+        get_pool().release(db)
+    else:
+        db.close()
+
+def close_db(exc):
+    """Release the database connection at the end of a request."""
+    release_db()
+
+# Schema Descriptor
+class SchemaDescriptor:
+    """Snapshot of the debt table's shape and the SQL prepared for it.
+
+    Routes used to run PRAGMA table_info(debt) on every request to find out
+    whether the timestamp columns exist. The descriptor reads that once and
+    is only rebuilt when the pool generation changes: after run_migration()
+    or a restore in any worker (ConnectionPool.mark_replaced), or when the
+    database file was swapped. It also carries the currency exponent the
+    amounts are stored with. PRAGMA schema_version and user_version are
+    recorded for diagnostics.
+    """
+
+    def __init__(self, db, generation=None):
+        self.columns = frozenset(
+            row['name'] for row in db.execute("PRAGMA table_info(debt)").fetchall()
+        )
+        self.schema_version = db.execute("PRAGMA schema_version").fetchone()[0]
+        self.user_version = db.execute("PRAGMA user_version").fetchone()[0]
+        self.has_search_index = fts_available() and db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='debt_fts'"
+        ).fetchone() is not None
+        self.generation = generation
+
+        self.has_created_at = 'created_at' in self.columns
+        self.has_updated_at = 'updated_at' in self.columns
+        # Tables from before integer amounts still hold decimal REAL amounts
+        # and must go through the integer_amounts migration step
+        self.has_minor_amounts = 'amount_minor' in self.columns
+        self.currency_exponent = get_currency_exponent(db)
+        if self.currency_exponent is None:
+            self.currency_exponent = DEFAULT_CURRENCY_EXPONENT
+
+        # Prepared statements for the write paths
+        if self.has_created_at and self.has_updated_at:
+            self.insert_sql = (
+                'INSERT INTO debt (person, amount_minor, direction, note, created_at, updated_at) '
+                'VALUES (?,?,?,?,?,?)'
+            )
+        else:
+            self.insert_sql = 'INSERT INTO debt (person, amount_minor, direction, note) VALUES (?,?,?,?)'
+        if self.has_updated_at:
+            self.update_sql = 'UPDATE debt SET person=?, amount_minor=?, direction=?, note=?, updated_at=? WHERE id=?'
+        else:
+            self.update_sql = 'UPDATE debt SET person=?, amount_minor=?, direction=?, note=? WHERE id=?'
+
+        # Expression the dashboard and export order by for "date"
+        self.date_sort = "COALESCE(debt.created_at, '')" if self.has_created_at else 'debt.id'
+
+    def insert_params(self, person, amount_minor, direction, note, now):
+        """Parameters matching insert_sql."""
+        if self.has_created_at and self.has_updated_at:
+            return (person, amount_minor, direction, note, now, now)
+        return (person, amount_minor, direction, note)
+
+    def update_params(self, entry_id, person, amount_minor, direction, note, now):
+        """Parameters matching update_sql."""
+        if self.has_updated_at:
+            return (person, amount_minor, direction, note, now, entry_id)
+        return (person, amount_minor, direction, note, entry_id)
+
+def get_schema():
+    """Return the app's cached schema descriptor, loading it on first use."""
+    schema = current_app.extensions.get('db_schema')
+    if schema is None or schema.generation != get_pool().generation:
+        schema = refresh_schema()
+    return schema
+
+def refresh_schema(db=None):
+    """Re-read the schema descriptor after a migration or restore."""
+    schema = SchemaDescriptor(db or get_db(), get_pool().generation)
+    current_app.extensions['db_schema'] = schema
+    return schema
+
+SORT_INDEXES = {
+    'idx_debt_person': "CREATE INDEX IF NOT EXISTS idx_debt_person ON debt(person)",
+    'idx_debt_direction': "CREATE INDEX IF NOT EXISTS idx_debt_direction ON debt(direction)",
+    'idx_debt_amount': "CREATE INDEX IF NOT EXISTS idx_debt_amount ON debt(amount_minor)",
+    'idx_debt_created_at': "CREATE INDEX IF NOT EXISTS idx_debt_created_at ON debt(COALESCE(created_at, ''))",
+}
+
+def create_sort_indexes(db):
+    """Create the indexes backing each dashboard sort mode.
+
+    Every index implicitly ends with the rowid, so each one also orders the
+    (sort key, id) pairs used by keyset pagination.
+    """
+    for index_sql in SORT_INDEXES.values():
+        db.execute(index_sql)
+
+def table_columns(db, table):
+    """Return the column names of a table (empty if it does not exist)."""
+    return {row[1] for row in db.execute(f"PRAGMA table_info({table})").fetchall()}
@@ -0,0 +1,222 @@
+"""
+Streaming exports in CSV, NDJSON, JSON and a compact binary format.
+"""
+
+import csv
+import json
+import struct
+import zlib
+from io import StringIO
+from flask import Blueprint, current_app, request, redirect, url_for, flash
+from .caching import conditional_on_data
+from .db import connect_db, get_db, get_schema
+from .queries import build_debt_filters, get_sort_expression
+
+bp = Blueprint('exports', __name__)
+
+# Exports stream from a dedicated connection in fetchmany() batches, so
+# memory stays flat and the first bytes go out before the last row is read.
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_COLUMNS = (
+    ('id', 'ID'),
+    ('person', 'Person'),
+    ('amount', 'Amount'),
+    ('direction', 'Direction'),
+    ('note', 'Note'),
+    ('created_at', 'Created At'),
+    ('updated_at', 'Updated At'),
+)
+# Amounts are stored in minor units and exported as decimals, so exports
+# stay readable and can be imported back
+EXPORT_SOURCES = {'amount': 'amount_minor'}
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'json': ('application/json', 'json'),
+    'binary': ('application/octet-stream', 'ssx'),
+}
+
+def export_expression(column, exponent):
+    """SQL for one exported column."""
+    if column == 'amount':
+        return f"debt.amount_minor / {10 ** exponent}.0"
+    return f"debt.{column}"
+
+def iter_export_batches(config, filters, sort_expr, descending, columns, exponent):
+    """Yield lists of row tuples for an export, one batch at a time.
+
+    config is the app config, since the batches are read after the request
+    context is gone; exponent is the database's currency exponent.
+    """
+    order = 'DESC' if descending else 'ASC'
+    select = ', '.join(export_expression(col, exponent) for col in columns)
+    query = f'''
+        SELECT {select}
+        FROM {filters.source}
+        WHERE {filters.where}
+        ORDER BY {sort_expr} {order}, debt.id {order}
+    '''
+
+    # The response outlives the request's pooled connection, so use our own
+    db = connect_db(config)
+    db.row_factory = None
+    try:
+        cursor = db.execute(query, filters.params)
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            yield rows
+    finally:
+        db.close()
+
+def encode_csv(batches, columns):
+    """Encode batches as CSV with the historical export headers."""
+    headers = dict(EXPORT_COLUMNS)
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([headers[col] for col in columns])
+    for rows in batches:
+        writer.writerows(('' if value is None else value for value in row) for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def encode_ndjson(batches, columns):
+    """Encode batches as newline-delimited JSON objects."""
+    for rows in batches:
+        yield ''.join(
+            json.dumps(dict(zip(columns, row)), separators=(',', ':')) + '\n'
+            for row in rows
+        ).encode('utf-8')
+
+def encode_json(batches, columns):
+    """Encode batches as a single JSON array, streamed element by element."""
+    yield b'['
+    first = True
+    for rows in batches:
+        parts = []
+        for row in rows:
+            parts.append(('' if first else ',') + json.dumps(dict(zip(columns, row)), separators=(',', ':')))
+            first = False
+        yield ''.join(parts).encode('utf-8')
+    yield b']'
+
+# Binary export column types
+BINARY_INT, BINARY_FLOAT, BINARY_TEXT, BINARY_DIRECTION = b'i', b'f', b's', b'd'
+BINARY_NULL_LENGTH = 0xFFFFFFFF
+BINARY_COLUMN_TYPES = {
+    'id': BINARY_INT,
+    'amount': BINARY_FLOAT,
+    'direction': BINARY_DIRECTION,
+}
+
+def encode_binary(batches, columns):
+    """Encode batches in the compact columnar SSX1 format.
+
+    All integers are little-endian. The stream starts with the magic b'SSX1',
+    a uint16 column count and, per column, a one-byte type code (i=int64,
+    f=float64, s=text, d=direction) followed by a uint16-length-prefixed UTF-8
+    name. Then come blocks: a uint32 row count (0 ends the stream) followed
+    by each column's values for that block. int64/float64 columns are packed
+    arrays; direction is one byte per row (0=you_owe, 1=they_owe); text is a
+    uint32 length per row (0xFFFFFFFF for NULL) followed by the concatenated
+    UTF-8 bytes.
+    """
+    types = [BINARY_COLUMN_TYPES.get(col, BINARY_TEXT) for col in columns]
+
+    header = [b'SSX1', struct.pack('<H', len(columns))]
+    for col, col_type in zip(columns, types):
+        name = col.encode('utf-8')
+        header.append(col_type + struct.pack('<H', len(name)) + name)
+    yield b''.join(header)
+
+    for rows in batches:
+        block = [struct.pack('<I', len(rows))]
+        for index, col_type in enumerate(types):
+            values = [row[index] for row in rows]
+            if col_type == BINARY_INT:
+                block.append(struct.pack(f'<{len(values)}q', *values))
+            elif col_type == BINARY_FLOAT:
+                block.append(struct.pack(f'<{len(values)}d', *values))
+            elif col_type == BINARY_DIRECTION:
+                block.append(bytes(1 if value == 'they_owe' else 0 for value in values))
+            else:
+                encoded = [None if value is None else str(value).encode('utf-8') for value in values]
+                block.append(struct.pack(
+                    f'<{len(encoded)}I',
+                    *(BINARY_NULL_LENGTH if value is None else len(value) for value in encoded)
+                ))
+                block.append(b''.join(value for value in encoded if value))
+        yield b''.join(block)
+    yield struct.pack('<I', 0)
+
+EXPORT_ENCODERS = {
+    'csv': encode_csv,
+    'ndjson': encode_ndjson,
+    'json': encode_json,
+    'binary': encode_binary,
+}
+
+def gzip_stream(chunks):
+    """Compress a stream of byte chunks into a gzip member on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+@bp.route('/export', methods=['GET'])
+@conditional_on_data('private, max-age=0, must-revalidate')
+def export_csv():
+    """Export debt records as CSV, NDJSON, JSON or binary, optionally gzipped.
+
+    Accepts the dashboard's search/person/direction/sort/order parameters,
+    plus format=csv|ndjson|json|binary and compress=gzip.
+    """
+    from flask import Response
+    
+    db = get_db()
+    schema = get_schema()
+    
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        flash(f"Unsupported export format: {export_format}", "error")
+        return redirect(url_for('dashboard.index'))
+    compress = request.args.get('compress', '').lower() == 'gzip'
+    
+    # Same filtering and ordering as the dashboard (newest first by default)
+    search_query = request.args.get('search', '').strip()
+    filter_person = request.args.get('person', '').strip()
+    filter_direction = request.args.get('direction', '').strip()
+    sort_by = request.args.get('sort') or 'date'
+    sort_order = request.args.get('order', 'desc')
+    
+    filters = build_debt_filters(db, search_query, filter_person, filter_direction)
+    sort_expr = get_sort_expression(sort_by, schema, filters)
+    columns = [col for col, _ in EXPORT_COLUMNS if EXPORT_SOURCES.get(col, col) in schema.columns]
+    
+    batches = iter_export_batches(current_app.config, filters, sort_expr, sort_order != 'asc',
+                                  columns, schema.currency_exponent)
+    body = EXPORT_ENCODERS[export_format](batches, columns)
+    
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    filename = f"SettleSense_Export.{extension}"
+    if compress:
+        body = gzip_stream(body)
+        mimetype = 'application/gzip'
+        filename += '.gz'
+    
+    return Response(
+        body,
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment;filename={filename}'
+        }
+    )
@@ -0,0 +1,71 @@
+"""
+Formatting helpers shared by the templates, exports and settings pages.
+"""
+
+import datetime
+from .money import DEFAULT_CURRENCY_EXPONENT, format_minor
+
+# Data Formatting Helpers
+DATE_FORMATS = {
+    'MM/DD/YYYY': '%m/%d/%Y',
+    'DD/MM/YYYY': '%d/%m/%Y',
+    'YYYY-MM-DD': '%Y-%m-%d',
+}
+
+def parse_date(value):
+    """Parse a stored timestamp into a datetime, or return None."""
+    if isinstance(value, datetime.datetime):
+        return value
+    if 'T' in value:
+        # ISO format with T separator
+        return datetime.datetime.fromisoformat(value)
+    elif ' ' in value:
+        # SQLite format with space separator
+        return datetime.datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+    # Just date
+    return datetime.datetime.strptime(value, '%Y-%m-%d')
+
+def make_currency_formatter(settings, exponent=DEFAULT_CURRENCY_EXPONENT):
+    """Build a currency formatter bound to the given settings."""
+    symbol = settings.get('currency_symbol', '$')
+
+    def format_currency(value):
+        """Format an amount in integer minor units as currency."""
+        return f"{symbol}{format_minor(abs(value), exponent)}"
+
+    return format_currency
+
+def make_amount_formatter(exponent=DEFAULT_CURRENCY_EXPONENT):
+    """Build a formatter turning minor units into plain decimal text.
+
+    Used where a number is needed rather than a price: form values, input
+    steps and chart data.
+    """
+    def format_amount(value):
+        return format_minor(value, exponent)
+
+    return format_amount
+
+def make_date_formatter(settings):
+    """Build a date formatter bound to the given settings."""
+    pattern = DATE_FORMATS.get(settings.get('date_format', 'YYYY-MM-DD'), '%Y-%m-%d')
+
+    def format_date(value):
+        """Format a date string nicely."""
+        if not value:
+            return "N/A"
+        try:
+            return parse_date(value).strftime(pattern)
+        except (ValueError, TypeError):
+            return str(value)
+
+    return format_date
+
+
+def format_bytes(size_bytes):
+    """Format a byte count for display."""
+    if size_bytes < 1024:
+        return f"{size_bytes} bytes"
+    elif size_bytes < 1024 * 1024:
+        return f"{size_bytes / 1024:.1f} KB"
+    return f"{size_bytes / (1024 * 1024):.1f} MB"
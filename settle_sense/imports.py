@@ -0,0 +1,263 @@
+"""
+Streaming bulk import of CSV and NDJSON ledgers.
+"""
+
+import csv
+import datetime
+import gzip
+import io
+import json
+import re
+import sqlite3
+import time
+import click
+from flask import Blueprint, request, redirect, url_for, flash
+from flask.cli import with_appcontext
+from .balances import maybe_take_balance_snapshot
+from .db import get_db, get_schema
+from .formatting import parse_date
+from .live import publish_change
+from .validation import validate_entry
+
+bp = Blueprint('imports', __name__)
+
+# CSV (the layout /export writes) and NDJSON ledgers are parsed as a stream,
+# validated with validate_entry() and written with executemany() in chunked
+# transactions, so large imports neither load the whole file nor commit
+# once per row.
+
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_ERRORS = 100
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def normalize_field_name(name):
+    """Map 'Created At' / 'created_at' / 'createdAt' style keys to one form."""
+    name = (name or '').strip().lstrip('\ufeff')
+    name = re.sub(r'(?<=[a-z])(?=[A-Z])', '_', name)
+    return re.sub(r'[\s\-]+', '_', name).lower()
+
+def detect_import_format(filename, requested=None):
+    """Pick csv or ndjson from an explicit choice or the file extension."""
+    if requested in ('csv', 'ndjson'):
+        return requested
+    name = (filename or '').lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return 'csv'
+
+def open_import_stream(binary, filename=''):
+    """Wrap an uploaded/opened binary stream as UTF-8 text, gunzipping if needed."""
+    if (filename or '').lower().endswith('.gz'):
+        binary = gzip.GzipFile(fileobj=binary, mode='rb')
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+
+def iter_import_records(text_stream, import_format):
+    """Yield (line number, record dict) pairs; unparsable lines yield an error string."""
+    if import_format == 'ndjson':
+        for line_no, line in enumerate(text_stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, "Expected a JSON object"
+                continue
+            yield line_no, {normalize_field_name(k): v for k, v in record.items()}
+    else:
+        reader = csv.reader(text_stream)
+        header = next(reader, None)
+        if header is None:
+            return
+        fields = [normalize_field_name(name) for name in header]
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            yield reader.line_num, dict(zip(fields, row))
+
+def clean_timestamp(value, default):
+    """Return value as a stored timestamp string, or default if absent/invalid."""
+    if value in (None, ''):
+        return default
+    try:
+        return parse_date(str(value)).strftime(TIMESTAMP_FORMAT)
+    except (ValueError, TypeError):
+        return None
+
+def import_entries(db, records, dry_run=False, chunk_size=IMPORT_CHUNK_SIZE,
+                   max_errors=IMPORT_MAX_ERRORS):
+    """Validate and insert records, committing every chunk_size rows.
+
+    Returns a report dict with row counts, the first max_errors per-row
+    errors, elapsed time and throughput. In dry-run mode rows are only
+    validated and nothing is written. A chunk the database rejects (a lock
+    timeout, a constraint) is rolled back and reported as failed rows, and
+    the import carries on with the next one.
+    """
+    schema = get_schema()
+    now = datetime.datetime.now().strftime(TIMESTAMP_FORMAT)
+    started = time.perf_counter()
+    report = {
+        'rows': 0,
+        'imported': 0,
+        'failed': 0,
+        'errors': [],
+        'dry_run': dry_run,
+    }
+
+    def record_error(line_no, message):
+        report['failed'] += 1
+        if len(report['errors']) < max_errors:
+            report['errors'].append({'line': line_no, 'error': message})
+
+    def flush(batch, lines):
+        if not batch:
+            return
+        try:
+            if not dry_run:
+                with db:
+                    db.executemany(schema.insert_sql, batch)
+            report['imported'] += len(batch)
+        except sqlite3.Error as e:
+            # Earlier chunks stay committed; this one was rolled back whole
+            report['failed'] += len(batch)
+            if len(report['errors']) < max_errors:
+                span = f"Line {lines[0]} was" if len(lines) == 1 else f"Lines {lines[0]}-{lines[-1]} were"
+                report['errors'].append({'line': lines[0], 'error': f"{span} not imported: {str(e)}"})
+        batch.clear()
+        lines.clear()
+
+    batch = []
+    lines = []
+    for line_no, record in records:
+        report['rows'] += 1
+        if isinstance(record, str):
+            record_error(line_no, record)
+            continue
+
+        entry, error = validate_entry(
+            record.get('person'), record.get('amount'),
+            record.get('direction'), record.get('note', ''), schema.currency_exponent
+        )
+        if error:
+            record_error(line_no, error)
+            continue
+
+        created_at = clean_timestamp(record.get('created_at'), now)
+        updated_at = clean_timestamp(record.get('updated_at'), created_at)
+        if created_at is None or updated_at is None:
+            record_error(line_no, "Invalid timestamp")
+            continue
+
+        if schema.has_created_at and schema.has_updated_at:
+            params = (entry['person'], entry['amount_minor'], entry['direction'], entry['note'],
+                      created_at, updated_at)
+        else:
+            params = schema.insert_params(entry['person'], entry['amount_minor'], entry['direction'],
+                                          entry['note'], now)
+        batch.append(params)
+        lines.append(line_no)
+        if len(batch) >= chunk_size:
+            flush(batch, lines)
+    flush(batch, lines)
+
+    elapsed = time.perf_counter() - started
+    report['elapsed'] = round(elapsed, 3)
+    report['rows_per_sec'] = round(report['rows'] / elapsed, 1) if elapsed > 0 else None
+    return report
+
+def run_import(binary, filename, import_format=None, dry_run=False, chunk_size=IMPORT_CHUNK_SIZE):
+    """Import a CSV/NDJSON stream into the current database."""
+    import_format = detect_import_format(filename, import_format)
+    text_stream = open_import_stream(binary, filename)
+    records = iter_import_records(text_stream, import_format)
+    db = get_db()
+    try:
+        report = import_entries(db, records, dry_run=dry_run, chunk_size=chunk_size)
+    except (UnicodeDecodeError, csv.Error, OSError, EOFError) as e:
+        # Chunks before the unreadable part are already committed
+        if not dry_run:
+            publish_change(db, 'imported', count=None)
+            maybe_take_balance_snapshot(db)
+        raise ValueError(f"Could not read {import_format.upper()} file: {e}") from e
+    if not dry_run and report['imported']:
+        publish_change(db, 'imported', count=report['imported'])
+        maybe_take_balance_snapshot(db)
+    report['format'] = import_format
+    return report
+
+@bp.route('/import', methods=['POST'])
+def import_ledger():
+    """Import entries from an uploaded CSV/NDJSON file (form upload)."""
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        flash("Please choose a file to import", "error")
+        return redirect(url_for('admin.settings') + "#data")
+
+    dry_run = request.form.get('dry_run', 'off') == 'on'
+    try:
+        report = run_import(upload.stream, upload.filename,
+                            request.form.get('format') or None, dry_run=dry_run)
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for('admin.settings') + "#data")
+
+    action = "validated" if dry_run else "imported"
+    flash(f"{report['imported']} of {report['rows']} rows {action} "
+          f"({report['rows_per_sec'] or 0:.0f} rows/sec)",
+          "success" if not report['failed'] else "error")
+    for error in report['errors'][:5]:
+        flash(f"Line {error['line']}: {error['error']}", "error")
+    if report['failed'] > 5:
+        flash(f"...and {report['failed'] - 5} more rows with errors", "error")
+    return redirect(url_for('admin.settings') + "#data")
+
+@bp.route('/api/import', methods=['POST'])
+def api_import():
+    """Import entries from a CSV/NDJSON upload or request body and return a JSON report."""
+    from flask import jsonify
+
+    dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'on')
+    upload = request.files.get('file')
+    try:
+        if upload is not None and upload.filename:
+            report = run_import(upload.stream, upload.filename,
+                                request.args.get('format'), dry_run=dry_run)
+        else:
+            import_format = request.args.get('format')
+            if import_format is None and request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+                import_format = 'ndjson'
+            filename = 'upload.gz' if request.content_encoding == 'gzip' else ''
+            report = run_import(request.stream, filename, import_format, dry_run=dry_run)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(report), (200 if not report['failed'] else 207)
+
+@click.command('import-ledger')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'import_format', type=click.Choice(['csv', 'ndjson']),
+              help='Input format (default: detected from the file extension).')
+@click.option('--dry-run', is_flag=True, help='Validate rows without writing them.')
+@click.option('--chunk-size', default=IMPORT_CHUNK_SIZE, show_default=True,
+              help='Rows written per transaction.')
+@with_appcontext
+def import_ledger_command(path, import_format, dry_run, chunk_size):
+    """Bulk import a CSV or NDJSON ledger file."""
+    with open(path, 'rb') as f:
+        try:
+            report = run_import(f, path, import_format, dry_run=dry_run, chunk_size=chunk_size)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+    action = "Validated" if dry_run else "Imported"
+    click.echo(f"{action} {report['imported']} of {report['rows']} rows "
+               f"in {report['elapsed']}s ({report['rows_per_sec'] or 0:.0f} rows/sec)")
+    for error in report['errors']:
+        click.echo(f"  line {error['line']}: {error['error']}", err=True)
+    if report['failed'] > len(report['errors']):
+        click.echo(f"  ...and {report['failed'] - len(report['errors'])} more errors", err=True)
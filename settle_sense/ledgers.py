@@ -0,0 +1,465 @@
+"""
+Shared ledgers and the settlement engine.
+"""
+
+import datetime
+import heapq
+import random
+import sqlite3
+import time
+import click
+from flask import Blueprint, current_app, request, redirect, url_for, flash
+from flask.cli import with_appcontext
+from .db import get_db, get_schema
+from .money import DEFAULT_CURRENCY_EXPONENT, from_minor, to_minor
+from .validation import DIRECTIONS, validate_entry
+
+bp = Blueprint('ledgers', __name__)
+
+# Ledgers group expenses shared between several people (a trip, a team
+# expense pool). Each ledger entry records that `debtor` owes `creditor`
+# an amount in minor units (with the same currency exponent as debt), so
+# member balances are exact integers. The
+# settlement engine turns those balances into a short list of transfers:
+# exact pairs cancel first, small remainders are split into as many
+# zero-sum groups as possible (each group of k members settles in k - 1
+# transfers, which is optimal), and larger ones fall back to a heap-based
+# greedy matching of the biggest creditor with the biggest debtor.
+
+# Largest number of unmatched members solved exactly; the subset DP is
+# O(2^n * n), which stays within a few milliseconds up to here
+SETTLEMENT_EXACT_LIMIT = 10
+
+def create_ledger_tables(db):
+    """Create the shared-expense ledger tables."""
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            created_at TEXT
+        )
+    ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS ledger_entry (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ledger_id INTEGER NOT NULL REFERENCES ledger(id) ON DELETE CASCADE,
+            debtor TEXT NOT NULL,
+            creditor TEXT NOT NULL,
+            amount_minor INTEGER NOT NULL CHECK(amount_minor > 0),
+            note TEXT,
+            created_at TEXT
+        )
+    ''')
+    db.execute("CREATE INDEX IF NOT EXISTS idx_ledger_entry_ledger ON ledger_entry(ledger_id)")
+
+def get_ledger_balances(db, ledger_id):
+    """Return {member: net balance in minor units} for a ledger.
+
+    Positive balances are owed to the member, negative ones are owed by them.
+    """
+    rows = db.execute('''
+        SELECT member, SUM(amount) FROM (
+            SELECT creditor AS member, amount_minor AS amount FROM ledger_entry WHERE ledger_id = ?
+            UNION ALL
+            SELECT debtor, -amount_minor FROM ledger_entry WHERE ledger_id = ?
+        )
+        GROUP BY member
+    ''', (ledger_id, ledger_id)).fetchall()
+    return {row[0]: row[1] for row in rows}
+
+def _settle_greedy(balances, transfers):
+    """Settle balances by repeatedly matching the largest creditor and debtor."""
+    creditors = [(-amount, member) for member, amount in balances if amount > 0]
+    debtors = [(amount, member) for member, amount in balances if amount < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor, creditor, amount))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+
+def _zero_sum_groups(balances):
+    """Partition balances into the largest number of zero-sum groups.
+
+    dp[mask] is the most complete zero-sum groups the members in mask can
+    be split into; since a zero-sum mask closes one more group than its
+    best sub-mask, the partition is recovered by walking back through the
+    members whose removal kept dp optimal.
+    """
+    n = len(balances)
+    size = 1 << n
+    sums = [0] * size
+    dp = [0] * size
+    for mask in range(1, size):
+        low = (mask & -mask).bit_length() - 1
+        sums[mask] = sums[mask & (mask - 1)] + balances[low][1]
+        best = 0
+        bits = mask
+        while bits:
+            bit = bits & -bits
+            best = max(best, dp[mask ^ bit])
+            bits ^= bit
+        dp[mask] = best + (sums[mask] == 0)
+
+    groups = []
+    mask = size - 1
+    current = []
+    while mask:
+        bits = mask
+        while bits:
+            bit = bits & -bits
+            rest = mask ^ bit
+            if dp[rest] + (sums[mask] == 0) == dp[mask]:
+                break
+            bits ^= bit
+        if sums[mask] == 0 and current:
+            groups.append(current)
+            current = []
+        current.append(balances[bit.bit_length() - 1])
+        mask = rest
+    if current:
+        groups.append(current)
+    return groups
+
+def settle_balances(balances):
+    """Compute transfers that clear a set of balances.
+
+    balances maps member -> net amount in minor units (positive: is owed).
+    Returns (transfers, method) where transfers is a list of
+    (debtor, creditor, amount_minor) and method is 'exact' when the plan is
+    provably minimal or 'greedy' when the heuristic was used. Raises
+    ValueError if the balances do not sum to zero.
+    """
+    if sum(balances.values()) != 0:
+        raise ValueError("Balances must sum to zero")
+
+    transfers = []
+    # Cancel exact opposite pairs first: each is a one-transfer group
+    open_credits = {}
+    remaining = []
+    for member, amount in sorted(balances.items()):
+        if amount == 0:
+            continue
+        waiting = open_credits.get(-amount)
+        if waiting:
+            other = waiting.pop()
+            if amount > 0:
+                transfers.append((other, member, amount))
+            else:
+                transfers.append((member, other, -amount))
+        else:
+            open_credits.setdefault(amount, []).append(member)
+    for amount, members in open_credits.items():
+        remaining.extend((member, amount) for member in members)
+    remaining.sort()
+
+    if len(remaining) <= SETTLEMENT_EXACT_LIMIT:
+        for group in _zero_sum_groups(remaining):
+            _settle_greedy(group, transfers)
+        return transfers, 'exact'
+
+    _settle_greedy(remaining, transfers)
+    return transfers, 'greedy'
+
+def build_settlement(balances, exponent=DEFAULT_CURRENCY_EXPONENT):
+    """Run the settlement engine and describe the plan for the API and UI.
+
+    Transfers carry the decimal amount for JSON and amount_minor for the
+    dashboard's currency formatter.
+    """
+    started = time.perf_counter()
+    transfers, method = settle_balances(balances)
+    elapsed = time.perf_counter() - started
+    return {
+        'members': len(balances),
+        'unsettled': sum(1 for amount in balances.values() if amount),
+        'method': method,
+        'transfer_count': len(transfers),
+        'elapsed_ms': round(elapsed * 1000, 3),
+        'transfers': [
+            {'from': debtor, 'to': creditor, 'amount': from_minor(amount, exponent), 'amount_minor': amount}
+            for debtor, creditor, amount in transfers
+        ],
+    }
+
+def validate_expense(paid_by, amount, split_between, note='', exponent=DEFAULT_CURRENCY_EXPONENT):
+    """Validate a shared expense.
+
+    Returns (expense, None) with the amount in minor units and a
+    de-duplicated list of participants, or (None, message).
+    """
+    paid_by = '' if paid_by is None else str(paid_by).strip()
+    if not paid_by:
+        return None, "Payer is required"
+    entry, error = validate_entry(paid_by, amount, DIRECTIONS[0], note, exponent)
+    if error:
+        return None, error
+    if isinstance(split_between, str):
+        split_between = split_between.split(',')
+    if not isinstance(split_between, (list, tuple)):
+        return None, "split_between must be a list of names"
+    members = []
+    for name in split_between:
+        name = '' if name is None else str(name).strip()
+        if name and name not in members:
+            members.append(name)
+    if not members:
+        return None, "An expense must be split between at least one person"
+    amount_minor = entry['amount_minor']
+    if amount_minor < len(members):
+        return None, "Amount is too small to split"
+    return {
+        'paid_by': entry['person'],
+        'amount_minor': amount_minor,
+        'members': members,
+        'note': entry['note'],
+    }, None
+
+def add_expense(db, ledger_id, expense):
+    """Record an expense as one entry per participant who owes the payer.
+
+    The amount is split evenly in minor units; the first participants take
+    the leftover units so the shares always add up to the amount.
+    """
+    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    share, leftover = divmod(expense['amount_minor'], len(expense['members']))
+    rows = []
+    for index, member in enumerate(expense['members']):
+        owed = share + (1 if index < leftover else 0)
+        if member != expense['paid_by'] and owed:
+            rows.append((ledger_id, member, expense['paid_by'], owed, expense['note'], now))
+    db.executemany(
+        "INSERT INTO ledger_entry (ledger_id, debtor, creditor, amount_minor, note, created_at) "
+        "VALUES (?,?,?,?,?,?)",
+        rows
+    )
+    return len(rows)
+
+def record_payment(db, ledger_id, payer, payee, amount_minor):
+    """Record that payer paid payee, which reduces what payer owes."""
+    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    db.execute(
+        "INSERT INTO ledger_entry (ledger_id, debtor, creditor, amount_minor, note, created_at) "
+        "VALUES (?,?,?,?,?,?)",
+        (ledger_id, payee, payer, amount_minor, 'Settlement payment', now)
+    )
+
+def get_ledgers(db):
+    """Return every ledger with its member balances and settlement plan."""
+    exponent = get_schema().currency_exponent
+    ledgers = []
+    for row in db.execute("SELECT id, name, created_at FROM ledger ORDER BY name").fetchall():
+        balances = get_ledger_balances(db, row['id'])
+        ledgers.append({
+            'id': row['id'],
+            'name': row['name'],
+            'created_at': row['created_at'],
+            'balances': [
+                {'name': member, 'balance': from_minor(amount, exponent)}
+                for member, amount in sorted(balances.items())
+            ],
+            'settlement': build_settlement(balances, exponent),
+        })
+    return ledgers
+
+def get_ledger_summaries(db):
+    """Return every ledger with its member and entry counts, for the dashboard.
+
+    Settlement plans are left to /api/ledgers/<id>/settlement, so a
+    dashboard render costs one query however many ledgers there are.
+    """
+    return [dict(row) for row in db.execute('''
+        SELECT ledger.id, ledger.name, ledger.created_at,
+               COUNT(ledger_entry.id) AS entry_count,
+               (SELECT COUNT(*) FROM (
+                   SELECT debtor FROM ledger_entry WHERE ledger_id = ledger.id
+                   UNION
+                   SELECT creditor FROM ledger_entry WHERE ledger_id = ledger.id
+               )) AS member_count
+        FROM ledger
+        LEFT JOIN ledger_entry ON ledger_entry.ledger_id = ledger.id
+        GROUP BY ledger.id
+        ORDER BY ledger.name
+    ''')]
+
+def get_ledger(db, ledger_id):
+    return db.execute("SELECT id, name, created_at FROM ledger WHERE id = ?", (ledger_id,)).fetchone()
+
+@bp.route('/api/ledgers', methods=['GET', 'POST'])
+def api_ledgers():
+    """List ledgers with their settlement plans, or create a ledger."""
+    from flask import jsonify
+    
+    db = get_db()
+    if request.method == 'GET':
+        return jsonify({'ledgers': get_ledgers(db)})
+    
+    payload = request.get_json(silent=True) or {}
+    name = str(payload.get('name') or '').strip()
+    if not name:
+        return jsonify({'error': "Ledger name is required"}), 400
+    try:
+        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        cursor = db.execute("INSERT INTO ledger (name, created_at) VALUES (?, ?)", (name, now))
+        db.commit()
+    except sqlite3.IntegrityError:
+        db.rollback()
+        return jsonify({'error': f"A ledger named '{name}' already exists"}), 409
+    return jsonify({'id': cursor.lastrowid, 'name': name, 'created_at': now}), 201
+
+@bp.route('/api/ledgers/<int:ledger_id>/expenses', methods=['POST'])
+def api_ledger_expense(ledger_id):
+    """Add a shared expense to a ledger."""
+    from flask import jsonify
+    
+    db = get_db()
+    if get_ledger(db, ledger_id) is None:
+        return jsonify({'error': "Ledger not found"}), 404
+    payload = request.get_json(silent=True) or {}
+    expense, error = validate_expense(
+        payload.get('paid_by'), payload.get('amount'),
+        payload.get('split_between'), payload.get('note', ''), get_schema().currency_exponent
+    )
+    if error:
+        return jsonify({'error': error}), 400
+    try:
+        entries = add_expense(db, ledger_id, expense)
+        db.commit()
+    except sqlite3.Error as e:
+        db.rollback()
+        current_app.logger.error(f"Failed to add expense: {str(e)}")
+        return jsonify({'error': 'Failed to add expense', 'details': str(e)}), 409
+    return jsonify({'entries': entries}), 201
+
+@bp.route('/api/ledgers/<int:ledger_id>/settlement')
+def api_ledger_settlement(ledger_id):
+    """Return the payment plan that clears a ledger's balances."""
+    from flask import jsonify
+    
+    db = get_db()
+    ledger = get_ledger(db, ledger_id)
+    if ledger is None:
+        return jsonify({'error': "Ledger not found"}), 404
+    plan = build_settlement(get_ledger_balances(db, ledger_id), get_schema().currency_exponent)
+    plan['ledger'] = {'id': ledger['id'], 'name': ledger['name']}
+    return jsonify(plan)
+
+@bp.route('/api/settle', methods=['POST'])
+def api_settle():
+    """Compute a payment plan for arbitrary balances.
+
+    Expects {"balances": {"name": amount, ...}} where positive amounts are
+    owed to that person and the amounts sum to zero.
+    """
+    from flask import jsonify
+
+    payload = request.get_json(silent=True) or {}
+    balances = payload.get('balances')
+    if not isinstance(balances, dict) or not balances:
+        return jsonify({'error': "balances must be a non-empty object"}), 400
+    exponent = get_schema().currency_exponent
+    try:
+        minor = {str(member): to_minor(amount, exponent) for member, amount in balances.items()}
+    except ValueError:
+        return jsonify({'error': "Balances must be numbers"}), 400
+    try:
+        return jsonify(build_settlement(minor, exponent))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@bp.route('/ledgers', methods=['POST'])
+def create_ledger():
+    """Create a ledger from the dashboard."""
+    name = request.form.get('name', '').strip()
+    if not name:
+        flash("Ledger name is required", "error")
+        return redirect(url_for('dashboard.index') + "#ledgers")
+    db = get_db()
+    try:
+        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        db.execute("INSERT INTO ledger (name, created_at) VALUES (?, ?)", (name, now))
+        db.commit()
+        flash(f"Ledger '{name}' created", "success")
+    except sqlite3.IntegrityError:
+        db.rollback()
+        flash(f"A ledger named '{name}' already exists", "error")
+    return redirect(url_for('dashboard.index') + "#ledgers")
+
+@bp.route('/ledgers/<int:ledger_id>/expenses', methods=['POST'])
+def add_ledger_expense(ledger_id):
+    """Add a shared expense from the dashboard."""
+    db = get_db()
+    if get_ledger(db, ledger_id) is None:
+        flash("Ledger not found", "error")
+        return redirect(url_for('dashboard.index') + "#ledgers")
+    expense, error = validate_expense(
+        request.form.get('paid_by'), request.form.get('amount'),
+        request.form.get('split_between', ''), request.form.get('note', ''),
+        get_schema().currency_exponent
+    )
+    if error:
+        flash(error, "error")
+        return redirect(url_for('dashboard.index') + "#ledgers")
+    try:
+        add_expense(db, ledger_id, expense)
+        db.commit()
+        flash("Expense added", "success")
+    except sqlite3.Error as e:
+        db.rollback()
+        current_app.logger.error(f"Failed to add expense: {str(e)}")
+        flash("Failed to add expense", "error")
+    return redirect(url_for('dashboard.index') + "#ledgers")
+
+@bp.route('/ledgers/<int:ledger_id>/payments', methods=['POST'])
+def record_ledger_payment(ledger_id):
+    """Mark a suggested transfer as paid."""
+    db = get_db()
+    payer = request.form.get('from', '').strip()
+    payee = request.form.get('to', '').strip()
+    try:
+        amount_minor = to_minor(request.form.get('amount', ''), get_schema().currency_exponent)
+    except ValueError:
+        amount_minor = 0
+    if get_ledger(db, ledger_id) is None or not payer or not payee or amount_minor <= 0:
+        flash("Invalid payment", "error")
+        return redirect(url_for('dashboard.index') + "#ledgers")
+    try:
+        record_payment(db, ledger_id, payer, payee, amount_minor)
+        db.commit()
+        flash(f"Recorded payment from {payer} to {payee}", "success")
+    except sqlite3.Error as e:
+        db.rollback()
+        current_app.logger.error(f"Failed to record payment: {str(e)}")
+        flash("Failed to record payment", "error")
+    return redirect(url_for('dashboard.index') + "#ledgers")
+
+def synthetic_balances(members, rng, max_amount=50000):
+    """Generate random zero-sum balances in minor units for benchmarking."""
+    balances = {f"member{i}": rng.randint(-max_amount, max_amount) for i in range(members - 1)}
+    balances[f"member{members - 1}"] = -sum(balances.values())
+    return balances
+
+@click.command('bench-settlement')
+@click.option('--members', default='5,10,12,100,1000,5000', show_default=True,
+              help='Comma-separated ledger sizes to benchmark.')
+@click.option('--ledgers', default=20, show_default=True, help='Synthetic ledgers per size.')
+@click.option('--seed', default=42, show_default=True, help='Random seed.')
+@with_appcontext
+def bench_settlement_command(members, ledgers, seed):
+    """Benchmark the settlement engine over synthetic ledgers."""
+    rng = random.Random(seed)
+    click.echo(f"{'members':>8} {'method':>7} {'transfers':>10} {'bound':>6} {'mean ms':>9} {'max ms':>8}")
+    for size in (int(value) for value in members.split(',')):
+        timings = []
+        transfers = 0
+        for _ in range(ledgers):
+            plan = build_settlement(synthetic_balances(size, rng))
+            timings.append(plan['elapsed_ms'])
+            transfers += plan['transfer_count']
+        click.echo(f"{size:>8} {plan['method']:>7} {transfers / ledgers:>10.1f} {size - 1:>6} "
+                   f"{sum(timings) / ledgers:>9.3f} {max(timings):>8.3f}")
@@ -0,0 +1,342 @@
+"""
+Live updates pushed to open dashboards over Server-Sent Events.
+"""
+
+import itertools
+import json
+import os
+import queue
+import sqlite3
+import threading
+import uuid
+from collections import deque
+from flask import Blueprint, current_app, request
+from .balances import summarize_balances, decimal_summary
+from .caching import get_data_version
+from .db import get_db, get_schema
+
+bp = Blueprint('live', __name__)
+
+# Open dashboards subscribe to /api/events, a Server-Sent Events stream.
+# Write routes publish a change event once their transaction has committed,
+# and the broadcaster fans it out to every subscriber through a small
+# bounded queue. A subscriber that falls behind is disconnected rather than
+# left to grow its queue; the browser reconnects with Last-Event-ID and is
+# replayed what it missed from a short history, or sent a full resync when
+# that history no longer reaches back far enough.
+#
+# The broadcaster lives in the process, so those events only reach clients
+# of the worker that made the write. To pick up writes made by other
+# workers (or the CLI), each worker with open streams also polls the
+# shared data version counter, and when it has moved publishes a complete
+# refresh of every balance. Changes from elsewhere therefore arrive within
+# LIVE_POLL_INTERVAL, and a burst of them is sent as one refresh. A worker
+# without open streams does not poll.
+
+# Events buffered per client before it counts as too slow
+LIVE_QUEUE_SIZE = 64
+# Recent events kept for replaying to reconnecting clients
+LIVE_HISTORY_SIZE = 256
+LIVE_MAX_CLIENTS = 200
+# Seconds between heartbeat comments on an idle stream
+LIVE_HEARTBEAT = 15
+# Milliseconds a browser waits before reconnecting
+LIVE_RETRY = 3000
+# Seconds between checks of the data version for writes by other workers
+LIVE_POLL_INTERVAL = 1.0
+
+class LiveSubscriber:
+    """One connected stream: its pending events and whether it was dropped."""
+
+    def __init__(self, queue_size):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = False
+
+class ChangeBroadcaster:
+    """Fan change events out to subscribers through bounded queues.
+
+    Event ids look like "<stream>-<n>". The stream part is new for every
+    process (including each forked worker), so an id handed out before a
+    restart or by another worker is recognised as unknown instead of being
+    mistaken for a recent one.
+    """
+
+    def __init__(self, queue_size=LIVE_QUEUE_SIZE, history_size=LIVE_HISTORY_SIZE):
+        self.queue_size = queue_size
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self.stream = uuid.uuid4().hex[:8]
+        self._subscribers = set()
+        self._history = deque(maxlen=self.history_size)
+        self._counter = itertools.count(1)
+        self._last_id = f"{self.stream}-0"
+
+    def _check_owner(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+    @property
+    def subscriber_count(self):
+        self._check_owner()
+        return len(self._subscribers)
+
+    @property
+    def last_id(self):
+        """Id of the latest event, for clients to resume from."""
+        self._check_owner()
+        return self._last_id
+
+    def publish(self, event, data):
+        """Queue an event for every subscriber and return its id."""
+        with self._lock:
+            self._check_owner()
+            event_id = self._last_id = f"{self.stream}-{next(self._counter)}"
+            message = (event_id, event, data)
+            self._history.append(message)
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber.queue.put_nowait(message)
+                except queue.Full:
+                    subscriber.dropped = True
+                    self._subscribers.discard(subscriber)
+        return event_id
+
+    def subscribe(self, last_event_id=None):
+        """Register a subscriber and find the events it missed.
+
+        Returns (subscriber, backlog), where backlog is None if
+        last_event_id is no longer (or was never) in the history and the
+        client has to resync.
+        """
+        subscriber = LiveSubscriber(self.queue_size)
+        with self._lock:
+            self._check_owner()
+            self._subscribers.add(subscriber)
+            if not last_event_id or last_event_id == self._last_id:
+                return subscriber, []
+            ids = [message[0] for message in self._history]
+            if last_event_id not in ids:
+                return subscriber, None
+            return subscriber, list(self._history)[ids.index(last_event_id) + 1:]
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def close(self):
+        """End every open stream, e.g. when the worker is shutting down.
+
+        Clients reconnect (to another worker) and resume from their last id.
+        """
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, set()
+        for subscriber in subscribers:
+            subscriber.dropped = True
+            try:
+                subscriber.queue.put_nowait(None)
+            except queue.Full:
+                pass  # a full queue ends the stream once drained anyway
+
+broadcaster = ChangeBroadcaster()
+
+class VersionWatcher:
+    """Poll the data version and publish a refresh when it moves.
+
+    One thread per worker process, started by the first subscriber. It
+    exits after a check finds nobody subscribed, and the next subscriber
+    starts it again; the version it compares against is kept in between,
+    so writes made while nobody was watching still produce a refresh. It
+    also reports the worker's own writes, which costs one extra complete
+    event per interval. stop() ends the thread, on shutdown or in tests.
+    """
+
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._stop = None
+        self.version = None
+
+    @property
+    def running(self):
+        with self._lock:
+            return self._thread is not None and self._pid == os.getpid()
+
+    def start(self, app, db):
+        """Start the thread in this process unless it is already running."""
+        with self._lock:
+            # Threads do not survive a fork; each worker starts its own
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self.version is None:
+                version = get_data_version(db)
+                self.version = version[0] if version else None
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            interval = app.config.get('LIVE_POLL_INTERVAL', LIVE_POLL_INTERVAL)
+            self._thread = threading.Thread(target=self._run, args=(app, interval, self._stop),
+                                            name='live-version-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the thread and wait for it to exit."""
+        with self._lock:
+            thread, stop = self._thread, self._stop
+            self._thread = None
+            if thread is None or self._pid != os.getpid():
+                return
+        stop.set()
+        thread.join(timeout)
+
+    def _run(self, app, interval, stop):
+        thread = threading.current_thread()
+        while not stop.wait(interval):
+            try:
+                with app.app_context():
+                    self.check(get_db())
+            except sqlite3.Error as e:
+                app.logger.error(f"Error checking for live updates: {str(e)}")
+            # Subscribers register before calling start(), so under the lock
+            # either this thread sees them or they see it gone
+            with self._lock:
+                if self._thread is not thread:
+                    return
+                if not self.broadcaster.subscriber_count:
+                    self._thread = None
+                    return
+
+    def check(self, db):
+        """Publish a refresh if the data changed since the last check."""
+        version = get_data_version(db)
+        if version is None or version[0] == self.version:
+            return None
+        self.version = version[0]
+        if not self.broadcaster.subscriber_count:
+            return None
+        return self.broadcaster.publish('change', build_change_event(db, 'refresh', count=None))
+
+watcher = VersionWatcher(broadcaster)
+
+def format_event(event_id, event, data):
+    """Encode one Server-Sent Event."""
+    payload = json.dumps(data, separators=(',', ':'))
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+def build_change_event(db, action, people=None, entry_id=None, count=1):
+    """Build a change event with the balances a committed write left behind.
+
+    people names the persons whose balances changed, and only those are
+    sent (with removed set for anyone left without entries). None sends
+    every person's balance with complete set, so clients replace theirs.
+    Amounts are decimals, like /api/summary.
+    """
+    totals_row = db.execute('SELECT * FROM balance_totals WHERE id = 1').fetchone()
+    if people is None:
+        rows = db.execute('SELECT * FROM person_balance').fetchall()
+    else:
+        people = sorted(set(people))
+        placeholders = ', '.join('?' * len(people))
+        rows = db.execute(
+            f'SELECT * FROM person_balance WHERE person IN ({placeholders})', people
+        ).fetchall()
+    summary = decimal_summary(summarize_balances(rows, totals_row), get_schema().currency_exponent)
+
+    changed = summary['people']
+    found = {person['name'] for person in changed}
+    changed.extend(
+        {'name': name, 'balance': 0, 'removed': True}
+        for name in people or () if name not in found
+    )
+    return {
+        'action': action,
+        'entry_id': entry_id,
+        'count': count,
+        'complete': people is None,
+        'totals': {
+            'entry_count': summary['entry_count'],
+            'total_owed_to_you': summary['total_owed_to_you'],
+            'total_you_owe': summary['total_you_owe'],
+            'net_balance': summary['net_balance'],
+        },
+        'people': changed,
+    }
+
+def publish_change(db, action, people=None, entry_id=None, count=1):
+    """Tell live dashboards about a committed write.
+
+    Does nothing without subscribers, and never fails the write it
+    reports on: errors building the event are only logged.
+    """
+    if not broadcaster.subscriber_count:
+        return None
+    try:
+        data = build_change_event(db, action, people, entry_id, count)
+    except sqlite3.Error as e:
+        current_app.logger.error(f"Error publishing live update: {str(e)}")
+        return None
+    return broadcaster.publish('change', data)
+
+@bp.route('/api/events')
+def api_events():
+    """Server-Sent Events stream of balance changes for live dashboards.
+
+    Clients resume with the Last-Event-ID header (sent automatically by
+    EventSource on reconnect) or a last_event_id query parameter.
+    """
+    from flask import Response, jsonify
+    
+    if broadcaster.subscriber_count >= current_app.config.get('LIVE_MAX_CLIENTS', LIVE_MAX_CLIENTS):
+        response = jsonify({'error': 'Too many live connections'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(LIVE_HEARTBEAT)
+        return response
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    subscriber, backlog = broadcaster.subscribe(last_event_id)
+    resync = None
+    try:
+        watcher.start(current_app._get_current_object(), get_db())
+        if backlog is None:
+            resync = (broadcaster.last_id, 'resync', build_change_event(get_db(), 'resync', count=None))
+    except sqlite3.Error as e:
+        broadcaster.unsubscribe(subscriber)
+        current_app.logger.error(f"Error starting live updates: {str(e)}")
+        return jsonify({'error': 'Live updates are unavailable'}), 500
+    if backlog is None:
+        backlog = []
+    
+    def stream():
+        # Runs after the request has ended, so it must not touch the database
+        try:
+            yield f"retry: {LIVE_RETRY}\n\n"
+            if resync:
+                yield format_event(*resync)
+            for message in backlog:
+                yield format_event(*message)
+            while True:
+                try:
+                    if subscriber.dropped:
+                        message = subscriber.queue.get_nowait()
+                    else:
+                        message = subscriber.queue.get(timeout=LIVE_HEARTBEAT)
+                except queue.Empty:
+                    if subscriber.dropped:
+                        return  # the client reconnects and replays the rest
+                    yield ": heartbeat\n\n"
+                    continue
+                if message is None:
+                    return
+                yield format_event(*message)
+        finally:
+            broadcaster.unsubscribe(subscriber)
+    
+    response = Response(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-store'
+    # Stop reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,268 @@
+"""
+Request instrumentation: per-endpoint latency, SQL and rendering metrics.
+
+Exposed at /metrics in the Prometheus text format, and per request in a
+Server-Timing header.
+"""
+
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from flask import (Blueprint, Response, abort, current_app, g, request, template_rendered,
+                   before_render_template)
+
+bp = Blueprint('metrics', __name__)
+
+# Every request records its latency, the number and time of SQL statements
+# run on its connection (counted by db.TimedCursor), the time spent
+# rendering templates and the response size. The totals are kept per
+# endpoint in the app's MetricsRegistry; recording a request is a few
+# additions under a lock, cheap enough to leave on in production.
+#
+# Each worker process has its own registry. When METRICS_DIR is set (the
+# production server sets it when it runs several workers) every worker
+# also writes its totals there, at most once per METRICS_FLUSH_INTERVAL
+# and always after its last request, and /metrics adds up the files of all
+# workers, including ones that have since exited, so the counters never go
+# backwards.
+
+# Histogram bucket upper bounds: seconds and bytes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2)
+# Seconds between writes of a worker's totals to METRICS_DIR
+METRICS_FLUSH_INTERVAL = 1.0
+
+def _new_histogram(buckets):
+    # Per-bucket counts (the last is +Inf), then the sum
+    return {'counts': [0] * (len(buckets) + 1), 'sum': 0}
+
+def _observe(histogram, buckets, value):
+    histogram['counts'][bisect.bisect_left(buckets, value)] += 1
+    histogram['sum'] += value
+
+def _new_endpoint():
+    return {
+        'requests': {},
+        'latency': _new_histogram(LATENCY_BUCKETS),
+        'size': _new_histogram(SIZE_BUCKETS),
+        'sql_queries': 0,
+        'sql_seconds': 0.0,
+        'render_seconds': 0.0,
+    }
+
+def _merge_into(total, endpoints):
+    for endpoint, stats in endpoints.items():
+        target = total.setdefault(endpoint, _new_endpoint())
+        for key, count in stats['requests'].items():
+            target['requests'][key] = target['requests'].get(key, 0) + count
+        for name in ('latency', 'size'):
+            target[name]['counts'] = [a + b for a, b in zip(target[name]['counts'], stats[name]['counts'])]
+            target[name]['sum'] += stats[name]['sum']
+        for name in ('sql_queries', 'sql_seconds', 'render_seconds'):
+            target[name] += stats[name]
+
+class MetricsRegistry:
+    """Per-endpoint request totals for one worker process."""
+
+    def __init__(self, logger, directory=''):
+        self.logger = logger
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._endpoints = {}
+        self._flushed_at = 0.0
+        self._flush_pending = False
+
+    def _check_owner(self):
+        # A forked worker starts its own totals
+        if self._pid != os.getpid():
+            self._reset()
+
+    def record(self, endpoint, method, status, seconds, sql_queries, sql_seconds,
+               render_seconds, size):
+        """Add one finished request to the totals."""
+        with self._lock:
+            self._check_owner()
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = _new_endpoint()
+            key = f"{method} {status}"
+            stats['requests'][key] = stats['requests'].get(key, 0) + 1
+            _observe(stats['latency'], LATENCY_BUCKETS, seconds)
+            if size is not None:
+                _observe(stats['size'], SIZE_BUCKETS, size)
+            stats['sql_queries'] += sql_queries
+            stats['sql_seconds'] += sql_seconds
+            stats['render_seconds'] += render_seconds
+            if not self.directory or self._flush_pending:
+                return
+            # Write at most once per interval, but always write the last change
+            self._flush_pending = True
+            delay = self._flushed_at + METRICS_FLUSH_INTERVAL - time.monotonic()
+        if delay > 0:
+            timer = threading.Timer(delay, self._flush)
+            timer.daemon = True
+            timer.start()
+        else:
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            self._flush_pending = False
+            self._flushed_at = time.monotonic()
+            snapshot = json.dumps(self._endpoints)
+        self._write(snapshot)
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"{pid}.json")
+
+    def _write(self, snapshot):
+        path = self._path(self._pid)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path + '.tmp', 'w') as f:
+                f.write(snapshot)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            # May run on a timer thread, outside any app context
+            self.logger.warning(f"Could not write metrics to {path}: {str(e)}")
+
+    def snapshot(self):
+        """Return the totals of this worker, plus every other worker's if shared."""
+        with self._lock:
+            self._check_owner()
+            total = {}
+            _merge_into(total, self._endpoints)
+        if self.directory:
+            own = self._path(self._pid)
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                if path == own:
+                    continue
+                try:
+                    with open(path) as f:
+                        _merge_into(total, json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return total
+
+    def clear_shared(self):
+        """Remove the totals left by previous server runs."""
+        for path in glob.glob(os.path.join(self.directory, '*.json')) if self.directory else ():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def get_registry():
+    return current_app.extensions['metrics']
+
+# ---- Per-Request Timing ----
+@bp.before_app_request
+def start_timer():
+    g._request_started = time.perf_counter()
+    g._render_seconds = 0.0
+
+def _render_started(sender, template, context, **extra):
+    g._render_started = time.perf_counter()
+
+def _render_finished(sender, template, context, **extra):
+    started = g.pop('_render_started', None)
+    if started is not None:
+        g._render_seconds = g.get('_render_seconds', 0.0) + time.perf_counter() - started
+
+before_render_template.connect(_render_started)
+template_rendered.connect(_render_finished)
+
+@bp.after_app_request
+def record_request(response):
+    """Record the request in the registry and add a Server-Timing header."""
+    started = g.get('_request_started')
+    if started is None or not current_app.config['METRICS']:
+        return response
+    seconds = time.perf_counter() - started
+    db = g.get('_database')
+    sql_queries = db.sql_queries if db is not None else 0
+    sql_seconds = db.sql_seconds if db is not None else 0.0
+    render_seconds = g.get('_render_seconds', 0.0)
+    # Streamed bodies are not buffered just to measure them
+    size = None if response.is_streamed else response.content_length
+
+    get_registry().record(
+        request.endpoint or 'unmatched', request.method, response.status_code,
+        seconds, sql_queries, sql_seconds, render_seconds, size
+    )
+
+    app_seconds = max(seconds - sql_seconds - render_seconds, 0.0)
+    response.headers['Server-Timing'] = (
+        f'sql;dur={sql_seconds * 1000:.2f};desc="{sql_queries} queries", '
+        f'render;dur={render_seconds * 1000:.2f}, '
+        f'app;dur={app_seconds * 1000:.2f}, '
+        f'total;dur={seconds * 1000:.2f}'
+    )
+    return response
+
+# ---- Prometheus Exposition ----
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels.items()) + '}'
+
+def _histogram_lines(name, endpoint, histogram, buckets):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(buckets + ('+Inf',), histogram['counts']):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(endpoint=endpoint, le=bound)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(endpoint=endpoint)} {histogram['sum']}")
+    lines.append(f"{name}_count{_labels(endpoint=endpoint)} {cumulative}")
+    return lines
+
+def render_prometheus(endpoints):
+    """Format per-endpoint totals in the Prometheus text exposition format."""
+    families = {
+        'settlesense_requests_total': ('counter', 'Requests served, by endpoint, method and status.'),
+        'settlesense_request_duration_seconds': ('histogram', 'Request latency in seconds.'),
+        'settlesense_response_size_bytes': ('histogram', 'Response body size (streamed responses excluded).'),
+        'settlesense_sql_queries_total': ('counter', 'SQL statements executed.'),
+        'settlesense_sql_duration_seconds_total': ('counter', 'Time spent executing SQL and fetching rows.'),
+        'settlesense_render_duration_seconds_total': ('counter', 'Time spent rendering templates.'),
+    }
+    samples = {name: [] for name in families}
+    for endpoint in sorted(endpoints):
+        stats = endpoints[endpoint]
+        for key, count in sorted(stats['requests'].items()):
+            method, status = key.split(' ', 1)
+            samples['settlesense_requests_total'].append(
+                f"settlesense_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}"
+            )
+        samples['settlesense_request_duration_seconds'].extend(
+            _histogram_lines('settlesense_request_duration_seconds', endpoint, stats['latency'], LATENCY_BUCKETS)
+        )
+        samples['settlesense_response_size_bytes'].extend(
+            _histogram_lines('settlesense_response_size_bytes', endpoint, stats['size'], SIZE_BUCKETS)
+        )
+        for name, key in (('settlesense_sql_queries_total', 'sql_queries'),
+                          ('settlesense_sql_duration_seconds_total', 'sql_seconds'),
+                          ('settlesense_render_duration_seconds_total', 'render_seconds')):
+            samples[name].append(f"{name}{_labels(endpoint=endpoint)} {stats[key]}")
+
+    lines = []
+    for name, (kind, help_text) in families.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples[name])
+    return '\n'.join(lines) + '\n'
+
+@bp.route('/metrics')
+def metrics():
+    """Expose the request metrics for Prometheus."""
+    if not current_app.config['METRICS']:
+        abort(404)
+    return Response(render_prometheus(get_registry().snapshot()),
+                    mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,561 @@
+"""
+Versioned database migrations for SettleSense.
+"""
+
+import datetime
+import re
+import sqlite3
+import time
+from collections import namedtuple
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from .balances import (BALANCE_TRIGGERS, ROLLUP_TRIGGERS, HISTORY_TRIGGERS,
+                       create_balance_tables, rebuild_balances, check_balance_consistency,
+                       create_rollup_tables, rebuild_rollups, create_history_tables, seed_history)
+from .batch import create_idempotency_table
+from .caching import DATA_VERSION_TRIGGERS, create_data_version_table, bump_data_version
+from .db import get_db, get_pool, refresh_schema, table_columns, SORT_INDEXES, create_sort_indexes
+from .ledgers import create_ledger_tables
+from .money import create_currency_table, get_currency_exponent
+from .search import (FTS_TRIGGERS, fts_available, has_search_index, create_search_index,
+                     rebuild_search_index)
+from .sync import SYNC_TRIGGERS, create_sync_tables, reset_sync_horizon
+from .validation import DIRECTIONS
+
+# Migrations are an ordered list of steps. PRAGMA user_version records the
+# last step applied, so a run only looks at the steps after it. Each step can
+# tell whether it still has work to do, which lets databases created by an
+# up-to-date init_db() (or migrated by hand before versioning) skip straight
+# past it. Table rebuilds copy rows in id-range batches, committing between
+# batches so readers and writers are never locked out for the whole copy, and
+# record how far they got so an interrupted rebuild resumes where it stopped.
+MigrationStep = namedtuple('MigrationStep', ['version', 'name', 'description', 'needed', 'apply'])
+
+MIGRATION_BATCH_SIZE = 5000
+# Seconds to pause between batches so other connections get the write lock
+MIGRATION_BATCH_PAUSE = 0.01
+
+DEBT_COLUMNS = ('id', 'person', 'amount_minor', 'direction', 'note', 'created_at', 'updated_at')
+
+DEBT_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        person TEXT NOT NULL,
+        amount_minor INTEGER NOT NULL,
+        direction TEXT CHECK(direction IN ('you_owe','they_owe')) NOT NULL,
+        note TEXT,
+        created_at TEXT,
+        updated_at TEXT,
+        row_version INTEGER
+    )
+'''
+
+# Matches the direction constraint however the table's SQL was spaced or quoted
+DIRECTION_CHECK = re.compile(r"""CHECK\s*\(\s*["`\[]?direction["`\]]?\s+IN\s*\(([^)]*)\)\s*\)""",
+                             re.IGNORECASE)
+
+# While debt is copied into debt_new, these keep rows that change in
+# already-copied ranges in step with the copy
+REBUILD_TRIGGERS = ('trg_debt_rebuild_insert', 'trg_debt_rebuild_update', 'trg_debt_rebuild_delete')
+
+# Before amounts were stored as integers, the balance summaries, snapshots
+# and ledger entries already counted cents
+LEGACY_EXPONENT = 2
+
+def minor_amount_sql(column, scale):
+    """SQL converting a decimal REAL column to minor units.
+
+    A positive amount smaller than the currency's precision keeps one minor
+    unit rather than becoming zero.
+    """
+    return (f"CASE WHEN {column} > 0 THEN MAX(1, CAST(ROUND({column} * {scale}) AS INTEGER)) "
+            f"ELSE CAST(ROUND({column} * {scale}) AS INTEGER) END")
+
+def create_migration_progress_table(db):
+    """Create the table recording how far a batched step has got."""
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS migration_progress (
+            step TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    ''')
+
+def get_migration_progress(db, step):
+    """Return the last id a batched step finished, or 0."""
+    create_migration_progress_table(db)
+    row = db.execute("SELECT last_id FROM migration_progress WHERE step = ?", (step,)).fetchone()
+    return row[0] if row else 0
+
+def set_migration_progress(db, step, last_id):
+    """Record batch progress, or clear it when last_id is None."""
+    if last_id is None:
+        db.execute("DELETE FROM migration_progress WHERE step = ?", (step,))
+    else:
+        db.execute(
+            "INSERT OR REPLACE INTO migration_progress (step, last_id, updated_at) VALUES (?, ?, ?)",
+            (step, last_id, datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        )
+
+
+def run_batches(db, step, statement, batch_size, params=()):
+    """Run statement over debt in id ranges, committing after each range.
+
+    The statement's last two parameters bound `id > ? AND id <= ?`; any
+    others come from params. Progress is saved with every batch, so a later
+    run picks up after the last committed range. Returns the number of
+    rows changed.
+    """
+    max_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM debt").fetchone()[0]
+    last_id = get_migration_progress(db, step)
+    rows = 0
+    while last_id < max_id:
+        high = last_id + batch_size
+        rows += db.execute(statement, (*params, last_id, high)).rowcount
+        set_migration_progress(db, step, high)
+        db.commit()
+        last_id = high
+        time.sleep(MIGRATION_BATCH_PAUSE)
+    return rows
+
+def debt_table_outdated(db):
+    """Check whether debt lacks columns or the direction CHECK constraint."""
+    if table_columns(db, 'debt_new'):
+        return True  # an interrupted rebuild is waiting to be resumed
+    columns = table_columns(db, 'debt')
+    if not columns:
+        return False  # init_db() creates the table with the current schema
+    if not set(DEBT_COLUMNS).issubset(columns):
+        return True
+    return not direction_check_present(db)
+
+def direction_check_present(db):
+    """Check the debt table's SQL for the CHECK on direction.
+
+    Reading sqlite_master keeps the dry run on /migrate a plain read; a
+    probing INSERT would take the write lock.
+    """
+    row = db.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'debt'").fetchone()
+    match = DIRECTION_CHECK.search(row[0] if row else '')
+    return bool(match) and set(re.findall(r"'([^']*)'", match.group(1))) == set(DIRECTIONS)
+
+def convert_amount_tables(db, exponent):
+    """Move the tables that held decimal amounts over to minor units.
+
+    Runs inside the swap that replaces a debt table with REAL amounts,
+    after the old table and its triggers are gone. The change history is
+    copied into a table with integer columns. Snapshots and ledger entries
+    already counted cents, so they only change for another exponent:
+    snapshots are dropped (as-of queries replay the history instead) and
+    ledger entries are rescaled.
+    """
+    scale = 10 ** exponent
+    if 'amount' in table_columns(db, 'debt_history'):
+        db.execute("ALTER TABLE debt_history RENAME TO debt_history_legacy")
+        db.execute("DROP INDEX IF EXISTS idx_debt_history_changed_at")
+        db.execute("DROP INDEX IF EXISTS idx_debt_history_debt")
+        create_history_tables(db)
+        db.execute(f'''
+            INSERT INTO debt_history
+                (seq, debt_id, op, changed_at, person, amount_minor, direction, note,
+                 old_person, old_amount_minor, old_direction, old_note)
+            SELECT seq, debt_id, op, changed_at,
+                   person, {minor_amount_sql('amount', scale)}, direction, note,
+                   old_person, {minor_amount_sql('old_amount', scale)}, old_direction, old_note
+            FROM debt_history_legacy
+        ''')
+        db.execute("DROP TABLE debt_history_legacy")
+    if exponent == LEGACY_EXPONENT:
+        return
+    if table_columns(db, 'balance_snapshot'):
+        db.execute("DELETE FROM balance_snapshot_person")
+        db.execute("DELETE FROM balance_snapshot")
+    if table_columns(db, 'ledger_entry'):
+        db.execute(f'''
+            UPDATE ledger_entry
+            SET amount_minor = MAX(1, CAST(ROUND(amount_minor * {scale} / {10 ** LEGACY_EXPONENT}.0) AS INTEGER))
+        ''')
+
+def rebuild_debt_table(db, batch_size):
+    """Rebuild debt with the current schema, copying rows in batches.
+
+    Decimal REAL amounts are converted to minor units on the way, with the
+    exponent recorded before the copy starts so a resumed rebuild keeps it.
+    """
+    columns = table_columns(db, 'debt')
+    create_currency_table(db, current_app.config['CURRENCY_EXPONENT'])
+    exponent = get_currency_exponent(db)
+    target_cols = []
+    select_exprs = []
+    for col in DEBT_COLUMNS:
+        if col in columns:
+            select_exprs.append('{ref}' + col)
+        elif col == 'amount_minor' and 'amount' in columns:
+            select_exprs.append(minor_amount_sql('{ref}amount', 10 ** exponent))
+        elif col in ('created_at', 'updated_at'):
+            select_exprs.append("datetime('now')")
+        elif col == 'note':
+            select_exprs.append("''")
+        else:
+            continue
+        target_cols.append(col)
+    target_list = ', '.join(target_cols)
+    
+    def values(ref):
+        return ', '.join(expr.format(ref=ref) for expr in select_exprs)
+    
+    db.execute(DEBT_TABLE_SQL.format(name='debt_new'))
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_debt_rebuild_insert AFTER INSERT ON debt
+        BEGIN INSERT OR REPLACE INTO debt_new ({target_list}) VALUES ({values('NEW.')}); END
+    ''')
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_debt_rebuild_update AFTER UPDATE ON debt
+        BEGIN
+            DELETE FROM debt_new WHERE id = OLD.id;
+            INSERT OR REPLACE INTO debt_new ({target_list}) VALUES ({values('NEW.')});
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_debt_rebuild_delete AFTER DELETE ON debt
+        BEGIN DELETE FROM debt_new WHERE id = OLD.id; END
+    ''')
+    db.commit()
+    
+    rows = run_batches(
+        db, 'debt_table',
+        f"INSERT OR REPLACE INTO debt_new ({target_list}) "
+        f"SELECT {values('')} FROM debt WHERE id > ? AND id <= ?",
+        batch_size
+    )
+    
+    # Swap the tables in one short transaction. Dropping debt also drops
+    # its triggers, so the summary and search triggers are recreated.
+    db.execute("BEGIN IMMEDIATE")
+    for trigger in REBUILD_TRIGGERS:
+        db.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    db.execute("DROP TABLE debt")
+    db.execute("ALTER TABLE debt_new RENAME TO debt")
+    if 'amount' in columns:
+        convert_amount_tables(db, exponent)
+    create_sort_indexes(db)
+    create_balance_tables(db)
+    rebuild_balances(db)
+    if table_columns(db, 'daily_rollup'):
+        create_rollup_tables(db)
+        rebuild_rollups(db)
+    if table_columns(db, 'debt_history'):
+        create_history_tables(db)
+    if table_columns(db, 'data_version'):
+        create_data_version_table(db)
+        bump_data_version(db)
+    if table_columns(db, 'sync_version'):
+        create_sync_tables(db)
+        reset_sync_horizon(db)
+    if create_search_index(db) or has_search_index(db):
+        rebuild_search_index(db)
+    set_migration_progress(db, 'debt_table', None)
+    return rows
+
+def decimal_amounts_present(db):
+    """Check whether debt still stores amounts as decimal REALs."""
+    if table_columns(db, 'debt_new'):
+        return True  # an interrupted rebuild is waiting to be resumed
+    columns = table_columns(db, 'debt')
+    return bool(columns) and 'amount_minor' not in columns
+
+def convert_decimal_amounts(db, batch_size):
+    """Convert REAL amounts first for steps whose SQL reads amount_minor.
+
+    A database last migrated before those steps existed still has decimal
+    amounts when they run, so they bring the conversion forward and the
+    integer_amounts step then finds nothing left to do.
+    """
+    if decimal_amounts_present(db):
+        return rebuild_debt_table(db, batch_size)
+    return 0
+
+def timestamps_missing(db):
+    """Check for rows without created_at/updated_at."""
+    if not {'created_at', 'updated_at'}.issubset(table_columns(db, 'debt')):
+        return True
+    return db.execute(
+        "SELECT 1 FROM debt WHERE created_at IS NULL OR updated_at IS NULL LIMIT 1"
+    ).fetchone() is not None
+
+def fill_timestamps(db, batch_size):
+    """Give rows without timestamps the current time, in batches."""
+    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    rows = run_batches(
+        db, 'timestamps',
+        '''UPDATE debt SET created_at = COALESCE(created_at, ?),
+                           updated_at = COALESCE(updated_at, ?)
+           WHERE (created_at IS NULL OR updated_at IS NULL) AND id > ? AND id <= ?''',
+        batch_size, (now, now)
+    )
+    set_migration_progress(db, 'timestamps', None)
+    return rows
+
+def sort_indexes_missing(db):
+    """Check whether any dashboard sort index is missing."""
+    indexes = {row[1] for row in db.execute("PRAGMA index_list(debt)").fetchall()}
+    return not set(SORT_INDEXES).issubset(indexes)
+
+def add_sort_indexes(db, batch_size):
+    """Create the missing sort indexes."""
+    convert_decimal_amounts(db, batch_size)
+    create_sort_indexes(db)
+    return 0
+
+def balance_summary_outdated(db):
+    """Check the balance summary tables, triggers and totals."""
+    triggers = {row[0] for row in db.execute(
+        "SELECT name FROM sqlite_master WHERE type='trigger' AND tbl_name='debt'"
+    ).fetchall()}
+    if not set(BALANCE_TRIGGERS).issubset(triggers):
+        return True
+    return not check_balance_consistency(db, repair=False)
+
+def build_balance_summary(db, batch_size):
+    """Create the balance summary and rebuild it from debt."""
+    convert_decimal_amounts(db, batch_size)
+    create_balance_tables(db)
+    rebuild_balances(db)
+    return db.execute("SELECT COUNT(*) FROM person_balance").fetchone()[0]
+
+def search_index_outdated(db):
+    """Check the FTS index and its triggers (never needed without FTS5)."""
+    if not fts_available():
+        return False
+    triggers = {row[0] for row in db.execute(
+        "SELECT name FROM sqlite_master WHERE type='trigger' AND tbl_name='debt'"
+    ).fetchall()}
+    return not has_search_index(db) or not set(FTS_TRIGGERS).issubset(triggers)
+
+def build_search_index(db, batch_size):
+    """Create the FTS index and rebuild it from debt."""
+    create_search_index(db)
+    rebuild_search_index(db)
+    return 0
+
+def idempotency_table_missing(db):
+    """Check whether the idempotency key table exists."""
+    return not table_columns(db, 'idempotency_keys')
+
+def add_idempotency_table(db, batch_size):
+    """Create the idempotency key table."""
+    create_idempotency_table(db)
+    return 0
+
+def ledger_tables_missing(db):
+    """Check whether the shared-expense ledger tables exist."""
+    return not table_columns(db, 'ledger_entry')
+
+def add_ledger_tables(db, batch_size):
+    """Create the shared-expense ledger tables."""
+    create_ledger_tables(db)
+    return 0
+
+def rollups_outdated(db):
+    """Check the daily rollup tables and their triggers."""
+    triggers = {row[0] for row in db.execute(
+        "SELECT name FROM sqlite_master WHERE type='trigger' AND tbl_name='debt'"
+    ).fetchall()}
+    return not set(ROLLUP_TRIGGERS).issubset(triggers)
+
+def build_rollups(db, batch_size):
+    """Create the daily rollups and backfill them from debt."""
+    convert_decimal_amounts(db, batch_size)
+    create_rollup_tables(db)
+    rebuild_rollups(db)
+    return db.execute("SELECT COUNT(*) FROM daily_rollup").fetchone()[0]
+
+def history_outdated(db):
+    """Check the change history tables and their triggers."""
+    triggers = {row[0] for row in db.execute(
+        "SELECT name FROM sqlite_master WHERE type='trigger' AND tbl_name='debt'"
+    ).fetchall()}
+    return not set(HISTORY_TRIGGERS).issubset(triggers)
+
+def build_history(db, batch_size):
+    """Create the change history and seed it with the existing rows."""
+    convert_decimal_amounts(db, batch_size)
+    if create_history_tables(db):
+        seed_history(db)
+    return db.execute("SELECT COUNT(*) FROM debt_history").fetchone()[0]
+
+def data_version_outdated(db):
+    """Check the data version counter and its triggers."""
+    if not table_columns(db, 'data_version'):
+        return True
+    triggers = {row[0] for row in db.execute(
+        "SELECT name FROM sqlite_master WHERE type='trigger'"
+    ).fetchall()}
+    return not set(DATA_VERSION_TRIGGERS).issubset(triggers)
+
+def add_data_version(db, batch_size):
+    """Create the data version counter used for HTTP caching."""
+    create_data_version_table(db)
+    return 0
+
+def row_versions_missing(db):
+    """Check the row_version column, the sync tables and their triggers."""
+    if 'row_version' not in table_columns(db, 'debt') or not table_columns(db, 'sync_version'):
+        return True
+    triggers = {row[0] for row in db.execute(
+        "SELECT name FROM sqlite_master WHERE type='trigger' AND tbl_name='debt'"
+    ).fetchall()}
+    if not set(SYNC_TRIGGERS).issubset(triggers):
+        return True
+    return db.execute("SELECT 1 FROM debt WHERE row_version IS NULL LIMIT 1").fetchone() is not None
+
+def add_row_versions(db, batch_size):
+    """Add row versions for delta sync, backfilling existing rows in batches.
+
+    Existing rows are stamped with their id, which is below the counter's
+    starting value, so they all count as changed before the first sync.
+    """
+    if 'row_version' not in table_columns(db, 'debt'):
+        db.execute("ALTER TABLE debt ADD COLUMN row_version INTEGER")
+    create_sync_tables(db)
+    db.commit()
+    rows = run_batches(
+        db, 'row_versions',
+        "UPDATE debt SET row_version = id WHERE row_version IS NULL AND id > ? AND id <= ?",
+        batch_size
+    )
+    set_migration_progress(db, 'row_versions', None)
+    return rows
+
+MIGRATION_STEPS = [
+    MigrationStep(1, 'debt_table', 'Rebuild the debt table with timestamps and the direction constraint',
+                  debt_table_outdated, rebuild_debt_table),
+    MigrationStep(2, 'timestamps', 'Fill in missing created/updated timestamps',
+                  timestamps_missing, fill_timestamps),
+    MigrationStep(3, 'sort_indexes', 'Create the dashboard sort indexes',
+                  sort_indexes_missing, add_sort_indexes),
+    MigrationStep(4, 'balance_summary', 'Build the balance summary tables and triggers',
+                  balance_summary_outdated, build_balance_summary),
+    MigrationStep(5, 'search_index', 'Build the full-text search index',
+                  search_index_outdated, build_search_index),
+    MigrationStep(6, 'idempotency_keys', 'Create the batch API idempotency table',
+                  idempotency_table_missing, add_idempotency_table),
+    MigrationStep(7, 'ledgers', 'Create the shared-expense ledger tables',
+                  ledger_tables_missing, add_ledger_tables),
+    MigrationStep(8, 'daily_rollups', 'Build the daily balance rollups',
+                  rollups_outdated, build_rollups),
+    MigrationStep(9, 'history', 'Start the change history for as-of balances',
+                  history_outdated, build_history),
+    MigrationStep(10, 'data_version', 'Create the data version counter for HTTP caching',
+                  data_version_outdated, add_data_version),
+    MigrationStep(11, 'row_versions', 'Add row versions and tombstones for delta sync',
+                  row_versions_missing, add_row_versions),
+    MigrationStep(12, 'integer_amounts', 'Store amounts as integer minor units',
+                  decimal_amounts_present, rebuild_debt_table),
+]
+SCHEMA_VERSION = MIGRATION_STEPS[-1].version
+
+def get_user_version(db):
+    """Return the last migration step applied to this database."""
+    return db.execute("PRAGMA user_version").fetchone()[0]
+
+def run_migrations(db, dry_run=False, batch_size=MIGRATION_BATCH_SIZE):
+    """Apply the pending migration steps in order, or just plan them.
+
+    Returns one dict per step with its status ('applied' before this run,
+    'pending' or 'up to date' in a dry run, 'done', 'skipped' or
+    'failed'), the rows it touched and how long it took. Each step bumps
+    user_version in the transaction that finishes it, and the run stops
+    at the first failure.
+    """
+    current = get_user_version(db)
+    results = []
+    for step in MIGRATION_STEPS:
+        result = {
+            'version': step.version,
+            'name': step.name,
+            'description': step.description,
+            'status': 'applied',
+            'rows': None,
+            'duration': None,
+            'error': None,
+        }
+        results.append(result)
+        if step.version <= current:
+            continue
+
+        started = time.perf_counter()
+        try:
+            needed = step.needed(db)
+            if dry_run:
+                result['status'] = 'pending' if needed else 'up to date'
+                continue
+            if needed:
+                result['rows'] = step.apply(db, batch_size)
+            db.execute(f"PRAGMA user_version = {step.version}")
+            db.commit()
+            result['status'] = 'done' if needed else 'skipped'
+        except sqlite3.Error as e:
+            db.rollback()
+            result['status'] = 'failed'
+            result['error'] = str(e)
+            current_app.logger.error(f"Migration step {step.version} ({step.name}) failed: {str(e)}")
+            break
+        finally:
+            result['duration'] = round(time.perf_counter() - started, 3)
+
+    if not dry_run:
+        # Pooled connections in every worker may hold statements prepared
+        # against the old table
+        get_pool().mark_replaced()
+        refresh_schema(db)
+    return results
+
+def check_database_status(steps=None):
+    """Return the migration steps (planned if not given) as status checks."""
+    if steps is None:
+        steps = run_migrations(get_db(), dry_run=True)
+    return [
+        {'name': step['description'], 'status': step['status'] not in ('pending', 'failed')}
+        for step in steps
+    ]
+
+def needs_migration(checks=None):
+    """Determine if the database needs migration."""
+    if checks is None:
+        checks = check_database_status()
+    return not all(check['status'] for check in checks)
+
+
+@click.command('migrate-db')
+@click.option('--dry-run', is_flag=True, help='Show the pending steps without applying them.')
+@click.option('--batch-size', default=MIGRATION_BATCH_SIZE, show_default=True,
+              help='Rows copied per transaction in table rebuilds.')
+@with_appcontext
+def migrate_db_command(dry_run, batch_size):
+    """Apply pending database migration steps."""
+    db = get_db()
+    click.echo(f"Schema version {get_user_version(db)} of {SCHEMA_VERSION}")
+    steps = run_migrations(db, dry_run=dry_run, batch_size=batch_size)
+    for step in steps:
+        line = f"  {step['version']}. {step['name']}: {step['status']}"
+        if step['rows'] is not None:
+            line += f", {step['rows']} rows"
+        if step['duration'] is not None and not dry_run:
+            line += f" in {step['duration']:.3f}s"
+        click.echo(line)
+        if step['error']:
+            raise click.ClickException(step['error'])
+
+@click.command('check-balances')
+@with_appcontext
+def check_balances_command():
+    """Verify the balance summary tables and rebuild them if they drifted."""
+    db = get_db()
+    if check_balance_consistency(db, repair=False):
+        click.echo("Balance summary is consistent.")
+    elif check_balance_consistency(db, repair=True):
+        click.echo("Balance summary drifted and has been rebuilt.")
+    else:
+        raise click.ClickException("Balance summary check failed; see the log for details.")
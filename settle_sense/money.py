@@ -0,0 +1,70 @@
+"""
+Money amounts as integer minor units.
+"""
+
+import sqlite3
+from decimal import Decimal, DecimalException, ROUND_HALF_UP
+
+# Amounts are stored as integers in the currency's minor unit: cents for an
+# exponent of 2, whole units for 0, thousandths for 3. Sums in SQLite are
+# then exact, and decimal text only appears at the edges (forms, JSON,
+# exports). The exponent is chosen from CURRENCY_EXPONENT when a database
+# is created or converted and recorded in the database, since the stored
+# numbers mean nothing without it.
+DEFAULT_CURRENCY_EXPONENT = 2
+MAX_CURRENCY_EXPONENT = 4
+# Largest single amount accepted, in minor units; keeps sums of many
+# entries far from SQLite's 64-bit integer limit
+MAX_AMOUNT_MINOR = 10 ** 15 - 1
+# Digits before the point, in minor units, beyond which to_minor() refuses a
+# number outright instead of scaling it (1e999999999 would overflow)
+MAX_MINOR_DIGITS = 30
+
+def create_currency_table(db, exponent):
+    """Record the currency exponent unless the database already has one."""
+    db.execute(f'''
+        CREATE TABLE IF NOT EXISTS currency (
+            id INTEGER PRIMARY KEY CHECK(id = 1),
+            exponent INTEGER NOT NULL CHECK(exponent BETWEEN 0 AND {MAX_CURRENCY_EXPONENT})
+        )
+    ''')
+    db.execute("INSERT OR IGNORE INTO currency (id, exponent) VALUES (1, ?)", (exponent,))
+
+def get_currency_exponent(db):
+    """Return the recorded exponent, or None before one has been recorded."""
+    try:
+        row = db.execute("SELECT exponent FROM currency WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+def to_minor(amount, exponent):
+    """Convert a decimal amount (number or text) to integer minor units.
+
+    Rounds half away from zero to the currency's precision. Raises
+    ValueError for anything that is not a finite number, or whose size is
+    far beyond any real amount.
+    """
+    if isinstance(amount, bool) or amount is None:
+        raise ValueError("Invalid amount")
+    try:
+        value = Decimal(str(amount).strip())
+        if not value.is_finite():
+            raise ValueError("Invalid amount")
+        if value and value.adjusted() + exponent >= MAX_MINOR_DIGITS:
+            raise ValueError("Amount is too large")
+        return int(value.scaleb(exponent).to_integral_value(rounding=ROUND_HALF_UP))
+    except DecimalException:
+        raise ValueError("Invalid amount")
+
+def from_minor(amount_minor, exponent):
+    """Convert minor units to a float for JSON; its repr is the exact decimal."""
+    return amount_minor / 10 ** exponent
+
+def format_minor(amount_minor, exponent):
+    """Format minor units as plain decimal text, e.g. 1250 -> '12.50'."""
+    sign = '-' if amount_minor < 0 else ''
+    units, fraction = divmod(abs(amount_minor), 10 ** exponent)
+    if not exponent:
+        return f"{sign}{units}"
+    return f"{sign}{units}.{fraction:0{exponent}d}"
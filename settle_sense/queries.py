@@ -0,0 +1,214 @@
+"""
+Dashboard query helpers: filters, sort modes and keyset pagination.
+"""
+
+import base64
+import binascii
+import json
+from collections import namedtuple
+from markupsafe import Markup, escape
+from .db import get_schema
+from .search import build_fts_query
+
+# Dashboard Query Helpers
+PAGE_SIZES = (10, 25, 50, 100)
+DEFAULT_PAGE_SIZE = 10
+
+def get_page_size(settings):
+    """Return the records_per_page setting as a validated integer."""
+    try:
+        page_size = int(settings.get('records_per_page', DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return page_size if page_size in PAGE_SIZES else DEFAULT_PAGE_SIZE
+
+def get_sort_expression(sort_by, schema, filters=None):
+    """Map a dashboard sort mode to the SQL expression it orders by."""
+    if sort_by == 'amount':
+        return 'debt.amount_minor'
+    elif sort_by == 'person':
+        return 'debt.person'
+    elif sort_by == 'direction':
+        return 'debt.direction'
+    elif sort_by == 'relevance' and filters is not None and filters.search_mode == 'fts':
+        # bm25() is lower for better matches; negate so DESC means best first
+        return '-bm25(debt_fts)'
+    # Default: date or fallback to id
+    return schema.date_sort
+
+DebtFilters = namedtuple('DebtFilters', ['source', 'where', 'params', 'search_mode'])
+
+def build_debt_filters(db, search_query='', filter_person='', filter_direction=''):
+    """Build the FROM/WHERE clauses and parameters shared by dashboard queries.
+
+    Free-text search goes through the FTS index when one is available, and
+    falls back to LIKE scans otherwise.
+    """
+    source = 'debt'
+    clauses = []
+    params = []
+    search_mode = None
+
+    if search_query:
+        fts_query = build_fts_query(search_query)
+        if fts_query and get_schema().has_search_index:
+            # CROSS JOIN keeps debt_fts as the outer loop, so the MATCH runs
+            # once; with a person filter SQLite would otherwise walk
+            # idx_debt_person and re-run the MATCH for every row
+            source = 'debt_fts CROSS JOIN debt ON debt.id = debt_fts.rowid'
+            clauses.append("debt_fts MATCH ?")
+            params.append(fts_query)
+            search_mode = 'fts'
+        else:
+            clauses.append("(debt.person LIKE ? OR debt.note LIKE ?)")
+            params.extend(['%' + search_query + '%', '%' + search_query + '%'])
+            search_mode = 'like'
+
+    if filter_person:
+        clauses.append("debt.person = ?")
+        params.append(filter_person)
+
+    if filter_direction:
+        clauses.append("debt.direction = ?")
+        params.append(filter_direction)
+
+    where = ' AND '.join(clauses) if clauses else '1=1'
+    return DebtFilters(source, where, params, search_mode)
+
+def encode_cursor(sort_key, entry_id):
+    """Encode a (sort key, id) position as an opaque URL-safe token."""
+    raw = json.dumps([sort_key, entry_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+SQLITE_INTEGER_RANGE = range(-2 ** 63, 2 ** 63)
+
+def is_sql_scalar(value, types=(str, int, float, type(None))):
+    """Return True for a JSON value SQLite can bind and compare."""
+    if isinstance(value, bool) or not isinstance(value, types):
+        return False
+    return not isinstance(value, int) or value in SQLITE_INTEGER_RANGE
+
+def decode_cursor(token):
+    """Decode a cursor token, returning None if it is missing or malformed.
+
+    The sort key is bound into the keyset comparison, so anything but a
+    scalar SQLite can compare (e.g. a crafted list) counts as malformed.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        sort_key, entry_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not is_sql_scalar(sort_key) or not is_sql_scalar(entry_id, (int,)):
+            return None
+        return sort_key, entry_id
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+# Markers wrapped around FTS matches; escaped output is marked up afterwards
+MATCH_START = '\x01'
+MATCH_END = '\x02'
+
+def fetch_debt_page(db, filters, sort_expr, descending, page_size,
+                    after=None, before=None):
+    """Fetch one page of entries using keyset pagination.
+
+    Rows are ordered by (sort_expr, id) so every position is unique, and the
+    page boundary is expressed as a comparison against the cursor instead of
+    an OFFSET. With the sort indexes created by init_db() SQLite seeks
+    straight to the page, so page N costs the same as page 1.
+
+    Returns a tuple of (entries, prev_cursor, next_cursor).
+    """
+    # Walking backwards from a 'before' cursor reverses the scan direction
+    backwards = before is not None and after is None
+    scan_desc = descending != backwards
+    order = 'DESC' if scan_desc else 'ASC'
+
+    match_columns = ''
+    if filters.search_mode == 'fts':
+        match_columns = f''',
+               highlight(debt_fts, 0, '{MATCH_START}', '{MATCH_END}') as person_match,
+               snippet(debt_fts, 1, '{MATCH_START}', '{MATCH_END}', '…', 16) as note_match'''
+
+    query = f'''
+        SELECT debt.*,
+               CASE debt.direction
+                   WHEN 'they_owe' THEN debt.amount_minor
+                   ELSE -debt.amount_minor
+               END as net_amount,
+               {sort_expr} as sort_key{match_columns}
+        FROM {filters.source}
+        WHERE {filters.where}
+    '''
+    query_params = list(filters.params)
+
+    cursor = after if not backwards else before
+    if cursor is not None:
+        # Equivalent to ({sort_expr}, id) > (key, id), spelled out so SQLite
+        # can seek the sort index with a range bound
+        op = '<' if scan_desc else '>'
+        query += f" AND {sort_expr} {op}= ? AND ({sort_expr} {op} ? OR debt.id {op} ?)"
+        sort_key, entry_id = cursor
+        query_params.extend([sort_key, sort_key, entry_id])
+
+    query += f" ORDER BY {sort_expr} {order}, debt.id {order} LIMIT ?"
+    query_params.append(page_size + 1)
+
+    entries = db.execute(query, query_params).fetchall()
+    has_more = len(entries) > page_size
+    entries = entries[:page_size]
+    if backwards:
+        entries.reverse()
+
+    if not entries:
+        return entries, None, None
+
+    first = encode_cursor(entries[0]['sort_key'], entries[0]['id'])
+    last = encode_cursor(entries[-1]['sort_key'], entries[-1]['id'])
+    if backwards:
+        prev_cursor = first if has_more else None
+        next_cursor = last
+    else:
+        prev_cursor = first if cursor is not None else None
+        next_cursor = last if has_more else None
+    return entries, prev_cursor, next_cursor
+
+def get_debt_totals(db, filters):
+    """Compute headline totals and per-person balances for a filtered set.
+
+    Both come from one GROUP BY: the window sums over the per-person groups
+    give the totals, so every sum is an exact integer sum in SQLite. Amounts
+    are in minor units, like get_balance_totals().
+    """
+    rows = db.execute(f'''
+        SELECT debt.person as person,
+               SUM(CASE WHEN debt.direction = 'they_owe' THEN debt.amount_minor ELSE 0 END) as owed_to_you,
+               SUM(CASE WHEN debt.direction = 'you_owe' THEN debt.amount_minor ELSE 0 END) as you_owe,
+               SUM(COUNT(*)) OVER () as total_count,
+               SUM(SUM(CASE WHEN debt.direction = 'they_owe' THEN debt.amount_minor ELSE 0 END)) OVER () as total_owed,
+               SUM(SUM(CASE WHEN debt.direction = 'you_owe' THEN debt.amount_minor ELSE 0 END)) OVER () as total_owe
+        FROM {filters.source}
+        WHERE {filters.where}
+        GROUP BY debt.person
+    ''', filters.params).fetchall()
+
+    owed = rows[0]['total_owed'] if rows else 0
+    owe = rows[0]['total_owe'] if rows else 0
+    return {
+        'entry_count': rows[0]['total_count'] if rows else 0,
+        'total_owed_to_you': owed,
+        'total_you_owe': owe,
+        'net_balance': owed - owe,
+        'people': [
+            {'name': r['person'], 'balance': r['owed_to_you'] - r['you_owe']}
+            for r in rows
+        ]
+    }
+
+def highlight_match(value):
+    """Render FTS match markers as <mark> tags around escaped text."""
+    if not value:
+        return ''
+    html = str(escape(value))
+    return Markup(html.replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>'))
@@ -0,0 +1,159 @@
+"""
+Slow-query log: statements over a threshold, with their query plans.
+"""
+
+import datetime
+import re
+import sqlite3
+import threading
+from flask import has_request_context, request
+
+# Opt in with SLOW_QUERY_MS. get_db() attaches the app's SlowQueryLog to the
+# connection, and db.TimedCursor reports each statement's time to it: the
+# execute() call plus every fetch*() on the same cursor, so a query whose
+# cost is in reading its rows is caught too. A statement is recorded the
+# first time its running total crosses the threshold, and later fetches add
+# to that record.
+#
+# Statements are grouped by their SQL text with whitespace collapsed, which
+# keeps the dynamic dashboard queries apart per filter and sort combination.
+# Parameter values are never stored, only their types. The first time a
+# statement shows up it is run through EXPLAIN QUERY PLAN with the same
+# parameters, and plans that scan a whole table or sort through a temporary
+# B-tree are flagged. The log lives in the worker process.
+
+# Distinct statements kept; the one with the least total time makes room
+SLOW_QUERY_LIMIT = 200
+# Characters of SQL written to the application log
+SLOW_QUERY_PREVIEW = 300
+
+EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+TABLE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)$')
+SUBQUERY = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (\w+)')
+
+def normalize_sql(sql):
+    return ' '.join(sql.split())
+
+def parameters_shape(parameters, many=False):
+    """Describe bound parameters by type only, e.g. "(str, float)"."""
+    if many:
+        if not isinstance(parameters, (list, tuple)):
+            return 'many rows'
+        first = parameters_shape(parameters[0]) if parameters else '()'
+        return f"{len(parameters)} rows of {first}"
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f":{name} {type(value).__name__}" for name, value in parameters.items()) + '}'
+    return '(' + ', '.join(type(value).__name__ for value in parameters) + ')'
+
+def explain(connection, sql, parameters):
+    """Return the EXPLAIN QUERY PLAN details for sql, or [] if it has none."""
+    if not EXPLAINABLE.match(sql):
+        return []
+    try:
+        # A plain cursor, so the plan is neither counted nor traced itself
+        cursor = sqlite3.Cursor(connection)
+        rows = cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except (sqlite3.Error, ValueError):
+        return []
+    return [row[3] for row in rows]
+
+def plan_flags(plan):
+    """Flag full table scans and temporary B-tree sorts in a query plan."""
+    flags = []
+    # Scanning a CTE or subquery is not a table scan; its own steps are checked
+    subqueries = {match.group(1) for match in map(SUBQUERY.match, plan) if match}
+    for detail in plan:
+        scan = TABLE_SCAN.match(detail)
+        if scan and scan.group(1) not in subqueries and 'full scan' not in flags:
+            flags.append('full scan')
+        if 'USE TEMP B-TREE' in detail and 'temp b-tree' not in flags:
+            flags.append('temp b-tree')
+    return flags
+
+class StatementTrace:
+    """Running time of one executed statement on its cursor."""
+    __slots__ = ('sql', 'parameters', 'many', 'seconds', 'entry')
+
+    def __init__(self, sql, parameters, many, seconds):
+        self.sql = sql
+        self.parameters = parameters
+        self.many = many
+        self.seconds = seconds
+        self.entry = None
+
+class SlowQueryLog:
+    """Statements that took longer than threshold_ms, grouped by SQL."""
+
+    def __init__(self, threshold_ms, logger, limit=SLOW_QUERY_LIMIT):
+        self.threshold = threshold_ms / 1000
+        self.logger = logger
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def begin(self, connection, sql, parameters, seconds, many=False):
+        """Start tracing a statement that has just been executed."""
+        trace = StatementTrace(sql, parameters, many, seconds)
+        if seconds >= self.threshold:
+            self._record(connection, trace)
+        return trace
+
+    def add(self, connection, trace, seconds):
+        """Add fetch time to a traced statement."""
+        trace.seconds += seconds
+        entry = trace.entry
+        if entry is None:
+            if trace.seconds >= self.threshold:
+                self._record(connection, trace)
+            return
+        with self._lock:
+            entry['total_seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], trace.seconds)
+
+    def _record(self, connection, trace):
+        key = normalize_sql(trace.sql)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            # Explain outside the lock; a duplicate plan from a racing thread is harmless
+            plan = [] if trace.many else explain(connection, trace.sql, trace.parameters)
+            entry = {
+                'sql': key,
+                'parameters': parameters_shape(trace.parameters, trace.many),
+                'plan': plan,
+                'flags': plan_flags(plan),
+                'count': 0,
+                'total_seconds': 0.0,
+                'max_seconds': 0.0,
+                'endpoint': None,
+                'last_seen': None,
+            }
+
+        endpoint = request.endpoint if has_request_context() else None
+        with self._lock:
+            entry = self._entries.setdefault(key, entry)
+            entry['count'] += 1
+            entry['total_seconds'] += trace.seconds
+            entry['max_seconds'] = max(entry['max_seconds'], trace.seconds)
+            entry['endpoint'] = endpoint or entry['endpoint']
+            entry['last_seen'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            if len(self._entries) > self.limit:
+                smallest = min(self._entries, key=lambda k: self._entries[k]['total_seconds'])
+                del self._entries[smallest]
+        trace.entry = entry
+
+        flags = f" [{', '.join(entry['flags'])}]" if entry['flags'] else ''
+        self.logger.warning(
+            f"Slow query ({trace.seconds * 1000:.1f} ms){flags} params {entry['parameters']}"
+            f"{' in ' + endpoint if endpoint else ''}: {key[:SLOW_QUERY_PREVIEW]}"
+        )
+
+    def top(self, count=10):
+        """Return copies of the statements with the most total time, slowest first."""
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda e: e['total_seconds'], reverse=True)
+            return [dict(entry) for entry in entries[:count]]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
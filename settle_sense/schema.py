@@ -0,0 +1,153 @@
+"""
+Schema creation for SettleSense.
+
+The schema is no longer checked when the module is imported: ensure_db()
+runs init_db() the first time an app needs the database, and
+`flask init-db` does it up front.
+"""
+
+import datetime
+import sqlite3
+import threading
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from .balances import (create_balance_tables, rebuild_balances, create_rollup_tables,
+                       rebuild_rollups, create_history_tables, seed_history)
+from .batch import create_idempotency_table
+from .caching import create_data_version_table
+from .db import get_db, get_schema, refresh_schema, table_columns, create_sort_indexes
+from .ledgers import create_ledger_tables
+from .migrations import DEBT_TABLE_SQL, SCHEMA_VERSION, get_user_version
+from .money import create_currency_table
+from .search import create_search_index, rebuild_search_index
+from .sync import create_sync_tables
+
+def init_db():
+    """Initialize the database schema if it doesn't exist."""
+    db = get_db()
+    
+    try:
+        # First check if the table exists and what columns it has
+        cursor = db.execute("PRAGMA table_info(debt)")
+        columns = {row['name'] for row in cursor.fetchall()}
+        
+        if not columns:
+            current_app.logger.info("Creating new debt table with complete schema")
+            # Table doesn't exist, create it with all columns. It starts out
+            # with every migration step already applied.
+            db.execute(DEBT_TABLE_SQL.format(name='debt'))
+            db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            columns = table_columns(db, 'debt')
+        else:
+            current_app.logger.info(f"Existing table found with columns: {', '.join(columns)}")
+            # Table exists, check if it needs to be updated
+            if 'created_at' not in columns:
+                current_app.logger.info("Adding created_at column")
+                db.execute('ALTER TABLE debt ADD COLUMN created_at TEXT')
+            if 'updated_at' not in columns:
+                current_app.logger.info("Adding updated_at column")
+                db.execute('ALTER TABLE debt ADD COLUMN updated_at TEXT')
+        
+        # A table that still has decimal REAL amounts is converted by the
+        # integer_amounts migration step, which also builds what reads them
+        if 'amount_minor' in columns:
+            create_currency_table(db, current_app.config['CURRENCY_EXPONENT'])
+            create_sort_indexes(db)
+            if create_balance_tables(db):
+                current_app.logger.info("Building balance summary tables")
+                rebuild_balances(db)
+            if create_rollup_tables(db):
+                current_app.logger.info("Backfilling daily rollups")
+                rebuild_rollups(db)
+            if create_history_tables(db):
+                current_app.logger.info("Starting change history")
+                seed_history(db)
+        else:
+            current_app.logger.warning("Amounts are stored as decimals; run the database migration")
+        if create_search_index(db):
+            current_app.logger.info("Building full-text search index")
+            rebuild_search_index(db)
+        create_idempotency_table(db)
+        create_ledger_tables(db)
+        create_data_version_table(db)
+        # Older tables get the column from the row_versions migration step
+        if 'row_version' in table_columns(db, 'debt'):
+            create_sync_tables(db)
+        db.commit()
+        refresh_schema(db)
+        current_app.logger.info("Database schema initialization completed successfully")
+        return True
+    except sqlite3.Error as e:
+        current_app.logger.error(f"Database initialization error: {str(e)}")
+        db.rollback()
+        return False
+
+# Helper function to update any null timestamps in existing data
+def update_null_timestamps():
+    """Update any null timestamps in the database with the current time."""
+    db = get_db()
+    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    try:
+        # First check if the timestamps columns exist
+        schema = get_schema()
+        
+        updated_rows = 0
+        
+        if schema.has_created_at:
+            result = db.execute('UPDATE debt SET created_at = ? WHERE created_at IS NULL', (now,))
+            updated_rows += result.rowcount
+            
+        if schema.has_updated_at:
+            result = db.execute('UPDATE debt SET updated_at = ? WHERE updated_at IS NULL', (now,))
+            updated_rows += result.rowcount
+        
+        db.commit()
+        current_app.logger.info(f"Updated timestamps for {updated_rows} rows")
+        return True
+    except sqlite3.Error as e:
+        current_app.logger.error(f"Error updating timestamps: {str(e)}")
+        db.rollback()
+        return False
+
+# Serializes the first-use schema check between request threads
+_init_lock = threading.Lock()
+
+def ensure_db():
+    """Check the schema the first time the current app uses the database.
+
+    get_db() calls this with the new connection in place until it
+    succeeds, so the schema is checked once per app instead of on every
+    import. A database whose user_version says every migration step has
+    been applied already has the full schema and no NULL timestamps, so it
+    costs two PRAGMAs; anything older goes through init_db() and
+    update_null_timestamps(). A server that preloads the app opens a
+    connection in the master, so forked workers inherit a checked schema.
+    """
+    if current_app.extensions.get('db_ready'):
+        return
+    with _init_lock:
+        if current_app.extensions.get('db_ready'):
+            return
+        try:
+            db = get_db()
+            ready = get_user_version(db) >= SCHEMA_VERSION and bool(table_columns(db, 'debt'))
+            if not ready:
+                ready = init_db()
+                if ready:
+                    update_null_timestamps()
+        except Exception as e:
+            current_app.logger.error(f"Failed to initialize database: {str(e)}")
+            ready = False
+        current_app.extensions['db_ready'] = ready
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create the database schema, or bring an existing one up to date."""
+    # The first connection runs the schema check
+    get_db()
+    if not current_app.extensions.get('db_ready'):
+        raise click.ClickException("Database initialization failed; see the log for details.")
+    click.echo(f"Database ready at {current_app.config['DATABASE']}.")
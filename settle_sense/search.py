@@ -0,0 +1,86 @@
+"""
+Full-text search over debt entries.
+"""
+
+import re
+import sqlite3
+
+# debt_fts is an external-content FTS5 index over debt.person and debt.note,
+# kept in sync by triggers. SQLite builds without FTS5 fall back to LIKE.
+FTS_TRIGGERS = {
+    'trg_debt_fts_insert': '''
+        CREATE TRIGGER IF NOT EXISTS trg_debt_fts_insert AFTER INSERT ON debt
+        BEGIN
+            INSERT INTO debt_fts (rowid, person, note) VALUES (NEW.id, NEW.person, NEW.note);
+        END
+    ''',
+    'trg_debt_fts_delete': '''
+        CREATE TRIGGER IF NOT EXISTS trg_debt_fts_delete AFTER DELETE ON debt
+        BEGIN
+            INSERT INTO debt_fts (debt_fts, rowid, person, note)
+            VALUES ('delete', OLD.id, OLD.person, OLD.note);
+        END
+    ''',
+    'trg_debt_fts_update': '''
+        CREATE TRIGGER IF NOT EXISTS trg_debt_fts_update AFTER UPDATE OF person, note ON debt
+        BEGIN
+            INSERT INTO debt_fts (debt_fts, rowid, person, note)
+            VALUES ('delete', OLD.id, OLD.person, OLD.note);
+            INSERT INTO debt_fts (rowid, person, note) VALUES (NEW.id, NEW.person, NEW.note);
+        END
+    ''',
+}
+
+_fts_available = None
+
+def fts_available():
+    """Return True if this SQLite build supports FTS5."""
+    global _fts_available
+    if _fts_available is None:
+        probe = sqlite3.connect(':memory:')
+        try:
+            probe.execute("CREATE VIRTUAL TABLE fts_probe USING fts5(body)")
+            _fts_available = True
+        except sqlite3.Error:
+            _fts_available = False
+        finally:
+            probe.close()
+    return _fts_available
+
+def has_search_index(db):
+    """Return True if the FTS index exists in this database."""
+    if not fts_available():
+        return False
+    row = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='debt_fts'"
+    ).fetchone()
+    return row is not None
+
+def create_search_index(db):
+    """Create the FTS index and its triggers if FTS5 is available.
+
+    Returns True if the index was newly created and still needs a rebuild.
+    """
+    if not fts_available():
+        return False
+    existed = has_search_index(db)
+    db.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS debt_fts USING fts5(
+            person, note,
+            content='debt', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    for trigger_sql in FTS_TRIGGERS.values():
+        db.execute(trigger_sql)
+    return not existed
+
+def rebuild_search_index(db):
+    """Repopulate the FTS index from the debt table."""
+    if has_search_index(db):
+        db.execute("INSERT INTO debt_fts (debt_fts) VALUES ('rebuild')")
+
+def build_fts_query(text):
+    """Turn free text into an FTS5 query matching every term as a prefix."""
+    terms = re.findall(r'\w+', text)
+    return ' '.join(f'"{term}"*' for term in terms)
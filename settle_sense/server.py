@@ -0,0 +1,90 @@
+"""
+Production server: gunicorn with preforked, threaded workers.
+"""
+
+import functools
+import os
+import signal
+from .db import get_db
+from .live import broadcaster, watcher
+
+# `python -m settle_sense.app` without DEBUG serves through gunicorn: the app
+# is created and the schema checked once in the master process, which then forks
+# WEB_WORKERS worker processes. Each worker opens its own connections (the
+# pool resets itself after a fork) and serves WEB_THREADS requests at a time.
+# A live update stream holds its thread for as long as the browser stays
+# connected, so every worker gets LIVE_MAX_CLIENTS threads on top of those;
+# gunicorn only starts a thread when a connection needs one.
+# SIGHUP starts fresh workers and retires the old ones gracefully; SIGTERM
+# shuts down gracefully. Code changes need a restart, since the app is
+# preloaded in the master.
+
+def server_options(app):
+    """Return the gunicorn settings derived from the app config."""
+    host = os.environ.get('HOST', '127.0.0.1')
+    port = int(os.environ.get('PORT', 5000))
+    return {
+        'bind': f"{host}:{port}",
+        'workers': app.config['WEB_WORKERS'],
+        # Threads so live update streams do not tie up a whole worker
+        'worker_class': 'gthread',
+        'threads': app.config['WEB_THREADS'] + app.config['LIVE_MAX_CLIENTS'],
+        'keepalive': app.config['WEB_KEEPALIVE'],
+        'timeout': app.config['WEB_TIMEOUT'],
+        'graceful_timeout': app.config['WEB_GRACEFUL_TIMEOUT'],
+        'preload_app': True,
+        'accesslog': '-',
+        'errorlog': '-',
+        'when_ready': functools.partial(_server_ready, app),
+        'post_worker_init': _worker_started,
+    }
+
+def _server_ready(app, server):
+    # The master opened connections while preloading; workers must not share them
+    app.extensions['db_pool'].recycle()
+    server.log.info(f"SettleSense serving with {server.cfg.workers} workers "
+                    f"x {app.config['WEB_THREADS']} threads "
+                    f"(+ {app.config['LIVE_MAX_CLIENTS']} for live update streams)")
+
+def _worker_started(worker):
+    # End live update streams and the data version poller on a graceful
+    # shutdown (SIGTERM, or SIGHUP in the master) so the worker can exit;
+    # browsers reconnect elsewhere
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handle_term(signum, frame):
+        broadcaster.close()
+        watcher.stop(timeout=0)
+        if callable(previous):
+            previous(signum, frame)
+
+    signal.signal(signal.SIGTERM, handle_term)
+
+def serve(app):
+    """Run the production server, or the development server without gunicorn."""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        app.logger.warning("gunicorn is not installed (it needs a Unix platform); "
+                           "falling back to the single-process development server")
+        app.run(host=os.environ.get('HOST', '127.0.0.1'), port=int(os.environ.get('PORT', 5000)),
+                threaded=True)
+        return
+
+    class SettleSenseServer(BaseApplication):
+        def load_config(self):
+            for key, value in server_options(app).items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    # Check the schema once here rather than in every forked worker
+    with app.app_context():
+        get_db()
+    # Workers add up each other's request metrics through files
+    registry = app.extensions['metrics']
+    if app.config['WEB_WORKERS'] > 1 and not registry.directory:
+        registry.directory = os.path.join(os.path.dirname(app.config['DATABASE']), 'metrics')
+    registry.clear_shared()
+    SettleSenseServer().run()
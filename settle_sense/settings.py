@@ -0,0 +1,146 @@
+"""
+User settings, cached in memory and bound to formatters once per request.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+from flask import current_app, g, has_app_context
+from .config import BASE_DIR
+from .db import get_schema
+from .formatting import make_amount_formatter, make_currency_formatter, make_date_formatter
+from .money import DEFAULT_CURRENCY_EXPONENT
+
+SETTINGS_PATH = os.path.join(BASE_DIR, 'instance', 'settings.json')
+
+Formatters = namedtuple('Formatters', ['currency', 'date', 'amount'])
+
+class SettingsCache:
+    """In-memory snapshot of settings.json.
+
+    The snapshot is reloaded when the file's mtime or size changes on disk
+    (e.g. edited by hand or by another worker) or when it is explicitly
+    invalidated by save_settings(). Snapshots are read-only mappings so a
+    request can never mutate the shared copy.
+
+    The stamp and snapshot are kept as one (stamp, snapshot) tuple, so the
+    lock-free check never pairs a snapshot with another one's stamp. A
+    reload stats the file again under the lock before reading it, so a
+    snapshot is never older than the stamp it is cached under.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._cached = None
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                current_app.logger.warning("Failed to load settings.json, using defaults")
+        return {}
+
+    def get(self):
+        """Return the current settings snapshot, reloading it if stale."""
+        cached = self._cached
+        if cached is not None and cached[0] == self._file_stamp():
+            return cached[1]
+
+        with self._lock:
+            # Another thread may have reloaded while this one waited
+            stamp = self._file_stamp()
+            cached = self._cached
+            if cached is None or cached[0] != stamp:
+                cached = self._cached = (stamp, MappingProxyType(self._load()))
+            return cached[1]
+
+    def invalidate(self):
+        """Drop the cached snapshot so the next get() rereads the file."""
+        with self._lock:
+            self._cached = None
+
+settings_cache = SettingsCache(SETTINGS_PATH)
+
+def get_settings():
+    """Return the settings snapshot for the current request.
+
+    The snapshot is read once per request and reused for the rest of it,
+    so every formatter and template sees the same frozen view.
+    """
+    if not has_app_context():
+        return settings_cache.get()
+    settings = getattr(g, '_settings', None)
+    if settings is None:
+        settings = g._settings = settings_cache.get()
+    return settings
+
+def get_currency_exponent():
+    """Return the exponent the database stores amounts with."""
+    try:
+        return get_schema().currency_exponent
+    except sqlite3.Error:
+        # Error pages still render when the database is what failed
+        return DEFAULT_CURRENCY_EXPONENT
+
+def get_formatters():
+    """Return the currency/date/amount formatters bound to this request's settings."""
+    if not has_app_context():
+        settings = settings_cache.get()
+        return Formatters(make_currency_formatter(settings), make_date_formatter(settings),
+                          make_amount_formatter())
+    formatters = getattr(g, '_formatters', None)
+    if formatters is None:
+        settings = get_settings()
+        exponent = get_currency_exponent()
+        formatters = g._formatters = Formatters(
+            make_currency_formatter(settings, exponent),
+            make_date_formatter(settings),
+            make_amount_formatter(exponent)
+        )
+    return formatters
+
+def inject_formatters():
+    """Expose the request's bound formatters to every template."""
+    formatters = get_formatters()
+    return {'format_currency': formatters.currency, 'format_date': formatters.date,
+            'format_amount': formatters.amount, 'currency_exponent': get_currency_exponent()}
+
+def save_settings(settings):
+    """Save application settings to JSON file."""
+    os.makedirs(os.path.dirname(SETTINGS_PATH), exist_ok=True)
+    tmp_path = SETTINGS_PATH + '.tmp'
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(settings), f, indent=2)
+        os.replace(tmp_path, SETTINGS_PATH)
+        return True
+    except Exception as e:
+        current_app.logger.error(f"Failed to save settings: {str(e)}")
+        return False
+    finally:
+        settings_cache.invalidate()
+        if has_app_context():
+            g.pop('_settings', None)
+            g.pop('_formatters', None)
+
+
+def format_currency(value):
+    """Format an amount in minor units as currency using the request's settings."""
+    return get_formatters().currency(value)
+
+def format_date(value):
+    """Format a date string using the request's settings."""
+    return get_formatters().date(value)
@@ -22,6 +22,9 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }, 5000);
     
+    // Decimal places of the currency amounts are stored with
+    const currencyExponent = parseInt(document.documentElement.dataset.currencyExponent || '2', 10);
+    
     // Format currency inputs
     const amountInput = document.getElementById('amount');
     if (amountInput) {
@@ -29,7 +32,7 @@ document.addEventListener('DOMContentLoaded', function() {
             if (e.target.value) {
                 const value = parseFloat(e.target.value);
                 if (!isNaN(value)) {
-                    e.target.value = value.toFixed(2);
+                    e.target.value = value.toFixed(currencyExponent);
                 }
             }
         });
@@ -177,6 +180,253 @@ document.addEventListener('DOMContentLoaded', function() {
         // Chart.js implementation is handled in the template
     }
     
+    // Balance over time, drawn from the /api/timeseries rollups
+    const timeseriesCanvas = document.getElementById('timeseriesChart');
+    let timeseriesChart = null;
+    
+    function loadTimeseries(interval) {
+        const params = new URLSearchParams({ interval: interval });
+        const person = timeseriesCanvas.dataset.person;
+        if (person) {
+            params.set('person', person);
+        }
+        
+        fetch(`${timeseriesCanvas.dataset.url}?${params}`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.error) {
+                    throw new Error(data.error);
+                }
+                const colors = JSON.parse(timeseriesCanvas.dataset.colors);
+                const labels = data.buckets.map(b => b.period);
+                const datasets = [
+                    {
+                        type: 'line',
+                        label: 'Balance',
+                        data: data.buckets.map(b => b.balance),
+                        borderColor: colors[0],
+                        backgroundColor: colors[0],
+                        tension: 0.2,
+                        pointRadius: 0
+                    },
+                    {
+                        type: 'bar',
+                        label: 'Net change',
+                        data: data.buckets.map(b => b.net_change),
+                        backgroundColor: data.buckets.map(b => b.net_change >= 0 ? colors[1] : colors[2])
+                    }
+                ];
+                
+                if (timeseriesChart) {
+                    timeseriesChart.data.labels = labels;
+                    timeseriesChart.data.datasets = datasets;
+                    timeseriesChart.update();
+                    return;
+                }
+                timeseriesChart = new Chart(timeseriesCanvas.getContext('2d'), {
+                    data: { labels: labels, datasets: datasets },
+                    options: {
+                        responsive: true,
+                        maintainAspectRatio: false,
+                        plugins: {
+                            legend: { position: 'bottom' },
+                            title: { display: true, text: 'Balance Over Time' }
+                        },
+                        scales: {
+                            x: { grid: { display: false } },
+                            y: { grid: { display: true } }
+                        }
+                    }
+                });
+            })
+            .catch(error => console.error('Error fetching timeseries data:', error));
+    }
+    
+    if (timeseriesCanvas && window.Chart) {
+        const intervalButtons = document.querySelectorAll('#timeseriesInterval [data-interval]');
+        intervalButtons.forEach(button => {
+            button.addEventListener('click', function() {
+                intervalButtons.forEach(b => b.classList.remove('active'));
+                this.classList.add('active');
+                loadTimeseries(this.dataset.interval);
+            });
+        });
+        
+        // Load once the tab is first shown so the canvas has a size
+        const timeseriesTab = document.getElementById('timeseries-tab');
+        if (timeseriesTab) {
+            timeseriesTab.addEventListener('shown.bs.tab', function() {
+                if (!timeseriesChart) {
+                    const active = document.querySelector('#timeseriesInterval .active');
+                    loadTimeseries(active ? active.dataset.interval : 'week');
+                }
+            }, { once: true });
+        }
+    }
+    
+    // Ledger settlement plans, fetched when asked for instead of on every render
+    const ledgersCard = document.getElementById('ledgers');
+
+    function renderSettlement(container, plan) {
+        const list = container.querySelector('ul');
+        list.replaceChildren();
+        plan.transfers.forEach(transfer => {
+            const amount = (transfer.amount_minor / 10 ** currencyExponent).toFixed(currencyExponent);
+            const item = document.createElement('li');
+            item.className = 'list-group-item d-flex justify-content-between align-items-center px-0';
+
+            // Member names are user input, so they only ever go in as text
+            const text = document.createElement('span');
+            const from = document.createElement('strong');
+            from.textContent = transfer.from;
+            const to = document.createElement('strong');
+            to.textContent = transfer.to;
+            text.append(from, ' pays ', to, ` ${ledgersCard.dataset.currency}${amount}`);
+
+            const form = document.createElement('form');
+            form.method = 'post';
+            form.action = container.dataset.payUrl;
+            [['from', transfer.from], ['to', transfer.to], ['amount', amount]].forEach(([name, value]) => {
+                const input = document.createElement('input');
+                input.type = 'hidden';
+                input.name = name;
+                input.value = value;
+                form.append(input);
+            });
+            const button = document.createElement('button');
+            button.type = 'submit';
+            button.className = 'btn btn-sm btn-outline-success';
+            button.innerHTML = '<i class="bi bi-check2"></i> Mark paid';
+            form.append(button);
+
+            item.append(text, form);
+            list.append(item);
+        });
+        list.classList.toggle('d-none', plan.transfers.length === 0);
+        container.querySelector('.ledger-settled').classList.toggle('d-none', plan.transfers.length > 0);
+    }
+
+    if (ledgersCard) {
+        ledgersCard.querySelectorAll('.ledger-settlement').forEach(container => {
+            const toggle = container.querySelector('.ledger-settlement-toggle');
+            toggle.addEventListener('click', function() {
+                toggle.disabled = true;
+                fetch(container.dataset.url)
+                    .then(response => response.json())
+                    .then(plan => {
+                        if (plan.error) {
+                            throw new Error(plan.error);
+                        }
+                        renderSettlement(container, plan);
+                        toggle.remove();
+                    })
+                    .catch(error => {
+                        toggle.disabled = false;
+                        console.error('Error fetching settlement:', error);
+                    });
+            });
+        });
+    }
+
+    // Live balance updates pushed from /api/events
+    const summaryCards = document.getElementById('summaryCards');
+    
+    function formatAmount(value) {
+        return `${summaryCards.dataset.currency}${Math.abs(value).toFixed(currencyExponent)}`;
+    }
+    
+    function applyTotals(totals) {
+        const net = totals.net_balance;
+        document.getElementById('netBalanceValue').textContent = formatAmount(net);
+        document.getElementById('owedToYouValue').textContent = formatAmount(totals.total_owed_to_you);
+        document.getElementById('youOweValue').textContent = formatAmount(totals.total_you_owe);
+        
+        const card = document.getElementById('netBalanceCard');
+        card.classList.toggle('border-success', net >= 0);
+        card.classList.toggle('border-danger', net < 0);
+        document.getElementById('netBalanceStatus').innerHTML = net >= 0
+            ? '<i class="bi bi-arrow-up-circle-fill me-1 text-success"></i>Net positive'
+            : '<i class="bi bi-arrow-down-circle-fill me-1 text-danger"></i>Net negative';
+        
+        // The canvases' data attributes are kept current too, so a chart
+        // first drawn after this update starts from the new numbers
+        const balanceCanvas = document.getElementById('balanceChart');
+        if (balanceCanvas) {
+            const balanceData = JSON.parse(balanceCanvas.dataset.balance);
+            balanceData[0].value = totals.total_owed_to_you;
+            balanceData[1].value = totals.total_you_owe;
+            balanceCanvas.dataset.balance = JSON.stringify(balanceData);
+            const chart = window.Chart && Chart.getChart(balanceCanvas);
+            if (chart) {
+                chart.data.datasets[0].data = balanceData.map(d => d.value);
+                chart.update();
+            }
+        }
+    }
+    
+    function applyPeople(changed, complete) {
+        const personCanvas = document.getElementById('personChart');
+        if (!personCanvas) return;
+        
+        const people = new Map();
+        if (!complete) {
+            JSON.parse(personCanvas.dataset.people).forEach(p => people.set(p.name, p.balance));
+        }
+        changed.forEach(p => {
+            if (p.removed) {
+                people.delete(p.name);
+            } else {
+                people.set(p.name, p.balance);
+            }
+        });
+        const peopleData = Array.from(people, ([name, balance]) => ({ name: name, balance: balance }))
+            .sort((a, b) => b.balance - a.balance);
+        personCanvas.dataset.people = JSON.stringify(peopleData);
+        
+        const chart = window.Chart && Chart.getChart(personCanvas);
+        if (chart) {
+            const colors = JSON.parse(personCanvas.dataset.colors);
+            chart.data.labels = peopleData.map(p => p.name);
+            chart.data.datasets[0].data = peopleData.map(p => p.balance);
+            chart.data.datasets[0].backgroundColor = peopleData.map(p => p.balance >= 0 ? colors[0] : colors[1]);
+            chart.update();
+        }
+    }
+    
+    let timeseriesReload = null;
+    function refreshTimeseries() {
+        if (!timeseriesChart) return;
+        // Bursts of changes (imports, batches) redraw the chart once
+        clearTimeout(timeseriesReload);
+        timeseriesReload = setTimeout(function() {
+            const active = document.querySelector('#timeseriesInterval .active');
+            loadTimeseries(active ? active.dataset.interval : 'week');
+        }, 1000);
+    }
+    
+    if (summaryCards && window.EventSource) {
+        const live = summaryCards.dataset.live === 'true';
+        const liveNotice = document.getElementById('liveNotice');
+        const params = new URLSearchParams({ last_event_id: summaryCards.dataset.lastEventId });
+        const events = new EventSource(`${summaryCards.dataset.eventsUrl}?${params}`);
+        
+        function handleChange(event) {
+            const data = JSON.parse(event.data);
+            if (live) {
+                applyTotals(data.totals);
+                applyPeople(data.people, data.complete);
+                refreshTimeseries();
+            }
+            // The entries table is not patched; offer a reload instead
+            if (liveNotice && data.action !== 'resync') {
+                liveNotice.classList.remove('d-none');
+            }
+        }
+        events.addEventListener('change', handleChange);
+        events.addEventListener('resync', handleChange);
+        window.addEventListener('beforeunload', () => events.close());
+    }
+    
     // Apply theme from settings
     function applyTheme() {
         const currentTheme = document.documentElement.getAttribute('data-theme') || 'light';
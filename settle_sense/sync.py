@@ -0,0 +1,298 @@
+"""
+Delta sync of the ledger for clients that keep a local copy.
+"""
+
+import datetime
+import json
+import sqlite3
+import time
+import click
+from flask import Blueprint, current_app, request
+from flask.cli import with_appcontext
+from .db import connect_db, get_db, get_schema, table_columns
+from .exports import EXPORT_BATCH_SIZE
+
+bp = Blueprint('sync', __name__)
+
+# Clients keeping a local copy of the ledger ask /api/sync for what changed
+# since the version they last saw. Triggers stamp every inserted or edited
+# row with the next value of a global counter (row_version) and turn deletes
+# into tombstones stamped the same way, so a sync is an indexed range scan
+# over row_version whose size depends on the changes, not the ledger.
+# Writes commit one at a time, so versions become visible in order and a
+# client never skips a change by syncing between two writes.
+#
+# Old tombstones are pruned after a while. The newest pruned version becomes
+# the horizon: a client that last synced before it may have missed deletes
+# and gets a full snapshot instead, as does a first sync.
+#
+# Amounts are sent as stored, in integer minor units, so a client summing
+# its copy gets the same exact totals; the header carries the currency
+# exponent to turn them into decimals.
+SYNC_COLUMNS = ('id', 'person', 'amount_minor', 'direction', 'note', 'created_at', 'updated_at')
+SYNC_PAGE_SIZE = 1000
+SYNC_MAX_PAGE_SIZE = 10000
+SYNC_TOMBSTONE_DAYS = 30
+# Seconds between automatic tombstone prunes in each worker
+SYNC_PRUNE_INTERVAL = 3600
+
+SYNC_CURRENT_SQL = "(SELECT version FROM sync_version WHERE id = 1)"
+SYNC_NOW_SQL = "strftime('%Y-%m-%d %H:%M:%S', 'now')"
+
+SYNC_TRIGGERS = {
+    'trg_debt_sync_insert': f'''
+        CREATE TRIGGER IF NOT EXISTS trg_debt_sync_insert AFTER INSERT ON debt
+        BEGIN
+            UPDATE sync_version SET version = version + 1 WHERE id = 1;
+            UPDATE debt SET row_version = {SYNC_CURRENT_SQL} WHERE id = NEW.id;
+            DELETE FROM debt_tombstone WHERE debt_id = NEW.id;
+        END
+    ''',
+    # Does not list row_version, so stamping the row cannot fire it again
+    'trg_debt_sync_update': f'''
+        CREATE TRIGGER IF NOT EXISTS trg_debt_sync_update
+        AFTER UPDATE OF person, amount_minor, direction, note, created_at, updated_at ON debt
+        BEGIN
+            UPDATE sync_version SET version = version + 1 WHERE id = 1;
+            UPDATE debt SET row_version = {SYNC_CURRENT_SQL} WHERE id = NEW.id;
+        END
+    ''',
+    'trg_debt_sync_delete': f'''
+        CREATE TRIGGER IF NOT EXISTS trg_debt_sync_delete AFTER DELETE ON debt
+        BEGIN
+            UPDATE sync_version SET version = version + 1 WHERE id = 1;
+            INSERT OR REPLACE INTO debt_tombstone (debt_id, row_version, deleted_at)
+            VALUES (OLD.id, {SYNC_CURRENT_SQL}, {SYNC_NOW_SQL});
+        END
+    ''',
+}
+
+def create_sync_tables(db):
+    """Create the sync counter, the tombstone table and the row version triggers.
+
+    debt must already have its row_version column. A new counter starts
+    above every id and row version, so rows backfilled with their id as
+    version never overtake it. Returns True if the counter was new.
+    """
+    existed = bool(table_columns(db, 'sync_version'))
+
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS sync_version (
+            id INTEGER PRIMARY KEY CHECK(id = 1),
+            version INTEGER NOT NULL,
+            horizon INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    db.execute('''
+        INSERT OR IGNORE INTO sync_version (id, version)
+        SELECT 1, MAX(COALESCE(MAX(id), 0), COALESCE(MAX(row_version), 0)) FROM debt
+    ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS debt_tombstone (
+            debt_id INTEGER PRIMARY KEY,
+            row_version INTEGER NOT NULL,
+            deleted_at TEXT NOT NULL
+        )
+    ''')
+    db.execute("CREATE INDEX IF NOT EXISTS idx_debt_tombstone_version ON debt_tombstone(row_version)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_debt_row_version ON debt(row_version)")
+    for trigger_sql in SYNC_TRIGGERS.values():
+        db.execute(trigger_sql)
+
+    return not existed
+
+def reset_sync_horizon(db, minimum=0):
+    """Send every client back to a full snapshot.
+
+    Used when the rows changed underneath the counter (a restore or a
+    table rebuild). Rows without a version are stamped with the new one.
+    """
+    db.execute('''
+        UPDATE sync_version SET version = MAX(version, ?) + 1, horizon = MAX(version, ?) + 1
+        WHERE id = 1
+    ''', (minimum, minimum))
+    db.execute(f"UPDATE debt SET row_version = {SYNC_CURRENT_SQL} WHERE row_version IS NULL")
+
+def get_sync_state(db):
+    """Return (version, horizon), or None before the sync tables exist."""
+    try:
+        return db.execute("SELECT version, horizon FROM sync_version WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return None
+
+def prune_tombstones(db, days=SYNC_TOMBSTONE_DAYS):
+    """Delete tombstones older than days and move the horizon past them.
+
+    Returns the number of tombstones removed.
+    """
+    cutoff = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)
+              ).strftime('%Y-%m-%d %H:%M:%S')
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        newest = db.execute(
+            "SELECT MAX(row_version) FROM debt_tombstone WHERE deleted_at < ?", (cutoff,)
+        ).fetchone()[0]
+        if newest is None:
+            db.rollback()
+            return 0
+        removed = db.execute("DELETE FROM debt_tombstone WHERE row_version <= ?", (newest,)).rowcount
+        db.execute("UPDATE sync_version SET horizon = MAX(horizon, ?) WHERE id = 1", (newest,))
+        db.commit()
+        return removed
+    except sqlite3.Error:
+        db.rollback()
+        raise
+
+_last_tombstone_prune = 0.0
+
+def maybe_prune_tombstones(db):
+    """Prune tombstones if this worker has not done so recently."""
+    global _last_tombstone_prune
+    now = time.monotonic()
+    if now - _last_tombstone_prune < SYNC_PRUNE_INTERVAL:
+        return
+    _last_tombstone_prune = now
+    try:
+        prune_tombstones(db)
+    except sqlite3.OperationalError as e:
+        # Another writer holds the lock; the next interval tries again
+        current_app.logger.info(f"Skipped tombstone prune: {str(e)}")
+
+def get_sync_changes(db, since, limit=SYNC_PAGE_SIZE):
+    """Return the rows changed and ids deleted after version since.
+
+    Both are read in one transaction and ordered by version. At most limit
+    changes are returned; if more remain, has_more is set and version is
+    the last one returned, otherwise it is the current version.
+    """
+    select = ', '.join(SYNC_COLUMNS)
+    blanks = ', '.join('NULL' for _ in SYNC_COLUMNS[1:])
+    db.execute("BEGIN")
+    try:
+        version = db.execute("SELECT version FROM sync_version WHERE id = 1").fetchone()[0]
+        changes = db.execute(f'''
+            SELECT {select}, row_version, 0 AS deleted FROM debt WHERE row_version > ?
+            UNION ALL
+            SELECT debt_id, {blanks}, row_version, 1 FROM debt_tombstone WHERE row_version > ?
+            ORDER BY row_version
+            LIMIT ?
+        ''', (since, since, limit + 1)).fetchall()
+    finally:
+        db.rollback()
+
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if has_more:
+        version = changes[-1]['row_version']
+    width = len(SYNC_COLUMNS)
+    return {
+        'mode': 'delta',
+        'since': since,
+        'version': version,
+        'has_more': has_more,
+        'rows': [tuple(row)[:width] for row in changes if not row['deleted']],
+        'deleted': [row['id'] for row in changes if row['deleted']],
+    }
+
+def iter_sync_snapshot(config):
+    """Yield the snapshot's version, then every row in batches.
+
+    Reads from its own connection in one transaction, since the response
+    is streamed after the request's pooled connection has been returned.
+    """
+    db = connect_db(config)
+    db.row_factory = None
+    try:
+        db.execute("BEGIN")
+        yield db.execute("SELECT version FROM sync_version WHERE id = 1").fetchone()[0]
+        cursor = db.execute(f"SELECT {', '.join(SYNC_COLUMNS)} FROM debt ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            yield rows
+    finally:
+        db.rollback()
+        db.close()
+
+def encode_sync(header, batches, deleted, sync_format):
+    """Encode a sync response as one compact JSON object or as NDJSON.
+
+    JSON rows are arrays in SYNC_COLUMNS order. NDJSON starts with the
+    header line, followed by one array per changed row and one
+    {"deleted": id} object per deleted row.
+    """
+    def dumps(value):
+        return json.dumps(value, separators=(',', ':'))
+
+    if sync_format == 'ndjson':
+        yield (dumps(header) + '\n').encode('utf-8')
+        for rows in batches:
+            yield ''.join(dumps(row) + '\n' for row in rows).encode('utf-8')
+        yield ''.join(dumps({'deleted': entry_id}) + '\n' for entry_id in deleted).encode('utf-8')
+        return
+
+    yield dumps(header)[:-1].encode('utf-8') + b',"rows":['
+    first = True
+    for rows in batches:
+        parts = []
+        for row in rows:
+            parts.append(('' if first else ',') + dumps(row))
+            first = False
+        yield ''.join(parts).encode('utf-8')
+    yield f'],"deleted":{dumps(deleted)}}}'.encode('utf-8')
+
+@bp.route('/api/sync')
+def api_sync():
+    """Return the entries changed or deleted since a sync version.
+
+    Query parameters: since (the version from the previous response, or 0
+    for a first sync), limit and format=json|ndjson. Clients that are too
+    far behind get every entry instead, with mode set to "snapshot"; they
+    should replace their copy and continue from the returned version.
+    """
+    from flask import Response, jsonify
+    
+    sync_format = request.args.get('format', 'json').lower()
+    if sync_format not in ('json', 'ndjson'):
+        return jsonify({'error': 'format must be json or ndjson'}), 400
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', SYNC_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+    if since < 0 or not 1 <= limit <= SYNC_MAX_PAGE_SIZE:
+        return jsonify({'error': f'since must be >= 0 and limit between 1 and {SYNC_MAX_PAGE_SIZE}'}), 400
+    
+    db = get_db()
+    state = get_sync_state(db)
+    if state is None:
+        return jsonify({'error': 'Sync is unavailable until the database is migrated'}), 503
+    maybe_prune_tombstones(db)
+    state = get_sync_state(db)
+    exponent = get_schema().currency_exponent
+    
+    mimetype = 'application/x-ndjson' if sync_format == 'ndjson' else 'application/json'
+    if since and state['horizon'] <= since <= state['version']:
+        changes = get_sync_changes(db, since, limit)
+        header = {key: changes[key] for key in ('mode', 'since', 'version', 'has_more')}
+        header['columns'] = list(SYNC_COLUMNS)
+        header['currency_exponent'] = exponent
+        body = encode_sync(header, [changes['rows']], changes['deleted'], sync_format)
+        response = Response(b''.join(body), mimetype=mimetype)
+    else:
+        snapshot = iter_sync_snapshot(current_app.config)
+        header = {'mode': 'snapshot', 'since': since, 'version': next(snapshot),
+                  'has_more': False, 'columns': list(SYNC_COLUMNS), 'currency_exponent': exponent}
+        response = Response(encode_sync(header, snapshot, [], sync_format), mimetype=mimetype)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@click.command('prune-tombstones')
+@click.option('--days', default=SYNC_TOMBSTONE_DAYS, show_default=True,
+              help='Keep tombstones for deletes newer than this many days.')
+@with_appcontext
+def prune_tombstones_command(days):
+    """Delete old sync tombstones; clients behind them get a full snapshot."""
+    removed = prune_tombstones(get_db(), days)
+    click.echo(f"Removed {removed} tombstones.")
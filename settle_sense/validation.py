@@ -0,0 +1,34 @@
+"""
+Validation rules shared by every path that writes debt entries.
+"""
+
+from .money import DEFAULT_CURRENCY_EXPONENT, MAX_AMOUNT_MINOR, to_minor
+
+DIRECTIONS = ('you_owe', 'they_owe')
+
+def validate_entry(person, amount, direction, note='', exponent=DEFAULT_CURRENCY_EXPONENT):
+    """Validate raw entry fields with the rules shared by every write path.
+
+    Returns (entry, None) on success, where entry is a dict of cleaned
+    values with the decimal amount converted to amount_minor for the
+    database's currency exponent, or (None, message) describing the first
+    problem found.
+    """
+    person = '' if person is None else str(person).strip()
+    if not person:
+        return None, "Person's name is required"
+
+    try:
+        amount_minor = to_minor(amount, exponent)
+    except ValueError as e:
+        return None, str(e)
+    if amount_minor <= 0:
+        return None, "Amount must be positive"
+    if amount_minor > MAX_AMOUNT_MINOR:
+        return None, "Amount is too large"
+
+    if direction not in DIRECTIONS:
+        return None, "Invalid direction"
+
+    note = '' if note is None else str(note).strip()
+    return {'person': person, 'amount_minor': amount_minor, 'direction': direction, 'note': note}, None
@@ -0,0 +1,324 @@
+"""
+Dashboard views: the debt list, entry forms and summary APIs.
+"""
+
+import datetime
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash
+from .balances import (get_balance_totals, get_balances_as_of, parse_as_of, get_timeseries,
+                       decimal_summary, maybe_take_balance_snapshot)
+from .caching import conditional_on_data
+from .db import get_db, get_schema
+from .ledgers import get_ledger_summaries
+from .live import broadcaster, publish_change
+from .queries import (get_page_size, get_sort_expression, build_debt_filters, decode_cursor,
+                      fetch_debt_page, get_debt_totals)
+from .settings import get_settings, get_formatters
+from .validation import validate_entry
+
+bp = Blueprint('dashboard', __name__)
+
+# Blueprints that keep working while amounts are still decimals: the
+# migration, settings and backup pages, and /metrics
+MIGRATION_EXEMPT_BLUEPRINTS = ('admin', 'metrics')
+
+@bp.before_app_request
+def require_minor_amounts():
+    """Hold back reads and writes until a decimal-amount database is migrated.
+
+    Such a database has none of the summaries, rollups or history that the
+    other routes read, and its debt table has no amount_minor to write.
+    APIs answer 503; pages redirect to the migration page.
+    """
+    if request.endpoint in (None, 'static') or request.blueprint in MIGRATION_EXEMPT_BLUEPRINTS:
+        return None
+    if get_schema().has_minor_amounts:
+        return None
+    if request.path.startswith('/api/'):
+        from flask import jsonify
+        return jsonify({'error': 'Database migration required: amounts are still stored as decimals'}), 503
+    flash("Amounts are still stored as decimals; run the migration to convert them", "error")
+    return redirect(url_for('admin.migrate'))
+
+# API Routes
+@bp.route('/')
+@conditional_on_data()
+def index():
+    """Render the dashboard showing one page of debt entries and net balance."""
+    db = get_db()
+    schema = get_schema()
+    
+    # Extract search/filter parameters
+    search_query = request.args.get('search', '').strip()
+    filter_person = request.args.get('person', '').strip()
+    filter_direction = request.args.get('direction', '').strip()
+    sort_by = request.args.get('sort') or ('relevance' if search_query else 'date')
+    sort_order = request.args.get('order', 'desc')
+    if sort_order not in ('asc', 'desc'):
+        sort_order = 'desc'
+    after = decode_cursor(request.args.get('after'))
+    before = decode_cursor(request.args.get('before'))
+    
+    # Get user's theme preference from settings
+    settings = get_settings()
+    theme = settings.get('theme', 'light')
+    page_size = get_page_size(settings)
+    
+    filters = build_debt_filters(db, search_query, filter_person, filter_direction)
+    
+    # Fetch only the requested page of entries
+    entries, prev_cursor, next_cursor = fetch_debt_page(
+        db, filters,
+        get_sort_expression(sort_by, schema, filters),
+        sort_order == 'desc',
+        page_size,
+        after=after,
+        before=before
+    )
+    
+    # Statistics cover the full filtered set, not just the visible page
+    if search_query:
+        totals = get_debt_totals(db, filters)
+    else:
+        totals = get_balance_totals(db, filter_person, filter_direction)
+    
+    # The summary cards can show balances at a past moment instead
+    summary = totals
+    as_of = request.args.get('as_of', '').strip()
+    if as_of:
+        try:
+            as_of = parse_as_of(as_of)
+            summary = get_balances_as_of(db, as_of, filter_person, filter_direction)
+        except ValueError:
+            flash("Invalid 'as of' date", "error")
+            as_of = ''
+    
+    # Get unique people for filter dropdown
+    people = db.execute('SELECT DISTINCT person FROM debt ORDER BY person').fetchall()
+    
+    # Sort by balance (highest positive first)
+    people_summary = summary['people']
+    people_summary.sort(key=lambda x: x['balance'], reverse=True)
+    
+    # Current datetime for templates
+    current_year = datetime.datetime.now().year
+    
+    # Keep track of current filters for form
+    current_filters = {
+        'search': search_query,
+        'person': filter_person,
+        'direction': filter_direction,
+        'sort': sort_by,
+        'order': sort_order,
+        'as_of': as_of[:10]
+    }
+    
+    pagination = {
+        'page_size': page_size,
+        'total': totals['entry_count'],
+        'prev_cursor': prev_cursor,
+        'next_cursor': next_cursor
+    }
+    
+    return render_template(
+        'index.html',
+        entries=entries,
+        net_balance=summary['net_balance'],
+        total_owed_to_you=summary['total_owed_to_you'],
+        total_you_owe=summary['total_you_owe'],
+        as_of=as_of,
+        people=people,
+        people_summary=people_summary,
+        format_currency=get_formatters().currency,
+        current_year=current_year,
+        filters=current_filters,
+        pagination=pagination,
+        ledgers=get_ledger_summaries(db),
+        # Live updates patch the cards and charts only on the unfiltered view
+        live_updates=not (search_query or filter_person or filter_direction or as_of),
+        live_event_id=broadcaster.last_id,
+        currency_symbol=settings.get('currency_symbol', '$'),
+        theme=theme
+    )
+
+@bp.route('/add', methods=['POST'])
+def add():
+    """Add a new debt entry."""
+    try:
+        # The schema descriptor picks the statement matching the columns
+        # and knows the currency exponent amounts are stored with
+        db = get_db()
+        schema = get_schema()
+        
+        # Validate and extract form data
+        entry, error = validate_entry(
+            request.form.get('person'),
+            request.form.get('amount'),
+            request.form.get('direction'),
+            request.form.get('note', ''),
+            schema.currency_exponent
+        )
+        if error:
+            flash(error, "error")
+            return redirect(url_for('dashboard.index'))
+        person, amount_minor, direction, note = (
+            entry['person'], entry['amount_minor'], entry['direction'], entry['note']
+        )
+        
+        # Format current time as YYYY-MM-DD HH:MM:SS for better SQLite compatibility
+        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        
+        cursor = db.execute(schema.insert_sql, schema.insert_params(person, amount_minor, direction, note, now))
+        db.commit()
+        publish_change(db, 'added', [person], entry_id=cursor.lastrowid)
+        maybe_take_balance_snapshot(db)
+        
+        flash(f"Debt record for {person} added successfully", "success")
+        return redirect(url_for('dashboard.index'))
+        
+    except Exception as e:
+        current_app.logger.error(f"Error adding debt entry: {str(e)}")
+        flash("An error occurred while adding the debt record", "error")
+        return redirect(url_for('dashboard.index'))
+
+@bp.route('/delete/<int:id>', methods=['POST'])
+def delete(id):
+    """Delete a debt entry."""
+    try:
+        db = get_db()
+        entry = db.execute('SELECT person FROM debt WHERE id = ?', (id,)).fetchone()
+        db.execute('DELETE FROM debt WHERE id = ?', (id,))
+        db.commit()
+        if entry:
+            publish_change(db, 'deleted', [entry['person']], entry_id=id)
+            maybe_take_balance_snapshot(db)
+        flash("Entry deleted successfully", "success")
+    except Exception as e:
+        current_app.logger.error(f"Error deleting debt entry: {str(e)}")
+        flash("An error occurred while deleting the entry", "error")
+        
+    return redirect(url_for('dashboard.index'))
+
+@bp.route('/edit/<int:id>', methods=['GET', 'POST'])
+def edit(id):
+    """Edit an existing debt entry."""
+    db = get_db()
+    
+    if request.method == 'POST':
+        try:
+            schema = get_schema()
+            
+            # Validate and extract form data
+            entry, error = validate_entry(
+                request.form.get('person'),
+                request.form.get('amount'),
+                request.form.get('direction'),
+                request.form.get('note', ''),
+                schema.currency_exponent
+            )
+            if error:
+                flash(error, "error")
+                return redirect(url_for('dashboard.edit', id=id))
+            person, amount_minor, direction, note = (
+                entry['person'], entry['amount_minor'], entry['direction'], entry['note']
+            )
+            
+            # Format current time as YYYY-MM-DD HH:MM:SS for better SQLite compatibility
+            now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            
+            # Update database using the statement matching the columns
+            previous = db.execute('SELECT person FROM debt WHERE id = ?', (id,)).fetchone()
+            db.execute(schema.update_sql, schema.update_params(id, person, amount_minor, direction, note, now))
+            db.commit()
+            if previous:
+                publish_change(db, 'edited', [previous['person'], person], entry_id=id)
+                maybe_take_balance_snapshot(db)
+            
+            flash("Entry updated successfully", "success")
+            return redirect(url_for('dashboard.index'))
+            
+        except Exception as e:
+            current_app.logger.error(f"Error updating debt entry: {str(e)}")
+            flash("An error occurred while updating the entry", "error")
+            return redirect(url_for('dashboard.edit', id=id))
+    else:
+        # GET request - show edit form
+        entry = db.execute('SELECT * FROM debt WHERE id = ?', (id,)).fetchone()
+        if entry:
+            # Get user's theme preference from settings
+            settings = get_settings()
+            theme = settings.get('theme', 'light')
+            return render_template('edit.html', entry=entry, theme=theme)
+        else:
+            flash("Entry not found", "error")
+            return redirect(url_for('dashboard.index'))
+
+@bp.route('/api/summary')
+@conditional_on_data()
+def api_summary():
+    """JSON API endpoint providing summary statistics."""
+    from flask import jsonify
+    
+    as_of = request.args.get('as_of', '').strip()
+    if as_of:
+        try:
+            as_of = parse_as_of(as_of)
+        except ValueError:
+            return jsonify({'error': "as_of must be a date (YYYY-MM-DD) or timestamp"}), 400
+        totals = get_balances_as_of(get_db(), as_of)
+    else:
+        totals = get_balance_totals(get_db())
+    
+    # The totals are exact minor units; JSON clients get decimal amounts
+    totals = decimal_summary(totals, get_schema().currency_exponent)
+    summary = {
+        'net_balance': totals['net_balance'],
+        'total_owed_to_you': totals['total_owed_to_you'],
+        'total_you_owe': totals['total_you_owe'],
+        'people': totals['people']
+    }
+    if as_of:
+        summary['as_of'] = as_of
+    return jsonify(summary)
+
+@bp.route('/api/timeseries')
+def api_timeseries():
+    """JSON API endpoint returning the balance over time from the daily rollups.
+
+    Query parameters: interval (day, week or month), start and end
+    (YYYY-MM-DD, inclusive) and an optional person.
+    """
+    from flask import jsonify
+    
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        series = get_timeseries(
+            get_db(),
+            interval=request.args.get('interval', 'day'),
+            start=datetime.date.fromisoformat(start) if start else None,
+            end=datetime.date.fromisoformat(end) if end else None,
+            person=request.args.get('person', '').strip()
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(series)
+
+
+# Error handlers
+@bp.app_errorhandler(404)
+def page_not_found(e):
+    current_year = datetime.datetime.now().year
+    # Get user's theme preference from settings
+    settings = get_settings()
+    theme = settings.get('theme', 'light')
+    return render_template('error.html', error=e, current_year=current_year, theme=theme), 404
+
+@bp.app_errorhandler(500)
+def server_error(e):
+    current_app.logger.error(f"Server error: {str(e)}")
+    current_year = datetime.datetime.now().year
+    # Get user's theme preference from settings
+    settings = get_settings()
+    theme = settings.get('theme', 'light')
+    return render_template('error.html', error=e, current_year=current_year, theme=theme), 500
@@ -0,0 +1,88 @@
+import json
+import sqlite3
+import pytest
+from settle_sense import backups, create_app, live, settings
+
+LEGACY_ROWS = [
+    ('Alice', 12.5, 'they_owe', 'lunch'),
+    ('Bob', 0.1, 'you_owe', 'coffee'),
+    ('Alice', 0.004, 'you_owe', 'rounding dust'),
+    ('Carol', 1999.99, 'they_owe', 'rent share'),
+]
+
+@pytest.fixture(autouse=True)
+def settings_file(tmp_path, monkeypatch):
+    """Keep settings.json in the test's directory; write_settings() fills it."""
+    path = str(tmp_path / 'settings.json')
+    monkeypatch.setattr(settings, 'SETTINGS_PATH', path)
+    monkeypatch.setattr(settings, 'settings_cache', settings.SettingsCache(path))
+    return path
+
+@pytest.fixture(autouse=True)
+def backup_dir(tmp_path, monkeypatch):
+    """Keep backups and their chunk store in the test's directory."""
+    path = str(tmp_path / 'backups')
+    monkeypatch.setattr(backups, 'BACKUP_DIR', path)
+    monkeypatch.setattr(backups, 'CHUNK_DIR', str(tmp_path / 'backups' / 'chunks'))
+    return path
+
+@pytest.fixture(autouse=True)
+def stop_live_watcher():
+    yield
+    live.watcher.stop()
+
+@pytest.fixture
+def write_settings(settings_file):
+    def write_settings(**values):
+        with open(settings_file, 'w') as f:
+            json.dump(values, f)
+        settings.settings_cache.invalidate()
+    return write_settings
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'debts.sqlite')
+
+@pytest.fixture
+def legacy_db(db_path):
+    """A database from before amounts were stored in minor units."""
+    con = sqlite3.connect(db_path)
+    con.execute('''
+        CREATE TABLE debt (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            person TEXT NOT NULL,
+            amount REAL NOT NULL,
+            direction TEXT NOT NULL,
+            note TEXT
+        )
+    ''')
+    con.executemany("INSERT INTO debt (person, amount, direction, note) VALUES (?, ?, ?, ?)",
+                    LEGACY_ROWS)
+    con.commit()
+    con.close()
+    return db_path
+
+@pytest.fixture
+def make_app(db_path):
+    def make_app(**config):
+        app = create_app({'DATABASE': db_path, 'TESTING': True, 'METRICS_DIR': '', **config})
+        return app
+    return make_app
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def add_entries(client, *entries):
+    """Create entries through the batch API, returning their ids."""
+    operations = [
+        {'op': 'create', 'person': person, 'amount': amount, 'direction': direction, 'note': note}
+        for person, amount, direction, note in entries
+    ]
+    response = client.post('/api/entries/batch', json={'operations': operations})
+    assert response.status_code == 200, response.get_json()
+    return [result['id'] for result in response.get_json()['results']]
@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+from benchmarks import startup
+from settle_sense import schema
+from settle_sense.db import get_db
+
+def test_import_does_not_touch_the_database(tmp_path):
+    path = tmp_path / 'instance' / 'debts.sqlite'
+    env = dict(os.environ, DATABASE_PATH=str(path))
+    subprocess.run([sys.executable, '-c', 'import settle_sense.app'], check=True, env=env,
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert not (tmp_path / 'instance').exists()
+
+def test_create_app_does_not_open_the_database(make_app, db_path):
+    app = make_app()
+    assert not os.path.exists(db_path)
+    assert not app.extensions.get('db_ready')
+
+def test_first_use_creates_the_schema(app, db_path):
+    with app.app_context():
+        db = get_db()
+        assert app.extensions['db_ready']
+        assert db.execute("SELECT COUNT(*) FROM debt").fetchone()[0] == 0
+
+def test_current_database_skips_the_schema_setup(make_app, monkeypatch):
+    with make_app().app_context():
+        get_db()
+
+    def fail():
+        raise AssertionError("schema set up again")
+
+    monkeypatch.setattr(schema, 'init_db', fail)
+    monkeypatch.setattr(schema, 'update_null_timestamps', fail)
+    app = make_app()
+    assert app.test_client().get('/api/summary').status_code == 200
+    assert app.extensions['db_ready']
+
+def test_old_databases_get_their_null_timestamps_filled(legacy_db, make_app):
+    app = make_app()
+    app.test_client().post('/migrate/run', data={})
+    with app.app_context():
+        db = get_db()
+        assert db.execute("SELECT COUNT(*) FROM debt WHERE created_at IS NULL").fetchone()[0] == 0
+
+def test_init_db_command(app, db_path):
+    result = app.test_cli_runner().invoke(args=['init-db'])
+    assert result.exit_code == 0
+    assert result.output == f"Database ready at {db_path}.\n"
+
+def test_init_db_command_reports_failures(app, monkeypatch):
+    monkeypatch.setattr(schema, 'init_db', lambda: False)
+    result = app.test_cli_runner().invoke(args=['init-db'])
+    assert result.exit_code == 1
+    assert 'initialization failed' in result.output
+
+def test_cold_start_benchmark():
+    metrics = startup.run(runs=1, rows=10, url='/api/summary')
+    assert set(metrics) == set(startup.METRICS)
+    assert all(value > 0 for value in metrics.values())
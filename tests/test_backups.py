@@ -0,0 +1,205 @@
+import gzip
+import os
+import sqlite3
+import pytest
+from conftest import add_entries
+from settle_sense import backups
+from settle_sense.admin import get_backups
+from settle_sense.backups import BackupError, backup_database, restore_database
+from settle_sense.db import get_db, get_pool, get_schema
+
+def people(app):
+    with app.app_context():
+        return [row[0] for row in get_db().execute("SELECT person FROM debt ORDER BY id")]
+
+@pytest.mark.parametrize('incremental', [True, False])
+def test_backup_then_restore(app, client, incremental):
+    add_entries(client, ('Alice', '1', 'they_owe', ''), ('Bob', '2', 'you_owe', ''))
+    with app.app_context():
+        backup = backup_database(incremental=incremental)
+    add_entries(client, ('Carol', '3', 'they_owe', ''))
+    client.post('/delete/1')
+    assert people(app) == ['Bob', 'Carol']
+
+    with app.app_context():
+        _, safety_backup = restore_database(backup)
+    assert people(app) == ['Alice', 'Bob']
+    assert client.get('/api/summary').get_json()['net_balance'] == -1.0
+
+    # The pre-restore state was kept
+    with app.app_context():
+        restore_database(safety_backup)
+    assert people(app) == ['Bob', 'Carol']
+
+@pytest.mark.parametrize('pooled', [True, False])
+def test_restore_reaches_other_workers(make_app, pooled):
+    restoring = make_app()
+    other = make_app(DB_POOL=pooled)
+    client = restoring.test_client()
+    add_entries(client, ('Alice', '1', 'they_owe', ''))
+    with restoring.app_context():
+        backup = backup_database()
+    add_entries(client, ('Bob', '2', 'you_owe', ''))
+
+    with other.app_context():
+        get_db()
+        schema = get_schema()
+        generation = get_pool().generation
+
+    with restoring.app_context():
+        restore_database(backup)
+
+    with other.app_context():
+        assert [row[0] for row in get_db().execute("SELECT person FROM debt")] == ['Alice']
+        assert get_pool().generation > generation
+        assert get_schema() is not schema
+
+def test_checkout_runs_no_schema_query(app):
+    statements = []
+    with app.app_context():
+        get_db().set_trace_callback(statements.append)
+    with app.app_context():
+        get_db()
+        get_schema()
+    assert not [sql for sql in statements if 'schema_version' in sql]
+
+def test_mark_replaced_retires_pooled_connections(make_app):
+    first, second = make_app(), make_app()
+    with second.app_context():
+        pooled = get_db()
+    with first.app_context():
+        get_pool().mark_replaced()
+    with second.app_context():
+        assert get_db() is not pooled
+
+def backup_rows(path):
+    db = sqlite3.connect(path)
+    try:
+        assert db.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+        return [row[0] for row in db.execute("SELECT person FROM debt ORDER BY id")]
+    finally:
+        db.close()
+
+@pytest.mark.parametrize('compression', ['', 'gzip'])
+def test_full_backup_is_a_verified_copy(app, client, backup_dir, tmp_path, compression):
+    add_entries(client, ('Alice', '1', 'they_owe', ''), ('Bob', '2', 'you_owe', ''))
+    with app.app_context():
+        path = backup_database(compression=compression, incremental=False)
+    assert path.endswith('.sqlite.gz' if compression else '.sqlite')
+    assert os.listdir(backup_dir) == [os.path.basename(path)]
+    if compression:
+        plain = tmp_path / 'plain.sqlite'
+        plain.write_bytes(gzip.decompress(open(path, 'rb').read()))
+        path = str(plain)
+    assert backup_rows(path) == ['Alice', 'Bob']
+
+def test_backup_leaves_out_uncommitted_writes(app, client, db_path):
+    add_entries(client, ('Alice', '1', 'they_owe', ''))
+    writer = sqlite3.connect(db_path)
+    writer.execute("INSERT INTO debt (person, amount_minor, direction, note) VALUES ('Eve', 1, 'you_owe', '')")
+    try:
+        with app.app_context():
+            path = backup_database(incremental=False)
+    finally:
+        writer.rollback()
+        writer.close()
+    assert backup_rows(path) == ['Alice']
+
+def test_zstd_falls_back_to_gzip_without_zstandard(app, monkeypatch):
+    monkeypatch.setattr(backups, 'zstandard', None)
+    with app.app_context():
+        assert backups.get_backup_compression('zstd') == 'gzip'
+        assert backups.get_backup_compression('bogus') == ''
+
+def test_failed_integrity_check_keeps_no_backup(app, backup_dir, monkeypatch):
+    monkeypatch.setattr(backups, 'check_integrity', lambda db: 'page 2 is never used')
+    with app.app_context():
+        get_db()
+        with pytest.raises(BackupError):
+            backup_database(incremental=False)
+    assert os.listdir(backup_dir) == []
+
+def test_backup_without_a_database(app):
+    with app.app_context():
+        assert backup_database() is None
+
+def test_restore_accepts_only_backup_files(app, backup_dir):
+    with app.app_context():
+        get_db()
+        path = backup_database(incremental=False)
+    name = os.path.basename(path)
+    assert backups.resolve_backup_path(name) == os.path.realpath(path)
+    assert backups.resolve_backup_path('../debts.sqlite') is None
+    assert backups.resolve_backup_path('missing.sqlite') is None
+    assert backups.resolve_backup_path('') is None
+
+def chunk_files(backup_dir):
+    return {name for _, _, names in os.walk(os.path.join(backup_dir, 'chunks')) for name in names}
+
+def incremental_backup(app):
+    with app.app_context():
+        path = backup_database(incremental=True)
+    return path, backups.read_manifest(path)
+
+def test_incremental_backups_share_unchanged_pages(app, client, backup_dir):
+    add_entries(client, *[(f'Person {i}', '1', 'they_owe', 'x' * 200) for i in range(200)])
+    first_path, first = incremental_backup(app)
+    assert first['new_chunks'] == len(set(first['chunks']))
+    assert chunk_files(backup_dir) == set(first['chunks'])
+
+    # A delete also touches the indexes, rollups and sync tables, but most
+    # pages stay as they were
+    client.post('/delete/7')
+    second_path, second = incremental_backup(app)
+    assert second_path != first_path
+    assert 0 < second['new_chunks'] < len(second['chunks']) // 2
+    assert chunk_files(backup_dir) == set(first['chunks']) | set(second['chunks'])
+
+    with app.app_context():
+        listed = {b['name'] for b in get_backups()}
+    assert listed == {os.path.basename(first_path), os.path.basename(second_path)}
+
+def test_manifest_restore_verifies_chunks(app, client, backup_dir):
+    add_entries(client, ('Alice', '1', 'they_owe', ''))
+    path, manifest = incremental_backup(app)
+    chunk = backups.chunk_path(manifest['chunks'][-1])
+    with open(chunk, 'wb') as f:
+        f.write(backups.zlib.compress(b'\0' * 16))
+    with app.app_context():
+        with pytest.raises(BackupError, match='corrupt'):
+            restore_database(path)
+    os.remove(chunk)
+    with app.app_context():
+        with pytest.raises(BackupError, match='missing chunk'):
+            restore_database(path)
+    assert people(app) == ['Alice']
+
+def test_prune_keeps_the_newest_backups_and_collects_chunks(app, client, backup_dir):
+    add_entries(client, ('Alice', '1', 'they_owe', ''))
+    old_path, old = incremental_backup(app)
+    os.utime(old_path, (1, 1))
+    add_entries(client, *[(f'Person {i}', '2', 'you_owe', 'y' * 200) for i in range(100)])
+    new_path, new = incremental_backup(app)
+    only_old = set(old['chunks']) - set(new['chunks'])
+    assert only_old
+
+    with app.app_context():
+        # Young orphaned chunks survive the grace period
+        assert backups.prune_backups(1)['chunks'] == 0
+        assert sorted(os.listdir(backup_dir)) == ['chunks', os.path.basename(new_path)]
+        result = backups.prune_backups(1, grace_seconds=0)
+    assert result['backups'] == 0
+    assert result['chunks'] == len(only_old)
+    assert chunk_files(backup_dir) == set(new['chunks'])
+
+    with app.app_context():
+        restore_database(new_path)
+    assert len(people(app)) == 101
+
+def test_prune_backups_command(app, client):
+    add_entries(client, ('Alice', '1', 'they_owe', ''))
+    incremental_backup(app)
+    result = app.test_cli_runner().invoke(args=['prune-backups', '--keep', '1', '--grace', '0'])
+    assert result.exit_code == 0
+    assert result.output.startswith('Removed 0 backups and 0 chunks')
@@ -0,0 +1,66 @@
+from conftest import add_entries
+from settle_sense.balances import check_balance_consistency, get_balance_totals
+from settle_sense.db import get_db
+
+def balances(app):
+    with app.app_context():
+        db = get_db()
+        assert check_balance_consistency(db, repair=False)
+        summary = get_balance_totals(db)
+    return summary['net_balance'], {p['name']: p['balance'] for p in summary['people']}
+
+def test_triggers_follow_adds_edits_and_deletes(app, client):
+    add_entries(client, ('Alice', '12.50', 'they_owe', ''), ('Bob', '3', 'you_owe', ''),
+                ('Alice', '0.25', 'you_owe', ''))
+    assert balances(app) == (925, {'Alice': 1225, 'Bob': -300})
+
+    # Moving an entry to another person and direction updates both sides
+    client.post('/edit/1', data={'person': 'Bob', 'amount': '2', 'direction': 'you_owe', 'note': ''})
+    assert balances(app) == (-525, {'Alice': -25, 'Bob': -500})
+
+    client.post('/delete/3')
+    assert balances(app) == (-500, {'Bob': -500})
+
+def test_filtered_totals(app, client):
+    add_entries(client, ('Alice', '5', 'they_owe', ''), ('Alice', '2', 'you_owe', ''),
+                ('Bob', '1', 'they_owe', ''))
+    with app.app_context():
+        alice = get_balance_totals(get_db(), filter_person='Alice')
+        owed = get_balance_totals(get_db(), filter_direction='they_owe')
+    assert (alice['entry_count'], alice['net_balance']) == (2, 300)
+    assert (owed['entry_count'], owed['total_you_owe'], owed['net_balance']) == (2, 0, 600)
+
+def test_drift_is_detected_and_repaired(app, client):
+    add_entries(client, ('Alice', '5', 'they_owe', ''))
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE person_balance SET owed_to_you_minor = 1")
+        db.commit()
+        assert not check_balance_consistency(db, repair=False)
+        assert check_balance_consistency(db)
+    assert balances(app) == (500, {'Alice': 500})
+
+def test_check_balances_command(app, client):
+    add_entries(client, ('Alice', '5', 'they_owe', ''))
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['check-balances'])
+    assert result.exit_code == 0
+    assert 'consistent' in result.output
+
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE balance_totals SET you_owe_count = 7")
+        db.commit()
+    result = runner.invoke(args=['check-balances'])
+    assert result.exit_code == 0
+    assert 'rebuilt' in result.output
+    assert balances(app) == (500, {'Alice': 500})
+
+def test_check_balances_command_fails_on_errors(app):
+    with app.app_context():
+        db = get_db()
+        db.execute("DROP TABLE person_balance")
+        db.commit()
+    result = app.test_cli_runner().invoke(args=['check-balances'])
+    assert result.exit_code == 1
+    assert 'check failed' in result.output
@@ -0,0 +1,62 @@
+import pytest
+from conftest import add_entries
+from settle_sense.batch import apply_batch
+from settle_sense.db import get_db
+
+def batch(client, *operations):
+    return client.post('/api/entries/batch', json={'operations': list(operations)})
+
+def test_batch_applies_all_operations(app, client):
+    alice, bob = add_entries(client, ('Alice', '10', 'they_owe', ''), ('Bob', '5', 'you_owe', ''))
+    response = batch(client,
+                     {'op': 'update', 'id': alice, 'amount': '12.34'},
+                     {'op': 'delete', 'id': bob},
+                     {'op': 'create', 'person': 'Carol', 'amount': '1', 'direction': 'you_owe'})
+    assert response.status_code == 200
+    assert response.get_json()['applied'] == 3
+    with app.app_context():
+        rows = get_db().execute("SELECT person, amount_minor FROM debt ORDER BY id").fetchall()
+        assert [tuple(row) for row in rows] == [('Alice', 1234), ('Carol', 100)]
+
+def test_batch_rejects_update_after_delete(app, client):
+    alice, = add_entries(client, ('Alice', '10', 'they_owe', ''))
+    response = batch(client,
+                     {'op': 'delete', 'id': alice},
+                     {'op': 'update', 'id': alice, 'amount': '3'})
+    assert response.status_code == 422
+    errors = response.get_json()['results']
+    assert [error['index'] for error in errors] == [1]
+    assert 'deleted earlier in this batch' in errors[0]['error']
+    with app.app_context():
+        assert get_db().execute("SELECT COUNT(*) FROM debt").fetchone()[0] == 1
+
+def test_batch_update_sees_earlier_update(app, client):
+    alice, = add_entries(client, ('Alice', '10', 'they_owe', 'first'))
+    response = batch(client,
+                     {'op': 'update', 'id': alice, 'person': 'Alicia'},
+                     {'op': 'update', 'id': alice, 'amount': '3'})
+    assert response.status_code == 200
+    with app.app_context():
+        row = get_db().execute("SELECT person, amount_minor, note FROM debt").fetchone()
+        assert tuple(row) == ('Alicia', 300, 'first')
+
+def test_batch_reports_overflowing_amount(client):
+    response = batch(client, {'op': 'create', 'person': 'Alice', 'amount': '1e999999999',
+                              'direction': 'they_owe'})
+    assert response.status_code == 422
+    assert 'too large' in response.get_json()['results'][0]['error']
+
+def test_batch_reports_missing_entry(client):
+    response = batch(client, {'op': 'delete', 'id': 404})
+    assert response.status_code == 422
+    assert response.get_json()['results'][0]['error'] == 'Entry 404 not found'
+
+@pytest.mark.parametrize('operation', [
+    {'op': 'delete', 'id': 404},
+    {'op': 'update', 'id': 404,
+     'entry': {'person': 'Alice', 'amount_minor': 100, 'direction': 'they_owe', 'note': ''}},
+])
+def test_apply_batch_reports_entries_gone_since_validation(app, operation):
+    with app.app_context():
+        with pytest.raises(LookupError, match='Entry 404 not found'):
+            apply_batch(get_db(), [operation])
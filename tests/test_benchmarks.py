@@ -0,0 +1,66 @@
+import collections
+import sqlite3
+import pytest
+from benchmarks import generator, results
+from benchmarks.cases import CASES
+from benchmarks.run import run_case
+
+def test_generator_is_seeded():
+    first = list(generator.generate_entries(500, seed=3))
+    assert list(generator.generate_entries(500, seed=3)) == first
+    assert list(generator.generate_entries(500, seed=4)) != first
+
+def test_generated_ledger_shape():
+    entries = list(generator.generate_entries(5000, seed=1))
+    people = collections.Counter(entry[0] for entry in entries)
+    # Zipf-like: the most frequent person dwarfs the median one
+    counts = sorted(people.values(), reverse=True)
+    assert counts[0] > 10 * counts[len(counts) // 2]
+    assert len(people) <= generator.default_people(5000)
+
+    directions = collections.Counter(entry[2] for entry in entries)
+    assert 0.5 < directions['they_owe'] / len(entries) < 0.7
+    assert all(amount >= 1 for _, amount, *_ in entries)
+    notes = [len(entry[3].split()) for entry in entries]
+    assert min(notes) == 0 and max(notes) >= 100
+    created = [entry[4] for entry in entries]
+    assert created == sorted(created)
+    assert created[0] >= '2020-01-01' and created[-1] < '2025-02-01'
+
+@pytest.fixture(scope='module')
+def dataset(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('bench') / 'ledger.sqlite')
+    return generator.build_dataset(path, 400, seed=2, batch_size=150)
+
+def test_build_dataset(dataset):
+    db = sqlite3.connect(dataset)
+    try:
+        assert db.execute("SELECT COUNT(*) FROM debt").fetchone()[0] == 400
+        assert db.execute("SELECT COUNT(*) FROM person_balance").fetchone()[0] > 1
+        assert db.execute("SELECT COUNT(*) FROM balance_snapshot").fetchone()[0] == 1
+        assert db.execute("SELECT COUNT(*) FROM debt_fts WHERE debt_fts MATCH 'dinner'").fetchone()[0]
+    finally:
+        db.close()
+
+@pytest.mark.parametrize('name', sorted(CASES))
+def test_case_runs(dataset, name):
+    summary = run_case(name, dataset, iterations=2, warmup=0)
+    assert summary['iterations'] == 2
+    assert 0 <= summary['min_ms'] <= summary['p50_ms'] <= summary['p99_ms'] <= summary['max_ms']
+
+def test_percentiles():
+    samples = list(range(1, 101))
+    assert results.percentile(samples, 50) == 50.5
+    assert results.percentile(samples, 99) == pytest.approx(99.01)
+    assert results.percentile([], 50) is None
+    assert results.summarize([4.0, 1.0, 2.0])['p50_ms'] == 2.0
+
+def test_regression_thresholds():
+    baseline = {'route.index': {'p50_ms': 10.0, 'p95_ms': 2.0, 'peak_rss_mb': 100.0},
+                'route.export': {'p50_ms': 50.0}}
+    current = {'route.index': {'p50_ms': 14.0, 'p95_ms': 2.9, 'peak_rss_mb': 104.0},
+               'db.page': {'p50_ms': 1.0}}
+    # p95 is 45% slower but within the 1 ms noise floor; RSS grew under 5 MB
+    assert results.compare(current, baseline, 0.25, ('p50_ms', 'p95_ms', 'peak_rss_mb')) == [
+        ('route.index', 'p50_ms', 10.0, 14.0)]
+    assert results.report_regressions([], 0.25) == 0
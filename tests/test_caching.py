@@ -0,0 +1,71 @@
+import datetime
+import pytest
+from conftest import add_entries
+from settle_sense.db import get_db
+
+PAGES = ['/', '/api/summary', '/export']
+
+def revalidate(client, path, etag):
+    return client.get(path, headers={'If-None-Match': etag})
+
+@pytest.mark.parametrize('path', PAGES)
+def test_unchanged_data_gets_304(client, path):
+    add_entries(client, ('Alice', '1', 'they_owe', ''))
+    first = client.get(path)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag.startswith('W/')
+
+    second = revalidate(client, path, etag)
+    assert second.status_code == 304
+    assert second.headers['ETag'] == etag
+    assert not second.data
+
+@pytest.mark.parametrize('path', PAGES)
+def test_writes_change_the_etag(client, path):
+    etag = client.get(path).headers['ETag']
+    add_entries(client, ('Bob', '2', 'you_owe', ''))
+    response = revalidate(client, path, etag)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert revalidate(client, path, response.headers['ETag']).status_code == 304
+
+def test_304_skips_the_view(app, client):
+    # Settle the pool generation the new database file starts
+    client.get('/')
+    etag = client.get('/').headers['ETag']
+    statements = []
+    with app.app_context():
+        get_db().set_trace_callback(statements.append)
+    assert revalidate(client, '/', etag).status_code == 304
+    # The pool's health check, then the data version and nothing else
+    assert statements == ['SELECT 1', 'SELECT version, changed_at FROM data_version WHERE id = 1']
+
+def test_ledger_writes_change_the_etag(client):
+    etag = client.get('/').headers['ETag']
+    client.post('/api/ledgers', json={'name': 'Trip'})
+    assert revalidate(client, '/', etag).status_code == 200
+
+def test_settings_change_the_etag(client, write_settings):
+    etag = client.get('/api/summary').headers['ETag']
+    write_settings(theme='dark')
+    assert revalidate(client, '/api/summary', etag).status_code == 200
+
+def test_if_modified_since(app, client):
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE data_version SET changed_at = '2024-01-01 00:00:00'")
+        db.commit()
+    response = client.get('/api/summary')
+    assert response.last_modified == datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    cached = client.get('/api/summary', headers={'If-Modified-Since': response.headers['Last-Modified']})
+    assert cached.status_code == 304
+    stale = client.get('/api/summary', headers={'If-Modified-Since': 'Sun, 31 Dec 2023 00:00:00 GMT'})
+    assert stale.status_code == 200
+
+def test_pending_flash_messages_are_not_cached(client):
+    etag = client.get('/').headers['ETag']
+    client.post('/add', data={'person': '', 'amount': 'x', 'direction': 'they_owe'})
+    response = revalidate(client, '/', etag)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-store'
@@ -0,0 +1,95 @@
+import sqlite3
+import pytest
+from settle_sense.db import ConnectionPool, connect_db, get_db, get_pool
+
+def checkout(app):
+    with app.app_context():
+        return get_db()
+
+def test_requests_reuse_pooled_connections(app):
+    # The first checkout creates the database file, which starts a new generation
+    checkout(app)
+    first = checkout(app)
+    assert checkout(app) is first
+
+def test_connections_are_tuned(make_app):
+    app = make_app(DB_CACHE_SIZE=-2000, DB_BUSY_TIMEOUT=1234)
+    with app.app_context():
+        db = get_db()
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        assert db.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert db.execute("PRAGMA cache_size").fetchone()[0] == -2000
+        assert db.execute("PRAGMA busy_timeout").fetchone()[0] == 1234
+        assert db.execute("PRAGMA temp_store").fetchone()[0] == 2
+
+def test_open_transactions_are_rolled_back_on_release(app):
+    with app.app_context():
+        db = get_db()
+        db.execute("INSERT INTO debt (person, amount_minor, direction, note) VALUES ('Ann', 100, 'you_owe', '')")
+        assert db.in_transaction
+    with app.app_context():
+        db = get_db()
+        assert not db.in_transaction
+        assert db.execute("SELECT COUNT(*) FROM debt").fetchone()[0] == 0
+
+def test_unpooled_connections_are_closed(make_app):
+    app = make_app(DB_POOL=False)
+    db = checkout(app)
+    with pytest.raises(sqlite3.ProgrammingError):
+        db.execute("SELECT 1")
+    assert checkout(app) is not db
+
+@pytest.fixture
+def pool(app):
+    checkout(app)
+    return ConnectionPool(lambda: connect_db(app.config), app.config['DATABASE'], 2)
+
+def test_pool_keeps_at_most_max_idle(pool):
+    connections = [pool.acquire() for _ in range(3)]
+    for db in connections:
+        pool.release(db)
+    assert pool._idle == connections[:2]
+    with pytest.raises(sqlite3.ProgrammingError):
+        connections[2].execute("SELECT 1")
+
+def test_recycle_retires_connections_in_use(pool):
+    idle, busy = pool.acquire(), pool.acquire()
+    pool.release(idle)
+    pool.recycle()
+    pool.release(busy)
+    assert not pool._idle
+    for db in (idle, busy):
+        with pytest.raises(sqlite3.ProgrammingError):
+            db.execute("SELECT 1")
+
+def test_broken_idle_connections_are_replaced(pool):
+    db = pool.acquire()
+    pool.release(db)
+    db.close()
+    replacement = pool.acquire()
+    assert replacement is not db
+    assert replacement.execute("SELECT 1").fetchone()[0] == 1
+
+def test_forked_worker_opens_its_own_connections(pool, monkeypatch):
+    inherited = pool.acquire()
+    pool.release(inherited)
+    monkeypatch.setattr('os.getpid', lambda: pool._pid + 1)
+    db = pool.acquire()
+    assert db is not inherited
+    # The parent's connection was dropped, not closed, so the parent can keep using it
+    assert inherited.execute("SELECT 1").fetchone()[0] == 1
+
+def test_replaced_database_file_retires_connections(app, tmp_path):
+    pooled = checkout(app)
+    replacement = tmp_path / 'replacement.sqlite'
+    sqlite3.connect(replacement).close()
+    with app.app_context():
+        get_pool().recycle()
+    with app.app_context():
+        generation = get_pool().generation
+        # Renaming another file into place changes the inode
+        replacement.replace(app.config['DATABASE'])
+    with app.app_context():
+        db = get_db()
+        assert db is not pooled
+        assert get_pool().generation > generation
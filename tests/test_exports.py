@@ -0,0 +1,117 @@
+import csv
+import gzip
+import io
+import json
+import struct
+import pytest
+from conftest import add_entries
+from settle_sense import exports
+
+ENTRIES = [
+    ('Alice', '12.50', 'they_owe', 'lunch, "downtown"'),
+    ('Bob', '3', 'you_owe', ''),
+    ('Alice', '0.01', 'you_owe', 'dust'),
+    ('Carol', '7.25', 'they_owe', 'taxi\nfare'),
+    ('Dan', '1999.99', 'they_owe', 'rent'),
+]
+
+@pytest.fixture
+def entries(client, monkeypatch):
+    # Small batches, so every export spans several of them
+    monkeypatch.setattr(exports, 'EXPORT_BATCH_SIZE', 2)
+    return add_entries(client, *ENTRIES)
+
+def export(client, **params):
+    response = client.get('/export', query_string=params)
+    assert response.status_code == 200
+    assert response.is_streamed
+    return response
+
+def expected(ids, order=-1):
+    rows = [(entry_id, person, float(amount), direction, note)
+            for entry_id, (person, amount, direction, note) in zip(ids, ENTRIES)]
+    return sorted(rows, key=lambda row: row[0] * order)
+
+def decode_binary(data):
+    assert data[:4] == b'SSX1'
+    (count,), offset = struct.unpack_from('<H', data, 4), 6
+    columns = []
+    for _ in range(count):
+        col_type = data[offset:offset + 1]
+        (length,) = struct.unpack_from('<H', data, offset + 1)
+        columns.append((data[offset + 3:offset + 3 + length].decode(), col_type))
+        offset += 3 + length
+
+    rows = []
+    while True:
+        (block,), offset = struct.unpack_from('<I', data, offset), offset + 4
+        if not block:
+            assert offset == len(data)
+            return [name for name, _ in columns], rows
+        values = []
+        for _, col_type in columns:
+            if col_type in (b'i', b'f'):
+                code = '<%d%s' % (block, 'q' if col_type == b'i' else 'd')
+                values.append(struct.unpack_from(code, data, offset))
+                offset += 8 * block
+            elif col_type == b'd':
+                values.append(['they_owe' if b else 'you_owe' for b in data[offset:offset + block]])
+                offset += block
+            else:
+                lengths = struct.unpack_from(f'<{block}I', data, offset)
+                offset += 4 * block
+                texts = []
+                for length in lengths:
+                    if length == exports.BINARY_NULL_LENGTH:
+                        texts.append(None)
+                    else:
+                        texts.append(data[offset:offset + length].decode())
+                        offset += length
+                values.append(texts)
+        rows.extend(zip(*values))
+
+def test_csv_export(client, entries):
+    response = export(client)
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ['ID', 'Person', 'Amount', 'Direction', 'Note', 'Created At', 'Updated At']
+    assert [(int(r[0]), r[1], float(r[2]), r[3], r[4]) for r in rows[1:]] == expected(entries)
+    assert all(r[5] for r in rows[1:])
+
+def test_ndjson_export(client, entries):
+    response = export(client, format='ndjson', order='asc', sort='date')
+    lines = response.get_data(as_text=True).splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [(r['id'], r['person'], r['amount'], r['direction'], r['note']) for r in records] == \
+        expected(entries, order=1)
+
+def test_json_export_is_one_array(client, entries):
+    records = json.loads(export(client, format='json').get_data())
+    assert [(r['id'], r['person'], r['amount'], r['direction'], r['note']) for r in records] == \
+        expected(entries)
+
+def test_empty_json_export(client):
+    assert json.loads(export(client, format='json').get_data()) == []
+
+def test_binary_export(client, entries):
+    columns, rows = decode_binary(export(client, format='binary').get_data())
+    assert columns == [col for col, _ in exports.EXPORT_COLUMNS]
+    assert [row[:5] for row in rows] == expected(entries)
+
+@pytest.mark.parametrize('export_format', ['csv', 'ndjson', 'json', 'binary'])
+def test_gzip_export(client, entries, export_format):
+    plain = export(client, format=export_format).get_data()
+    response = export(client, format=export_format, compress='gzip')
+    assert response.mimetype == 'application/gzip'
+    assert response.headers['Content-Disposition'].endswith('.gz')
+    assert gzip.decompress(response.get_data()) == plain
+
+def test_export_uses_dashboard_filters(client, entries):
+    records = json.loads(export(client, format='json', person='Alice', sort='amount', order='asc').get_data())
+    assert [r['amount'] for r in records] == [0.01, 12.5]
+    records = json.loads(export(client, format='json', direction='you_owe').get_data())
+    assert {r['person'] for r in records} == {'Alice', 'Bob'}
+
+def test_unsupported_format(client):
+    response = client.get('/export?format=xml')
+    assert response.status_code == 302
@@ -0,0 +1,85 @@
+import datetime
+import pytest
+from conftest import add_entries
+from settle_sense import balances
+from settle_sense.balances import get_balances_as_of, take_balance_snapshot
+from settle_sense.db import get_db
+
+# (person, amount_minor, direction, created_at)
+ROWS = [
+    ('Alice', 1000, 'they_owe', '2024-01-30 09:00:00'),
+    ('Bob', 250, 'you_owe', '2024-01-30 18:30:00'),
+    ('Alice', 300, 'you_owe', '2024-02-02 12:00:00'),
+]
+TODAY = datetime.date.today().isoformat()
+
+@pytest.fixture
+def dated(app):
+    with app.app_context():
+        db = get_db()
+        db.executemany(
+            "INSERT INTO debt (person, amount_minor, direction, note, created_at, updated_at) "
+            "VALUES (?, ?, ?, '', ?, ?)",
+            [row + (row[3],) for row in ROWS]
+        )
+        db.commit()
+
+def summary(client, as_of):
+    response = client.get('/api/summary', query_string={'as_of': as_of})
+    assert response.status_code == 200
+    data = response.get_json()
+    return data['net_balance'], {p['name']: p['balance'] for p in data['people']}
+
+def test_balances_as_of_a_date(client, dated):
+    assert summary(client, '2024-01-29') == (0, {})
+    assert summary(client, '2024-01-30 12:00:00') == (10.0, {'Alice': 10.0})
+    assert summary(client, '2024-01-30') == (7.5, {'Alice': 10.0, 'Bob': -2.5})
+    assert summary(client, '2024-02-02') == (4.5, {'Alice': 7.0, 'Bob': -2.5})
+
+def test_edits_and_deletes_count_from_when_they_happen(client, dated):
+    client.post('/edit/1', data={'person': 'Alice', 'amount': '20', 'direction': 'they_owe', 'note': ''})
+    client.post('/delete/2')
+    assert summary(client, '2024-02-02') == (4.5, {'Alice': 7.0, 'Bob': -2.5})
+    assert summary(client, TODAY) == (17.0, {'Alice': 17.0})
+    assert client.get('/api/summary').get_json()['net_balance'] == 17.0
+
+def test_dashboard_filters_apply_as_of(app, dated):
+    with app.app_context():
+        totals = get_balances_as_of(get_db(), '2024-02-02 23:59:59', filter_direction='you_owe')
+    assert (totals['entry_count'], totals['total_you_owe'], totals['net_balance']) == (2, 550, -550)
+
+def test_snapshots_do_not_change_results(app, client, dated, monkeypatch):
+    monkeypatch.setattr(balances, 'SNAPSHOT_INTERVAL', 3)
+    add_entries(client, *[('Carol', str(i), 'they_owe', '') for i in range(1, 5)])
+    client.post('/edit/3', data={'person': 'Dan', 'amount': '1', 'direction': 'you_owe', 'note': ''})
+    add_entries(client, ('Eve', '9', 'you_owe', ''), ('Eve', '1', 'they_owe', ''))
+    dates = ['2024-01-30', '2024-02-01', '2024-02-02', TODAY]
+    with_snapshots = [summary(client, date) for date in dates]
+
+    with app.app_context():
+        db = get_db()
+        assert db.execute("SELECT COUNT(*) FROM balance_snapshot").fetchone()[0] >= 2
+        db.execute("DELETE FROM balance_snapshot_person")
+        db.execute("DELETE FROM balance_snapshot")
+        db.commit()
+    assert [summary(client, date) for date in dates] == with_snapshots
+    assert with_snapshots[-1] == (8.5, {'Alice': 10.0, 'Bob': -2.5, 'Carol': 10.0, 'Dan': -1.0, 'Eve': -8.0})
+
+def test_backdated_entries_after_a_snapshot(app, client, dated):
+    with app.app_context():
+        db = get_db()
+        assert take_balance_snapshot(db, force=True)
+        db.execute("INSERT INTO debt (person, amount_minor, direction, note, created_at) "
+                   "VALUES ('Zed', 100, 'they_owe', '', '2024-01-31 10:00:00')")
+        db.commit()
+    # The snapshot covers changes up to 2024-02-02, so earlier dates replay from the start
+    assert summary(client, '2024-01-31') == (8.5, {'Alice': 10.0, 'Bob': -2.5, 'Zed': 1.0})
+    assert summary(client, '2024-02-02') == (5.5, {'Alice': 7.0, 'Bob': -2.5, 'Zed': 1.0})
+
+def test_invalid_as_of(client):
+    assert client.get('/api/summary?as_of=soon').status_code == 400
+
+def test_snapshot_balances_command(app, dated):
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=['snapshot-balances']).output.startswith('Took balance snapshot')
+    assert runner.invoke(args=['snapshot-balances']).output == "No changes since the last snapshot.\n"
@@ -0,0 +1,42 @@
+import io
+from settle_sense.db import get_db
+from settle_sense.imports import run_import
+
+CSV_HEADER = 'person,amount,direction,note\n'
+
+def import_csv(app, text, chunk_size=2):
+    with app.test_request_context():
+        return run_import(io.BytesIO(text.encode('utf-8')), 'ledger.csv', chunk_size=chunk_size)
+
+def test_import_csv(app):
+    report = import_csv(app, CSV_HEADER + 'Alice,12.50,they_owe,lunch\nBob,0.10,you_owe,\n')
+    assert report['imported'] == 2 and report['failed'] == 0
+    with app.app_context():
+        rows = get_db().execute("SELECT person, amount_minor FROM debt ORDER BY id").fetchall()
+        assert [tuple(row) for row in rows] == [('Alice', 1250), ('Bob', 10)]
+
+def test_import_reports_invalid_rows(app):
+    report = import_csv(app, CSV_HEADER + 'Alice,1e999999999,they_owe,\nBob,1,sideways,\nCarol,2,you_owe,\n')
+    assert report['imported'] == 1
+    assert report['failed'] == 2
+    assert [error['line'] for error in report['errors']] == [2, 3]
+
+def test_import_reports_database_errors_per_chunk(app):
+    with app.app_context():
+        db = get_db()
+        db.execute('''
+            CREATE TRIGGER reject_mallory BEFORE INSERT ON debt WHEN NEW.person = 'Mallory'
+            BEGIN SELECT RAISE(ABORT, 'rejected'); END
+        ''')
+        db.commit()
+
+    rows = ['Alice,1,they_owe,', 'Bob,2,they_owe,', 'Mallory,3,they_owe,', 'Carol,4,they_owe,',
+            'Dan,5,they_owe,']
+    report = import_csv(app, CSV_HEADER + '\n'.join(rows) + '\n')
+    # The chunk holding Mallory is rolled back whole; the import carries on
+    assert report['imported'] == 3
+    assert report['failed'] == 2
+    assert report['errors'] == [{'line': 4, 'error': 'Lines 4-5 were not imported: rejected'}]
+    with app.app_context():
+        people = [row[0] for row in get_db().execute("SELECT person FROM debt ORDER BY id")]
+        assert people == ['Alice', 'Bob', 'Dan']
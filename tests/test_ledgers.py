@@ -0,0 +1,119 @@
+import random
+import pytest
+from settle_sense import ledgers
+from settle_sense.db import get_db
+from settle_sense.ledgers import SETTLEMENT_EXACT_LIMIT, settle_balances, synthetic_balances
+
+def apply_transfers(balances, transfers):
+    remaining = dict(balances)
+    for debtor, creditor, amount in transfers:
+        assert amount > 0
+        remaining[debtor] += amount
+        remaining[creditor] -= amount
+    return remaining
+
+def partitions(items):
+    if not items:
+        yield []
+        return
+    first, rest = items[0], items[1:]
+    for partition in partitions(rest):
+        yield [[first]] + partition
+        for index in range(len(partition)):
+            yield partition[:index] + [[first] + partition[index]] + partition[index + 1:]
+
+def minimum_transfers(balances):
+    """Brute force: n members in g zero-sum groups need exactly n - g transfers."""
+    amounts = [amount for amount in balances.values() if amount]
+    best = max(len(partition) for partition in partitions(amounts)
+               if all(sum(group) == 0 for group in partition))
+    return len(amounts) - best
+
+def random_balances(rng, members):
+    # Small amounts make zero-sum subgroups common
+    return synthetic_balances(members, rng, max_amount=6)
+
+def test_settlement_is_optimal():
+    rng = random.Random(7)
+    for _ in range(300):
+        balances = random_balances(rng, rng.randint(2, 8))
+        transfers, method = settle_balances(balances)
+        assert method == 'exact'
+        assert set(apply_transfers(balances, transfers).values()) <= {0}
+        assert len(transfers) == minimum_transfers(balances)
+
+def test_settlement_cancels_opposite_pairs():
+    transfers, _ = settle_balances({'a': 500, 'b': -500, 'c': 300, 'd': -200, 'e': -100})
+    assert ('b', 'a', 500) in transfers
+    assert len(transfers) == 3
+
+def test_large_settlement_falls_back_to_greedy():
+    balances = synthetic_balances(SETTLEMENT_EXACT_LIMIT * 5, random.Random(1))
+    transfers, method = settle_balances(balances)
+    assert method == 'greedy'
+    assert set(apply_transfers(balances, transfers).values()) <= {0}
+    assert len(transfers) <= len(balances) - 1
+
+def test_settlement_rejects_unbalanced():
+    with pytest.raises(ValueError):
+        settle_balances({'a': 1, 'b': -2})
+
+@pytest.fixture
+def ledger(client):
+    response = client.post('/api/ledgers', json={'name': 'Trip'})
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+def test_expense_settlement(client, ledger):
+    response = client.post(f'/api/ledgers/{ledger}/expenses',
+                           json={'paid_by': 'Ann', 'amount': '10.00', 'split_between': ['Ann', 'Ben', 'Cy']})
+    assert response.status_code == 201
+    plan = client.get(f'/api/ledgers/{ledger}/settlement').get_json()
+    # 1000 split three ways: the first member takes the leftover unit
+    assert sorted((t['from'], t['to'], t['amount_minor']) for t in plan['transfers']) == [
+        ('Ben', 'Ann', 333), ('Cy', 'Ann', 333)]
+    assert plan['method'] == 'exact'
+
+def test_expense_database_error(app, client, ledger):
+    with app.app_context():
+        db = get_db()
+        db.execute('''
+            CREATE TRIGGER reject_entries BEFORE INSERT ON ledger_entry
+            BEGIN SELECT RAISE(ABORT, 'rejected'); END
+        ''')
+        db.commit()
+    expense = {'paid_by': 'Ann', 'amount': '9', 'split_between': 'Ann,Ben'}
+    response = client.post(f'/api/ledgers/{ledger}/expenses', json=expense)
+    assert response.status_code == 409
+    assert response.get_json()['details'] == 'rejected'
+
+    # The pooled connection was rolled back, so it is usable for the next request
+    with app.app_context():
+        db = get_db()
+        assert not db.in_transaction
+        db.execute("DROP TRIGGER reject_entries")
+        db.commit()
+    assert client.post(f'/api/ledgers/{ledger}/expenses', json=expense).status_code == 201
+
+def test_dashboard_does_not_settle_ledgers(client, ledger, monkeypatch):
+    client.post(f'/api/ledgers/{ledger}/expenses',
+                json={'paid_by': 'Ann', 'amount': '9', 'split_between': 'Ann,Ben,Cy'})
+
+    def fail(*args, **kwargs):
+        raise AssertionError("settlement computed during a dashboard render")
+
+    monkeypatch.setattr(ledgers, 'build_settlement', fail)
+    response = client.get('/')
+    assert response.status_code == 200
+    assert b'3 members' in response.data
+    assert b'2 entries' in response.data
+    assert f'/api/ledgers/{ledger}/settlement'.encode() in response.data
+
+def test_ledger_summaries(app, client, ledger):
+    client.post('/api/ledgers', json={'name': 'Empty'})
+    client.post(f'/api/ledgers/{ledger}/expenses',
+                json={'paid_by': 'Ann', 'amount': '4', 'split_between': 'Ben,Cy'})
+    with app.app_context():
+        summaries = ledgers.get_ledger_summaries(get_db())
+    assert [(s['name'], s['member_count'], s['entry_count']) for s in summaries] == [
+        ('Empty', 0, 0), ('Trip', 3, 2)]
@@ -0,0 +1,113 @@
+import json
+import time
+import pytest
+from conftest import add_entries
+from settle_sense.db import get_db
+from settle_sense import live
+from settle_sense.live import ChangeBroadcaster, VersionWatcher
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+def parse_event(chunk):
+    lines = chunk.decode('utf-8').strip().splitlines()
+    fields = dict(line.split(': ', 1) for line in lines if not line.startswith(':'))
+    return fields.get('event'), json.loads(fields['data']) if 'data' in fields else None
+
+@pytest.fixture
+def live_app(make_app):
+    return make_app(LIVE_POLL_INTERVAL=0.02)
+
+def test_stream_pushes_committed_writes(live_app):
+    client = live_app.test_client()
+    response = client.get('/api/events')
+    stream = iter(response.response)
+    assert next(stream).startswith(b'retry:')
+
+    client.post('/add', data={'person': 'Alice', 'amount': '12.50', 'direction': 'they_owe'})
+    event, data = parse_event(next(stream))
+    assert event == 'change'
+    assert data['action'] == 'added'
+    assert data['totals']['net_balance'] == 12.5
+    assert data['people'] == [{'name': 'Alice', 'balance': 12.5}]
+    response.close()
+
+def test_stream_resyncs_unknown_event_ids(live_app):
+    client = live_app.test_client()
+    add_entries(client, ('Bob', '3', 'you_owe', ''))
+    response = client.get('/api/events', headers={'Last-Event-ID': 'elsewhere-7'})
+    stream = iter(response.response)
+    next(stream)
+    event, data = parse_event(next(stream))
+    assert event == 'resync'
+    assert data['complete'] and data['totals']['net_balance'] == -3.0
+    response.close()
+
+def test_watcher_publishes_other_workers_writes(live_app, make_app):
+    broadcaster = ChangeBroadcaster()
+    watcher = VersionWatcher(broadcaster)
+    subscriber, _ = broadcaster.subscribe()
+    try:
+        with live_app.app_context():
+            watcher.start(live_app, get_db())
+        assert watcher.running
+
+        # A write through another app (worker) sharing the database
+        add_entries(make_app().test_client(), ('Carol', '5', 'they_owe', ''))
+        _, event, data = subscriber.queue.get(timeout=2)
+        assert event == 'change'
+        assert data['action'] == 'refresh' and data['complete']
+        assert data['totals']['net_balance'] == 5.0
+    finally:
+        watcher.stop()
+    assert not watcher.running
+
+def test_watcher_exits_without_subscribers(live_app):
+    broadcaster = ChangeBroadcaster()
+    watcher = VersionWatcher(broadcaster)
+    subscriber, _ = broadcaster.subscribe()
+    with live_app.app_context():
+        watcher.start(live_app, get_db())
+    thread = watcher._thread
+    assert watcher.running
+    broadcaster.unsubscribe(subscriber)
+    assert wait_for(lambda: not thread.is_alive())
+    assert not watcher.running
+
+    # Writes made while nobody was watching reach the next subscriber
+    add_entries(live_app.test_client(), ('Dan', '1', 'they_owe', ''))
+    subscriber, _ = broadcaster.subscribe()
+    try:
+        with live_app.app_context():
+            watcher.start(live_app, get_db())
+        _, event, data = subscriber.queue.get(timeout=2)
+        assert data['action'] == 'refresh'
+    finally:
+        watcher.stop()
+
+def test_no_polling_without_streams(live_app):
+    client = live_app.test_client()
+    add_entries(client, ('Eve', '1', 'they_owe', ''))
+    client.get('/')
+    assert not live.watcher.running
+
+    response = client.get('/api/events')
+    next(iter(response.response))
+    assert live.watcher.running
+    response.close()
+    assert wait_for(lambda: not live.watcher.running)
+
+def test_stream_limit(make_app):
+    app = make_app(LIVE_MAX_CLIENTS=1)
+    client = app.test_client()
+    first = client.get('/api/events')
+    next(iter(first.response))
+    second = client.get('/api/events')
+    assert second.status_code == 503
+    assert second.headers['Retry-After']
+    first.close()
@@ -0,0 +1,75 @@
+import logging
+import os
+import re
+from conftest import add_entries
+from settle_sense.metrics import MetricsRegistry, render_prometheus
+
+def server_timing(response):
+    return {match[0]: (float(match[1]), match[2])
+            for match in re.findall(r'(\w+);dur=([\d.]+)(?:;desc="([^"]*)")?', response.headers['Server-Timing'])}
+
+def sample(text, name, **labels):
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf'^{name}\{{{re.escape(label_text)}\}} (\S+)$', text, re.MULTILINE)
+    return float(match[1]) if match else None
+
+def test_server_timing_header(client):
+    add_entries(client, ('Alice', '1', 'they_owe', ''))
+    timing = server_timing(client.get('/'))
+    assert set(timing) == {'sql', 'render', 'app', 'total'}
+    assert int(timing['sql'][1].split()[0]) > 0
+    assert timing['render'][0] > 0
+    assert timing['total'][0] >= timing['sql'][0] + timing['render'][0]
+
+def test_metrics_endpoint(client):
+    client.get('/')
+    client.get('/')
+    client.get('/api/summary')
+    client.get('/no-such-page')
+    response = client.get('/metrics')
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+
+    assert '# TYPE settlesense_request_duration_seconds histogram' in text
+    assert sample(text, 'settlesense_requests_total', endpoint='dashboard.index', method='GET', status='200') == 2
+    assert sample(text, 'settlesense_requests_total', endpoint='unmatched', method='GET', status='404') == 1
+    assert sample(text, 'settlesense_request_duration_seconds_count', endpoint='dashboard.index') == 2
+    assert sample(text, 'settlesense_request_duration_seconds_bucket', endpoint='dashboard.index', le='+Inf') == 2
+    assert sample(text, 'settlesense_sql_queries_total', endpoint='dashboard.api_summary') > 0
+    assert sample(text, 'settlesense_render_duration_seconds_total', endpoint='dashboard.index') > 0
+    assert sample(text, 'settlesense_render_duration_seconds_total', endpoint='dashboard.api_summary') == 0
+
+def test_streamed_responses_are_not_sized(client):
+    client.get('/export')
+    text = client.get('/metrics').get_data(as_text=True)
+    assert sample(text, 'settlesense_request_duration_seconds_count', endpoint='exports.export_csv') == 1
+    assert sample(text, 'settlesense_response_size_bytes_count', endpoint='exports.export_csv') == 0
+
+def test_metrics_can_be_turned_off(make_app):
+    client = make_app(METRICS=False).test_client()
+    assert 'Server-Timing' not in client.get('/').headers
+    assert client.get('/metrics').status_code == 404
+
+def test_workers_share_their_totals(tmp_path):
+    logger = logging.getLogger('test')
+    directory = str(tmp_path / 'metrics')
+    finished = MetricsRegistry(logger, directory)
+    finished.record('dashboard.index', 'GET', 200, 0.02, 3, 0.001, 0.005, 2048)
+    # Written right away, then kept under an exited worker's pid
+    os.replace(os.path.join(directory, f"{os.getpid()}.json"), os.path.join(directory, '1.json'))
+
+    running = MetricsRegistry(logger, directory)
+    running.record('dashboard.index', 'GET', 200, 0.2, 4, 0.002, 0.01, 4096)
+    totals = running.snapshot()['dashboard.index']
+    assert totals['requests'] == {'GET 200': 2}
+    assert totals['sql_queries'] == 7
+    assert sum(totals['latency']['counts']) == 2
+
+    running.clear_shared()
+    assert not os.listdir(directory)
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry(logging.getLogger('test'))
+    registry.record('say "hi"\\\n', 'GET', 200, 0.001, 0, 0.0, 0.0, None)
+    text = render_prometheus(registry.snapshot())
+    assert 'endpoint="say \\"hi\\"\\\\\\n"' in text
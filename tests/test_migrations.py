@@ -0,0 +1,164 @@
+import sqlite3
+import pytest
+from settle_sense import migrations
+from settle_sense.balances import check_balance_consistency
+from settle_sense.db import get_db, get_schema
+from settle_sense.migrations import (MIGRATION_STEPS, SCHEMA_VERSION, direction_check_present,
+                                     get_migration_progress, get_user_version, needs_migration, run_migrations)
+from settle_sense.money import get_currency_exponent
+
+def amounts(db):
+    return [tuple(row) for row in db.execute("SELECT person, amount_minor FROM debt ORDER BY id")]
+
+def test_new_database_is_current(app):
+    with app.app_context():
+        db = get_db()
+        assert get_user_version(db) == SCHEMA_VERSION
+        assert get_schema().has_minor_amounts
+        assert get_currency_exponent(db) == 2
+        assert not needs_migration()
+
+def test_legacy_database_needs_migration(legacy_db, app):
+    with app.app_context():
+        get_db()
+        assert not get_schema().has_minor_amounts
+        assert needs_migration()
+
+def test_migration_converts_amounts_to_minor_units(legacy_db, app):
+    with app.app_context():
+        db = get_db()
+        steps = run_migrations(db, batch_size=2)
+        assert not [step for step in steps if step['status'] == 'failed']
+        assert get_user_version(db) == SCHEMA_VERSION
+        assert get_schema().has_minor_amounts
+        assert amounts(db) == [('Alice', 1250), ('Bob', 10), ('Alice', 1), ('Carol', 199999)]
+        assert check_balance_consistency(db, repair=False)
+        assert not needs_migration()
+
+def test_migration_uses_configured_exponent(legacy_db, make_app):
+    app = make_app(CURRENCY_EXPONENT=0)
+    with app.app_context():
+        db = get_db()
+        run_migrations(db)
+        assert get_currency_exponent(db) == 0
+        # Positive amounts below one unit keep a unit instead of vanishing
+        assert amounts(db) == [('Alice', 13), ('Bob', 1), ('Alice', 1), ('Carol', 2000)]
+
+def test_migration_dry_run_changes_nothing(legacy_db, app):
+    with app.app_context():
+        db = get_db()
+        steps = run_migrations(db, dry_run=True)
+        assert 'pending' in {step['status'] for step in steps}
+        assert get_user_version(db) < SCHEMA_VERSION
+        assert not get_schema().has_minor_amounts
+
+@pytest.mark.parametrize('path', ['/', '/export', '/edit/1'])
+def test_pages_redirect_before_migration(legacy_db, client, path):
+    response = client.get(path)
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/migrate')
+
+def test_writes_redirect_before_migration(legacy_db, client):
+    response = client.post('/add', data={'person': 'Dan', 'amount': '5', 'direction': 'you_owe'})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/migrate')
+
+@pytest.mark.parametrize('method, path', [
+    ('get', '/api/summary'),
+    ('get', '/api/timeseries'),
+    ('post', '/api/entries/batch'),
+])
+def test_api_returns_503_before_migration(legacy_db, client, method, path):
+    response = getattr(client, method)(path, json={'operations': [{'op': 'delete', 'id': 1}]}
+                                       if method == 'post' else None)
+    assert response.status_code == 503
+    assert 'migration' in response.get_json()['error'].lower()
+
+def test_migration_page_works_before_migration(legacy_db, client):
+    assert client.get('/migrate').status_code == 200
+
+def test_routes_work_after_migration(legacy_db, client):
+    response = client.post('/migrate/run', data={})
+    assert b'completed successfully' in response.data
+    assert client.get('/').status_code == 200
+    summary = client.get('/api/summary')
+    assert summary.status_code == 200
+
+@pytest.mark.parametrize('sql, present', [
+    ("direction TEXT CHECK(direction IN ('you_owe','they_owe')) NOT NULL", True),
+    ("direction TEXT NOT NULL check ( \"direction\" in ( 'they_owe' , 'you_owe' ) )", True),
+    ("direction TEXT NOT NULL", False),
+    ("direction TEXT CHECK(direction IN ('you_owe')) NOT NULL", False),
+    ("direction TEXT CHECK(length(direction) > 0) NOT NULL", False),
+])
+def test_direction_check_detection(app, sql, present):
+    with app.app_context():
+        db = get_db()
+        db.execute("DROP TABLE IF EXISTS probe")
+        db.execute(f"CREATE TABLE probe (id INTEGER PRIMARY KEY, {sql})")
+        assert direction_check_present(db)
+        db.execute("DROP TABLE debt")
+        db.execute("ALTER TABLE probe RENAME TO debt")
+        assert direction_check_present(db) == present
+
+@pytest.mark.parametrize('database, pending', [('current', False), ('unversioned', False), ('legacy', True)])
+def test_dry_run_does_not_take_the_write_lock(request, make_app, db_path, database, pending):
+    if database == 'legacy':
+        request.getfixturevalue('legacy_db')
+    app = make_app(DB_BUSY_TIMEOUT=50)
+    with app.app_context():
+        db = get_db()
+        if database == 'unversioned':
+            # Every step's check runs, though none has anything to do
+            db.execute("PRAGMA user_version = 0")
+    writer = sqlite3.connect(db_path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        response = app.test_client().get('/migrate')
+        assert response.status_code == 200
+        with app.app_context():
+            steps = run_migrations(get_db(), dry_run=True)
+        assert not [step for step in steps if step['status'] == 'failed']
+        assert ('pending' in {step['status'] for step in steps}) == pending
+    finally:
+        writer.rollback()
+        writer.close()
+
+def test_migrated_database_records_every_step(legacy_db, app):
+    with app.app_context():
+        db = get_db()
+        first = run_migrations(db)
+        assert [step['version'] for step in first] == [step.version for step in MIGRATION_STEPS]
+        assert {step['status'] for step in first} <= {'done', 'skipped'}
+        assert {step['status'] for step in run_migrations(db)} == {'applied'}
+
+def test_interrupted_rebuild_resumes(legacy_db, app, monkeypatch):
+    calls = []
+    original = migrations.set_migration_progress
+
+    def crash_after_first_batch(db, step, last_id):
+        original(db, step, last_id)
+        if step == 'debt_table' and last_id is not None:
+            calls.append(last_id)
+            if len(calls) == 2:
+                raise sqlite3.OperationalError('simulated crash')
+
+    with app.app_context():
+        db = get_db()
+        monkeypatch.setattr(migrations, 'set_migration_progress', crash_after_first_batch)
+        steps = run_migrations(db, batch_size=1)
+        assert steps[0]['status'] == 'failed'
+        assert get_user_version(db) == 0
+        assert get_migration_progress(db, 'debt_table') == 1
+
+        # Writes made while the rebuild waits reach the new table too
+        db.execute("UPDATE debt SET amount = 20 WHERE id = 1")
+        db.execute("DELETE FROM debt WHERE id = 2")
+        db.execute("INSERT INTO debt (person, amount, direction, note) VALUES ('Dan', 3.5, 'you_owe', '')")
+        db.commit()
+
+        monkeypatch.setattr(migrations, 'set_migration_progress', original)
+        steps = run_migrations(db, batch_size=1)
+        assert not [step for step in steps if step['status'] == 'failed']
+        assert amounts(db) == [('Alice', 2000), ('Alice', 1), ('Carol', 199999), ('Dan', 350)]
+        assert check_balance_consistency(db, repair=False)
@@ -0,0 +1,55 @@
+import pytest
+from settle_sense.money import MAX_AMOUNT_MINOR, format_minor, from_minor, to_minor
+from settle_sense.validation import validate_entry
+
+@pytest.mark.parametrize('amount, exponent, expected', [
+    ('12.50', 2, 1250),
+    ('0.005', 2, 1),
+    ('-0.005', 2, -1),
+    ('2.5', 0, 3),
+    (' 7 ', 3, 7000),
+    (0.1, 2, 10),
+    (19.99, 2, 1999),
+    ('1e3', 2, 100000),
+])
+def test_to_minor(amount, exponent, expected):
+    assert to_minor(amount, exponent) == expected
+
+@pytest.mark.parametrize('amount', ['', 'abc', 'nan', 'inf', '-Infinity', None, True, '1,5'])
+def test_to_minor_rejects_non_numbers(amount):
+    with pytest.raises(ValueError):
+        to_minor(amount, 2)
+
+@pytest.mark.parametrize('amount', ['1e999999999', '-1e999999999', '9' * 40, '1e28'])
+def test_to_minor_rejects_huge_amounts(amount):
+    with pytest.raises(ValueError, match='too large'):
+        to_minor(amount, 2)
+
+def test_to_minor_accepts_tiny_exponents():
+    assert to_minor('1e-999999999', 2) == 0
+
+@pytest.mark.parametrize('amount_minor, exponent, expected', [
+    (1250, 2, '12.50'),
+    (-5, 2, '-0.05'),
+    (0, 2, '0.00'),
+    (42, 0, '42'),
+    (1, 3, '0.001'),
+])
+def test_format_minor(amount_minor, exponent, expected):
+    assert format_minor(amount_minor, exponent) == expected
+
+def test_from_minor_round_trips():
+    for amount in ('0.10', '19.99', '1234567.89'):
+        assert str(from_minor(to_minor(amount, 2), 2)) == amount.rstrip('0')
+
+def test_validate_entry_reports_overflow():
+    entry, error = validate_entry('Alice', '1e999999999', 'they_owe', '', 2)
+    assert entry is None
+    assert 'too large' in error
+
+def test_validate_entry_limits_amount():
+    limit = format_minor(MAX_AMOUNT_MINOR, 2)
+    entry, error = validate_entry('Alice', limit, 'they_owe', '', 2)
+    assert error is None and entry['amount_minor'] == MAX_AMOUNT_MINOR
+    entry, error = validate_entry('Alice', format_minor(MAX_AMOUNT_MINOR + 1, 2), 'they_owe', '', 2)
+    assert entry is None and error
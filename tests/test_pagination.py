@@ -0,0 +1,86 @@
+import base64
+import json
+import re
+import pytest
+from conftest import add_entries
+from settle_sense.db import get_db, get_schema
+from settle_sense.queries import (build_debt_filters, decode_cursor, encode_cursor, fetch_debt_page,
+                                  get_page_size)
+
+@pytest.fixture
+def entries(client):
+    # Entries made in one batch share created_at, so id breaks every tie
+    return add_entries(client, *[(f'P{i % 3}', str(i + 1), 'they_owe', '') for i in range(23)])
+
+def walk(db, sort_expr, descending, page_size):
+    """Page forwards to the end, then back to the start, returning both id lists."""
+    filters = build_debt_filters(db)
+    pages = []
+    after = None
+    while True:
+        entries, prev_cursor, next_cursor = fetch_debt_page(db, filters, sort_expr, descending,
+                                                            page_size, after=after)
+        pages.append([row['id'] for row in entries])
+        if next_cursor is None:
+            break
+        after = decode_cursor(next_cursor)
+
+    back = [pages[-1]]
+    while prev_cursor is not None:
+        entries, prev_cursor, _ = fetch_debt_page(db, filters, sort_expr, descending, page_size,
+                                                  before=decode_cursor(prev_cursor))
+        back.append([row['id'] for row in entries])
+    return pages, back[::-1]
+
+@pytest.mark.parametrize('sort_expr', ['date', 'debt.amount_minor', 'debt.person'])
+@pytest.mark.parametrize('descending', [True, False])
+def test_cursors_round_trip_both_ways(app, entries, sort_expr, descending):
+    with app.app_context():
+        db = get_db()
+        if sort_expr == 'date':
+            sort_expr = get_schema().date_sort
+        forward, backward = walk(db, sort_expr, descending, 10)
+        assert [len(page) for page in forward] == [10, 10, 3]
+        assert backward == forward
+        seen = [entry_id for page in forward for entry_id in page]
+        assert sorted(seen) == sorted(entries)
+
+def test_cursor_encoding_round_trips():
+    for position in [('2024-01-01 10:00:00', 7), (1250, 3), (None, 1), (-0.5, 2)]:
+        assert decode_cursor(encode_cursor(*position)) == position
+
+def token(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+@pytest.mark.parametrize('cursor', [
+    '', 'not base64!', token('text'), token([1]), token([[1], 2]), token([{'a': 1}, 2]),
+    token([1, 'x']), token([1, 2.5]), token([True, 2]), token([1, 2 ** 64]), token([2 ** 64, 1]),
+])
+def test_malformed_cursors_are_ignored(cursor):
+    assert decode_cursor(cursor) is None
+
+def dashboard_ids(response):
+    return re.findall(rb'/edit/(\d+)', response.data)
+
+@pytest.mark.parametrize('param', ['after', 'before'])
+@pytest.mark.parametrize('cursor', ['W1sxXSwyXQ', token([{'a': 1}, 2]), token([1, 2 ** 64]), '%%%'])
+def test_dashboard_ignores_malformed_cursor(client, entries, param, cursor):
+    first_page = client.get('/')
+    response = client.get(f'/?{param}={cursor}')
+    assert response.status_code == 200
+    assert dashboard_ids(response) == dashboard_ids(first_page)
+
+def test_dashboard_pages_follow_records_per_page(client, entries, write_settings):
+    write_settings(records_per_page=25)
+    assert len(set(dashboard_ids(client.get('/')))) == 23
+    write_settings(records_per_page=10)
+    first = client.get('/')
+    assert len(set(dashboard_ids(first))) == 10
+    next_link = re.search(rb'href="(/\?[^"]*after=[^"]+)"', first.data).group(1).decode().replace('&amp;', '&')
+    second = client.get(next_link)
+    assert len(set(dashboard_ids(second))) == 10
+    assert not set(dashboard_ids(first)) & set(dashboard_ids(second))
+
+@pytest.mark.parametrize('value, expected', [(25, 25), ('50', 50), (7, 10), ('lots', 10), (None, 10)])
+def test_page_size_setting(value, expected):
+    assert get_page_size({'records_per_page': value}) == expected
@@ -0,0 +1,52 @@
+import pytest
+from conftest import add_entries
+from settle_sense.db import get_db
+from settle_sense.queries import build_debt_filters, get_debt_totals
+
+@pytest.fixture
+def entries(client):
+    return add_entries(
+        client,
+        ('Alice', '10', 'they_owe', 'pizza night'),
+        ('Alice', '4', 'you_owe', 'taxi home'),
+        ('Bob', '7', 'they_owe', 'pizza night'),
+        ('Bob', '2', 'you_owe', 'coffee'),
+    )
+
+def test_search_with_person(app, entries):
+    with app.app_context():
+        db = get_db()
+        filters = build_debt_filters(db, 'pizza', 'Alice')
+        assert filters.search_mode == 'fts'
+        rows = db.execute(f"SELECT debt.id FROM {filters.source} WHERE {filters.where}",
+                          filters.params).fetchall()
+        assert [row['id'] for row in rows] == [entries[0]]
+        totals = get_debt_totals(db, filters)
+        assert totals['entry_count'] == 1
+        assert totals['net_balance'] == 1000
+        assert totals['people'] == [{'name': 'Alice', 'balance': 1000}]
+
+def test_search_with_person_matches_once(app, entries):
+    with app.app_context():
+        db = get_db()
+        filters = build_debt_filters(db, 'pizza', 'Alice')
+        plan = db.execute(f"EXPLAIN QUERY PLAN SELECT debt.id FROM {filters.source} WHERE {filters.where}",
+                          filters.params).fetchall()
+        # The MATCH drives the query; debt is looked up by rowid per match
+        assert plan[0]['detail'].startswith('SCAN debt_fts')
+        assert 'idx_debt_person' not in ' '.join(row['detail'] for row in plan)
+
+def test_dashboard_search_with_person(client, entries):
+    response = client.get('/?search=pizza&person=Bob')
+    assert response.status_code == 200
+    assert b'pizza' in response.data
+    assert b'taxi home' not in response.data
+    assert b'coffee' not in response.data
+
+def test_search_falls_back_to_like(app, entries):
+    with app.app_context():
+        db = get_db()
+        # Punctuation-only searches have no FTS terms
+        filters = build_debt_filters(db, '%', 'Bob')
+        assert filters.search_mode == 'like'
+        assert get_debt_totals(db, filters)['entry_count'] == 2
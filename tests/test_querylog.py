@@ -0,0 +1,76 @@
+import logging
+import sqlite3
+import pytest
+from conftest import add_entries
+from settle_sense.db import get_db
+from settle_sense.querylog import SlowQueryLog, parameters_shape, plan_flags
+
+@pytest.fixture
+def traced_app(make_app):
+    # Every statement is slow
+    return make_app(SLOW_QUERY_MS=0.000001)
+
+def slow_queries(app):
+    return app.extensions['slow_queries'].top(count=1000)
+
+def test_log_is_off_by_default(app, client):
+    assert 'slow_queries' not in app.extensions
+    assert b'The slow-query log is off' in client.get('/settings').data
+
+def test_slow_statements_are_recorded_with_their_plans(traced_app):
+    client = traced_app.test_client()
+    add_entries(client, ('Alice', '1', 'they_owe', 'secret dinner'))
+    client.get('/?search=secret')
+    entries = slow_queries(traced_app)
+    search = [e for e in entries if 'debt_fts MATCH' in e['sql'] and e['endpoint'] == 'dashboard.index']
+    assert search
+    assert all(e['plan'] for e in search)
+    # Parameter values are never kept, only their types
+    assert not [e for e in entries if 'secret' in e['parameters'] or 'secret' in e['sql']]
+    assert any('str' in e['parameters'] for e in search)
+
+def test_full_scans_and_temp_sorts_are_flagged(traced_app):
+    with traced_app.app_context():
+        db = get_db()
+        db.execute("SELECT * FROM debt WHERE note = ?", ('x',)).fetchall()
+        db.execute("SELECT * FROM debt WHERE person = ? ORDER BY note", ('x',)).fetchall()
+        db.execute("SELECT * FROM debt WHERE person = ?", ('x',)).fetchall()
+    flags = {e['sql']: e['flags'] for e in slow_queries(traced_app)}
+    assert flags['SELECT * FROM debt WHERE note = ?'] == ['full scan']
+    assert flags['SELECT * FROM debt WHERE person = ? ORDER BY note'] == ['temp b-tree']
+    assert flags['SELECT * FROM debt WHERE person = ?'] == []
+
+def test_fetch_time_counts_towards_the_threshold():
+    log = SlowQueryLog(10, logging.getLogger('test'))
+    connection = sqlite3.connect(':memory:')
+    trace = log.begin(connection, "SELECT 1", (), 0.004)
+    assert not log.top()
+    log.add(connection, trace, 0.007)
+    entry, = log.top()
+    assert (entry['count'], entry['total_seconds']) == (1, pytest.approx(0.011))
+    log.add(connection, trace, 0.002)
+    assert log.top()[0]['total_seconds'] == pytest.approx(0.013)
+
+def test_log_keeps_the_costliest_statements():
+    log = SlowQueryLog(0, logging.getLogger('test'), limit=2)
+    connection = sqlite3.connect(':memory:')
+    for value, seconds in ((1, 0.3), (2, 0.1), (3, 0.2)):
+        log.begin(connection, f"SELECT {value}", (), seconds)
+    assert [e['sql'] for e in log.top()] == ['SELECT 1', 'SELECT 3']
+
+def test_parameters_shape():
+    assert parameters_shape(('a', 1, 2.5, None)) == '(str, int, float, NoneType)'
+    assert parameters_shape({'person': 'a'}) == '{:person str}'
+    assert parameters_shape([('a', 1), ('b', 2)], many=True) == '2 rows of (str, int)'
+
+def test_subquery_scans_are_not_table_scans():
+    assert plan_flags(['CO-ROUTINE totals', 'SCAN totals', 'SEARCH debt USING INDEX idx_debt_person (person=?)']) == []
+    assert plan_flags(['SCAN debt', 'USE TEMP B-TREE FOR ORDER BY']) == ['full scan', 'temp b-tree']
+
+def test_diagnostics_section(traced_app):
+    client = traced_app.test_client()
+    client.get('/')
+    page = client.get('/settings').data
+    assert b'Statements slower than' in page
+    client.post('/diagnostics/clear')
+    assert not slow_queries(traced_app)
@@ -0,0 +1,87 @@
+import pytest
+from settle_sense.balances import rebuild_rollups
+from settle_sense.db import get_db
+
+# (person, amount_minor, direction, created_at)
+ROWS = [
+    ('Alice', 1000, 'they_owe', '2024-01-30 09:00:00'),
+    ('Bob', 250, 'you_owe', '2024-01-30 18:30:00'),
+    ('Alice', 300, 'you_owe', '2024-02-02 12:00:00'),
+    ('Carol', 4000, 'they_owe', '2024-02-12 08:00:00'),
+    ('Bob', 50, 'they_owe', '2024-03-01 00:00:00'),
+]
+
+@pytest.fixture
+def dated(app):
+    with app.app_context():
+        db = get_db()
+        db.executemany(
+            "INSERT INTO debt (person, amount_minor, direction, note, created_at, updated_at) "
+            "VALUES (?, ?, ?, '', ?, ?)",
+            [row + (row[3],) for row in ROWS]
+        )
+        db.commit()
+
+def rollup_rows(db):
+    return (db.execute("SELECT * FROM daily_rollup ORDER BY day").fetchall(),
+            db.execute("SELECT * FROM daily_person_rollup ORDER BY person, day").fetchall())
+
+def snapshot(db):
+    return tuple([tuple(row) for row in rows] for rows in rollup_rows(db))
+
+def test_triggers_match_a_rebuild(app, dated):
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE debt SET person = 'Dan', created_at = '2024-02-13 10:00:00' WHERE id = 2")
+        db.execute("UPDATE debt SET amount_minor = 20, direction = 'you_owe' WHERE id = 5")
+        db.execute("DELETE FROM debt WHERE id = 3")
+        db.commit()
+        maintained = snapshot(db)
+        rebuild_rollups(db)
+        assert snapshot(db) == maintained
+        # Days whose entries were all moved or deleted are dropped
+        assert [row[0] for row in maintained[0]] == ['2024-01-30', '2024-02-12', '2024-02-13', '2024-03-01']
+
+def series(client, **params):
+    response = client.get('/api/timeseries', query_string=params)
+    assert response.status_code == 200
+    return response.get_json()['buckets']
+
+def test_daily_series_fills_gaps_and_carries_the_balance(client, dated):
+    points = series(client, start='2024-01-29', end='2024-02-03')
+    assert [p['period'] for p in points] == [
+        '2024-01-29', '2024-01-30', '2024-01-31', '2024-02-01', '2024-02-02', '2024-02-03']
+    assert [p['balance'] for p in points] == [0, 7.5, 7.5, 7.5, 4.5, 4.5]
+    assert points[1] == {'period': '2024-01-30', 'owed_to_you': 10.0, 'you_owe': 2.5,
+                         'net_change': 7.5, 'entries': 2, 'balance': 7.5}
+
+def test_weekly_and_monthly_buckets(client, dated):
+    weeks = series(client, interval='week', start='2024-02-01', end='2024-02-29')
+    # Weeks start on Monday; the first bucket reaches back to 2024-01-29
+    assert [w['period'] for w in weeks] == ['2024-01-29', '2024-02-05', '2024-02-12', '2024-02-19',
+                                            '2024-02-26']
+    assert [w['entries'] for w in weeks] == [3, 0, 1, 0, 0]
+    assert weeks[-1]['balance'] == 44.5
+
+    months = series(client, interval='month', start='2024-01-01', end='2024-03-31')
+    assert [(m['period'], m['net_change'], m['balance']) for m in months] == [
+        ('2024-01-01', 7.5, 7.5), ('2024-02-01', 37.0, 44.5), ('2024-03-01', 0.5, 45.0)]
+
+def test_opening_balance_and_person_filter(client, dated):
+    response = client.get('/api/timeseries', query_string={'start': '2024-02-12', 'end': '2024-02-12'})
+    assert response.get_json()['opening_balance'] == 4.5
+    points = response.get_json()['buckets']
+    assert points == [{'period': '2024-02-12', 'owed_to_you': 40.0, 'you_owe': 0.0,
+                       'net_change': 40.0, 'entries': 1, 'balance': 44.5}]
+    bob = series(client, interval='month', person='Bob', end='2024-03-31')
+    assert [(m['period'], m['balance']) for m in bob] == [
+        ('2024-01-01', -2.5), ('2024-02-01', -2.5), ('2024-03-01', -2.0)]
+
+@pytest.mark.parametrize('params', [
+    {'interval': 'year'},
+    {'start': '2024-02-01', 'end': '2024-01-01'},
+    {'start': '1900-01-01', 'end': '2024-01-01'},
+    {'start': 'yesterday'},
+])
+def test_invalid_ranges(client, params):
+    assert client.get('/api/timeseries', query_string=params).status_code == 400
@@ -0,0 +1,40 @@
+from conftest import add_entries
+from settle_sense.db import get_db, get_pool, get_schema
+from settle_sense.migrations import SCHEMA_VERSION
+
+def traced(app, statements):
+    with app.app_context():
+        get_db().set_trace_callback(statements.append)
+
+def test_requests_do_not_inspect_the_schema(app, client):
+    add_entries(client, ('Alice', '1', 'they_owe', ''))
+    # The first connection created the database file, so the next checkout
+    # starts a new pool generation and reloads the descriptor once
+    client.get('/')
+    statements = []
+    traced(app, statements)
+    client.get('/')
+    client.post('/add', data={'person': 'Bob', 'amount': '2', 'direction': 'you_owe'})
+    client.post('/edit/1', data={'person': 'Alice', 'amount': '3', 'direction': 'they_owe', 'note': ''})
+    client.get('/export')
+    assert [sql for sql in statements if 'INSERT INTO debt' in sql]
+    assert not [sql for sql in statements if 'table_info' in sql or 'schema_version' in sql]
+
+def test_descriptor_is_cached(app):
+    with app.app_context():
+        schema = get_schema()
+        assert schema.has_created_at and schema.has_updated_at and schema.has_minor_amounts
+        assert schema.user_version == SCHEMA_VERSION
+    with app.app_context():
+        assert get_schema() is schema
+
+def test_descriptor_refreshes_after_migration(legacy_db, client):
+    with client.application.app_context():
+        before = get_schema()
+        assert not before.has_minor_amounts
+    client.post('/migrate/run', data={})
+    with client.application.app_context():
+        after = get_schema()
+        assert after is not before
+        assert after.has_minor_amounts
+        assert after.generation == get_pool().generation
@@ -0,0 +1,80 @@
+import builtins
+import os
+import signal
+from types import SimpleNamespace
+from gunicorn.app.base import BaseApplication
+from settle_sense import live, server
+from settle_sense.config import load_config
+from settle_sense.db import get_db
+from settle_sense.server import serve, server_options
+
+def test_server_options(make_app, monkeypatch):
+    monkeypatch.setenv('HOST', '0.0.0.0')
+    monkeypatch.setenv('PORT', '8080')
+    app = make_app(WEB_WORKERS=3, WEB_KEEPALIVE=7, WEB_TIMEOUT=40, WEB_GRACEFUL_TIMEOUT=12)
+    options = server_options(app)
+    assert options['bind'] == '0.0.0.0:8080'
+    assert (options['workers'], options['keepalive'], options['timeout'], options['graceful_timeout']) == \
+        (3, 7, 40, 12)
+    assert options['worker_class'] == 'gthread'
+    assert options['preload_app']
+
+def test_server_settings_from_the_environment(monkeypatch):
+    monkeypatch.setenv('WEB_WORKERS', '5')
+    monkeypatch.setenv('WEB_THREADS', '16')
+    config = load_config()
+    assert (config['WEB_WORKERS'], config['WEB_THREADS']) == (5, 16)
+
+def test_serve_shares_metrics_between_workers(make_app, monkeypatch):
+    app = make_app(WEB_WORKERS=2)
+    monkeypatch.setattr(BaseApplication, 'run', lambda self: None)
+    serve(app)
+    registry = app.extensions['metrics']
+    assert registry.directory == os.path.join(os.path.dirname(app.config['DATABASE']), 'metrics')
+
+def test_master_drops_its_connections_before_forking(app):
+    with app.app_context():
+        pooled = get_db()
+    generation = app.extensions['db_pool'].generation
+    master = SimpleNamespace(cfg=SimpleNamespace(workers=2, threads=208),
+                             log=SimpleNamespace(info=lambda message: None))
+    server._server_ready(app, master)
+    assert app.extensions['db_pool'].generation == generation + 1
+    with app.app_context():
+        assert get_db() is not pooled
+
+def test_worker_sigterm_ends_live_streams(monkeypatch):
+    handlers, calls = {}, []
+    monkeypatch.setattr(signal, 'getsignal', lambda signum: lambda *args: calls.append('previous'))
+    monkeypatch.setattr(signal, 'signal', handlers.__setitem__)
+    monkeypatch.setattr(live.broadcaster, 'close', lambda: calls.append('close'))
+    server._worker_started(None)
+    handlers[signal.SIGTERM](signal.SIGTERM, None)
+    assert calls == ['close', 'previous']
+
+def test_serve_without_gunicorn(make_app, monkeypatch):
+    app = make_app()
+    started = []
+    real_import = builtins.__import__
+
+    def no_gunicorn(name, *args, **kwargs):
+        if name.startswith('gunicorn'):
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, '__import__', no_gunicorn)
+    monkeypatch.setattr(app, 'run', lambda **kwargs: started.append(kwargs))
+    serve(app)
+    assert started == [{'host': '127.0.0.1', 'port': 5000, 'threaded': True}]
+
+def test_threads_reserved_for_live_streams(make_app):
+    app = make_app(WEB_THREADS=8, LIVE_MAX_CLIENTS=200)
+    assert server_options(app)['threads'] == 208
+
+def test_serve_keeps_the_stream_limit(make_app, monkeypatch):
+    app = make_app(WEB_WORKERS=1, WEB_THREADS=4, LIVE_MAX_CLIENTS=50)
+    started = []
+    monkeypatch.setattr(BaseApplication, 'run', lambda self: started.append(self.cfg.threads))
+    serve(app)
+    assert started == [54]
+    assert app.config['LIVE_MAX_CLIENTS'] == 50
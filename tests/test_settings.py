@@ -0,0 +1,67 @@
+import json
+import os
+import pytest
+from settle_sense import settings
+from settle_sense.settings import SettingsCache, get_formatters, get_settings
+
+@pytest.fixture
+def loads(monkeypatch):
+    calls = []
+    original = SettingsCache._load
+
+    def counting_load(self):
+        calls.append(self.path)
+        return original(self)
+
+    monkeypatch.setattr(SettingsCache, '_load', counting_load)
+    return calls
+
+def test_snapshot_is_reused_while_the_file_is_unchanged(write_settings, loads):
+    write_settings(currency_symbol='€')
+    first = settings.settings_cache.get()
+    assert first['currency_symbol'] == '€'
+    assert settings.settings_cache.get() is first
+    assert len(loads) == 1
+
+def test_snapshot_reloads_when_the_file_changes(settings_file, write_settings, loads):
+    write_settings(theme='dark')
+    assert settings.settings_cache.get()['theme'] == 'dark'
+
+    # Edited by hand or by another worker, without invalidating the cache
+    with open(settings_file, 'w') as f:
+        json.dump({'theme': 'light', 'date_format': 'DD/MM/YYYY'}, f)
+    stat = os.stat(settings_file)
+    os.utime(settings_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert settings.settings_cache.get()['theme'] == 'light'
+    assert len(loads) == 2
+
+def test_snapshot_is_read_only(write_settings):
+    write_settings(theme='dark')
+    with pytest.raises(TypeError):
+        settings.settings_cache.get()['theme'] = 'light'
+
+def test_missing_or_broken_file_gives_defaults(app, settings_file):
+    with app.app_context():
+        assert dict(settings.settings_cache.get()) == {}
+        with open(settings_file, 'w') as f:
+            f.write('{not json')
+        settings.settings_cache.invalidate()
+        assert dict(settings.settings_cache.get()) == {}
+
+def test_request_keeps_one_snapshot(app, write_settings):
+    write_settings(currency_symbol='£')
+    with app.test_request_context():
+        snapshot = get_settings()
+        write_settings(currency_symbol='€')
+        assert get_settings() is snapshot
+        assert get_formatters().currency(1250) == '£12.50'
+    with app.test_request_context():
+        assert get_formatters().currency(1250) == '€12.50'
+
+def test_saved_settings_reach_the_next_request(client):
+    response = client.post('/settings/update', data={
+        'section': 'general', 'currency_symbol': 'CHF ', 'date_format': 'YYYY-MM-DD'})
+    assert response.status_code == 302
+    assert settings.settings_cache.get()['currency_symbol'] == 'CHF '
+    client.post('/add', data={'person': 'Alice', 'amount': '3', 'direction': 'they_owe'})
+    assert b'CHF 3.00' in client.get('/').data
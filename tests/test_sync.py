@@ -0,0 +1,123 @@
+import json
+import pytest
+from conftest import add_entries
+from settle_sense.db import get_db
+from settle_sense.sync import SYNC_COLUMNS, prune_tombstones
+
+class Replica:
+    """A client's local copy, kept current through /api/sync."""
+
+    def __init__(self, client):
+        self.client = client
+        self.version = 0
+        self.rows = {}
+        self.modes = []
+
+    def sync(self, limit=None):
+        while True:
+            params = {'since': self.version}
+            if limit:
+                params['limit'] = limit
+            response = self.client.get('/api/sync', query_string=params)
+            assert response.status_code == 200
+            assert response.headers['Cache-Control'] == 'no-store'
+            data = json.loads(response.get_data())
+            assert data['columns'] == list(SYNC_COLUMNS)
+            self.modes.append(data['mode'])
+            if data['mode'] == 'snapshot':
+                self.rows = {}
+            for row in data['rows']:
+                self.rows[row[0]] = row
+            for entry_id in data['deleted']:
+                self.rows.pop(entry_id, None)
+            self.version = data['version']
+            if not data['has_more']:
+                return data
+
+def stored_rows(app):
+    with app.app_context():
+        rows = get_db().execute(f"SELECT {', '.join(SYNC_COLUMNS)} FROM debt").fetchall()
+    return {row[0]: list(row) for row in rows}
+
+def test_first_sync_is_a_snapshot(app, client):
+    add_entries(client, ('Alice', '12.50', 'they_owe', 'lunch'), ('Bob', '3', 'you_owe', ''))
+    replica = Replica(client)
+    data = replica.sync()
+    assert replica.modes == ['snapshot']
+    assert data['currency_exponent'] == 2
+    assert replica.rows == stored_rows(app)
+    assert sorted(row[2] for row in replica.rows.values()) == [300, 1250]
+
+def test_delta_carries_changes_and_tombstones(app, client):
+    ids = add_entries(client, ('Alice', '1', 'they_owe', ''), ('Bob', '2', 'you_owe', ''),
+                      ('Carol', '3', 'they_owe', ''))
+    replica = Replica(client)
+    replica.sync()
+
+    client.post(f'/edit/{ids[0]}', data={'person': 'Alice', 'amount': '5', 'direction': 'they_owe', 'note': 'x'})
+    client.post(f'/delete/{ids[1]}')
+    new_id, = add_entries(client, ('Dan', '4', 'you_owe', ''))
+    data = replica.sync()
+    assert data['mode'] == 'delta'
+    assert sorted(row[0] for row in data['rows']) == [ids[0], new_id]
+    assert data['deleted'] == [ids[1]]
+    assert replica.rows == stored_rows(app)
+
+    # Nothing changed since
+    data = replica.sync()
+    assert (data['rows'], data['deleted']) == ([], [])
+
+def test_delta_pages(app, client):
+    # An empty ledger is at version 0, which asks for a snapshot again
+    add_entries(client, ('P0', '1', 'you_owe', ''))
+    replica = Replica(client)
+    replica.sync()
+    ids = add_entries(client, *[(f'P{i}', str(i), 'they_owe', '') for i in range(1, 8)])
+    client.post(f'/delete/{ids[2]}')
+    client.post(f'/delete/{ids[5]}')
+    # Five new rows and two tombstones, two at a time
+    replica.sync(limit=2)
+    assert replica.modes == ['snapshot'] + ['delta'] * 4
+    assert replica.rows == stored_rows(app)
+
+def test_clients_behind_pruned_tombstones_get_a_snapshot(app, client):
+    ids = add_entries(client, ('Alice', '1', 'they_owe', ''), ('Bob', '2', 'you_owe', ''))
+    replica = Replica(client)
+    replica.sync()
+    client.post(f'/delete/{ids[0]}')
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE debt_tombstone SET deleted_at = '2000-01-01 00:00:00'")
+        db.commit()
+        assert prune_tombstones(db) == 1
+
+    replica.sync()
+    assert replica.modes == ['snapshot', 'snapshot']
+    assert replica.rows == stored_rows(app)
+
+def test_ndjson_sync(client):
+    ids = add_entries(client, ('Alice', '1', 'they_owe', ''), ('Bob', '2', 'you_owe', ''))
+    version = client.get('/api/sync').get_json()['version']
+    client.post(f'/delete/{ids[0]}')
+    response = client.get('/api/sync', query_string={'since': version, 'format': 'ndjson'})
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[0]['mode'] == 'delta' and lines[0]['version'] > version
+    assert lines[1:] == [{'deleted': ids[0]}]
+
+@pytest.mark.parametrize('params', [
+    {'since': 'x'}, {'since': -1}, {'limit': 0}, {'limit': 10001}, {'format': 'xml'},
+])
+def test_invalid_parameters(client, params):
+    assert client.get('/api/sync', query_string=params).status_code == 400
+
+def test_prune_tombstones_command(app, client):
+    ids = add_entries(client, ('Alice', '1', 'they_owe', ''))
+    client.post(f'/delete/{ids[0]}')
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=['prune-tombstones']).output == "Removed 0 tombstones.\n"
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE debt_tombstone SET deleted_at = '2000-01-01 00:00:00'")
+        db.commit()
+    assert runner.invoke(args=['prune-tombstones']).output == "Removed 1 tombstones.\n"